@@ -185,6 +185,7 @@ TEMPLATES = [
                 # Your stuff: custom template context processors go here
                 "fpbase.context_processors.api_keys",
                 "fpbase.context_processors.canonical",
+                "fpbase.context_processors.cached_csrf_token",
             ],
         },
     }
@@ -359,9 +360,16 @@ ALGOLIA = {
 if ALGOLIA["API_KEY"]:
     INSTALLED_APPS += ["algoliasearch_django"]
 
+# NCBI E-utilities (a key raises the rate limit from 3 to 10 requests per second)
+NCBI_API_KEY = env("NCBI_API_KEY", default="")
+
 # CELERY_BROKER_URL = env('REDIS_URL', default='redis://localhost/')
 CELERY_BROKER_URL = env("CLOUDAMQP_URL", default="amqp://localhost")
 CELERY_RESULT_BACKEND = env("REDIS_URL", default="redis://localhost/")
+CELERY_BEAT_SCHEDULE = {
+    # the data checks behind /problems/ (proteins.util.datachecks)
+    "run-datachecks": {"task": "proteins.tasks.run_datachecks", "schedule": 60 * 60 * 24},
+}
 
 
 INSTALLED_APPS += ["graphene_django"]
@@ -0,0 +1,288 @@
+"""Version counters and stale-while-revalidate entries for derived caches.
+
+Cached values that depend on some set of models include the current version
+of those models in their cache key.  Bumping a version (from a model's save
+hook or a signal handler) makes every such key unreachable at once, so
+nothing has to enumerate or delete the stale entries.
+
+Expensive values (e.g. the spectra sluglist) are instead stored with
+swr_get: an entry records the versions of its tags when it was built, and once
+it is past its fresh time or one of its tags was bumped, it is still served
+while a single background thread rebuilds it.  Small changes can be spliced
+into an entry with swr_patch rather than forcing a rebuild.
+
+Views are cached with cache_page, a drop-in for django's decorator of the same
+name where only one request regenerates an expired page.
+"""
+
+import hashlib
+import math
+import random
+import threading
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import connections
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_response_headers, patch_vary_headers
+
+VERSION_TIMEOUT = None  # never expire: an evicted counter restarts and invalidates everything anyway
+
+
+def _version_key(name):
+    return f"version:{name}"
+
+
+def get_versions(*names):
+    """current version of each of names (one cache round trip)"""
+    keys = [_version_key(n) for n in names]
+    found = cache.get_many(keys)
+    missing = {k: 1 for k in keys if k not in found}
+    if missing:
+        cache.set_many(missing, VERSION_TIMEOUT)
+        found.update(missing)
+    return tuple(found[k] for k in keys)
+
+
+def get_version(name):
+    return get_versions(name)[0]
+
+
+def bump_version(*names):
+    """invalidate everything cached under the current version of names"""
+    for name in names:
+        key = _version_key(name)
+        cache.add(key, 1, VERSION_TIMEOUT)
+        try:
+            cache.incr(key)
+        except ValueError:  # evicted in the meantime
+            cache.set(key, 2, VERSION_TIMEOUT)
+
+
+SWR_TIMEOUT = 60 * 60 * 24 * 7  # how long a (possibly stale) entry is kept
+SWR_LOCK_TIMEOUT = 60
+
+
+def _patch_generation_name(key):
+    return f"swr_patch:{key}"
+
+
+def _swr_build(key, builder, fresh, tags, timeout):
+    # read the tag versions *before* building, so that a bump during the build marks the result stale
+    versions = get_versions(*tags)
+    generation = get_version(_patch_generation_name(key))
+    entry = {"value": builder(), "fresh_until": time.time() + fresh, "tags": versions}
+    if get_version(_patch_generation_name(key)) != generation:
+        # patched while building: keep the patched entry, this value may predate the patch
+        entry["fresh_until"] = 0
+        cache.add(key, entry, timeout)
+        return entry
+    cache.set(key, entry, timeout)
+    if get_version(_patch_generation_name(key)) != generation:
+        swr_invalidate(key)
+    return entry
+
+
+def _swr_refresh(key, builder, fresh, tags, timeout):
+    try:
+        _swr_build(key, builder, fresh, tags, timeout)
+    finally:
+        cache.delete(f"{key}:lock")
+        connections.close_all()
+
+
+def swr_get(key, builder, fresh=60 * 60, tags=(), timeout=SWR_TIMEOUT, wait=5):
+    """cached value of builder(), refreshed in the background once stale
+
+    an entry is stale after `fresh` seconds, or once one of its `tags` was
+    bumped (see invalidate_tags).  Only a cold cache makes the caller build
+    the value, and concurrent cold callers wait (up to `wait` seconds) for
+    the one that got the lock rather than all building it.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        lock = f"{key}:lock"
+        if not cache.add(lock, True, SWR_LOCK_TIMEOUT):
+            deadline = time.monotonic() + wait
+            while entry is None and time.monotonic() < deadline:
+                time.sleep(0.1)
+                entry = cache.get(key)
+            if entry is not None:
+                return entry["value"]
+        try:
+            return _swr_build(key, builder, fresh, tags, timeout)["value"]
+        finally:
+            cache.delete(lock)
+
+    if time.time() > entry["fresh_until"] or entry["tags"] != get_versions(*tags):
+        if cache.add(f"{key}:lock", True, SWR_LOCK_TIMEOUT):
+            args = (key, builder, fresh, tags, timeout)
+            threading.Thread(target=_swr_refresh, args=args, name=f"swr-{key}", daemon=True).start()
+    return entry["value"]
+
+
+def swr_patch(key, func, timeout=SWR_TIMEOUT):
+    """replace the value of a swr_get entry with func(value), keeping its freshness
+
+    does nothing if the entry isn't cached.  If another process is patching
+    the same entry, it is marked stale instead (so it is rebuilt in the background).
+    A rebuild that was running during the patch doesn't overwrite it.
+    """
+    bump_version(_patch_generation_name(key))
+    if cache.get(key) is None:
+        return
+    lock = f"{key}:patch"
+    if not cache.add(lock, True, 10):
+        swr_invalidate(key)
+        return
+    try:
+        entry = cache.get(key)
+        if entry is not None:
+            entry["value"] = func(entry["value"])
+            cache.set(key, entry, timeout)
+    finally:
+        cache.delete(lock)
+
+
+def swr_invalidate(key, timeout=SWR_TIMEOUT):
+    """mark a swr_get entry stale: it keeps being served until rebuilt in the background"""
+    entry = cache.get(key)
+    if entry is not None:
+        entry["fresh_until"] = 0
+        cache.set(key, entry, timeout)
+
+
+def invalidate_tags(*tags):
+    """mark every swr_get entry with any of these tags stale"""
+    bump_version(*tags)
+
+
+# rendered in place of the csrf token on pages shared by anonymous users (see fpbase.context_processors)
+CSRF_PLACEHOLDER = "__fpbase_cached_csrf_token__"
+PAGE_LOCK_TIMEOUT = 60
+
+
+def _page_version_name(path):
+    return f"page:{path}"
+
+
+def uncache_path(path):
+    """drop every copy of the page at path cached by cache_page (any query string, user or cookie)"""
+    bump_version(_page_version_name(path))
+
+
+def _page_cache_key(request, key_prefix, headers):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    key = f"page:{key_prefix}:{url}:{get_version(_page_version_name(request.path))}"
+    if headers:
+        values = "|".join(request.headers.get(h, "") for h in headers)
+        key += ":" + hashlib.md5(values.encode()).hexdigest()
+    return key
+
+
+def _refresh_early(entry, beta):
+    # probabilistic early expiration: the closer to expiry (and the slower the page), the likelier
+    return time.time() - entry["delta"] * beta * math.log(1 - random.random()) >= entry["expires"]
+
+
+def _fill_csrf_token(request, response):
+    placeholder = CSRF_PLACEHOLDER.encode()
+    if placeholder in response.content:
+        response.content = response.content.replace(placeholder, get_token(request).encode())
+        if response.has_header("Content-Length"):
+            response["Content-Length"] = str(len(response.content))
+    return response
+
+
+def _cacheable(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and "private" not in response.get("Cache-Control", "")
+    )
+
+
+def _personalized(request):
+    """whether rendering used per-visitor state (flash messages, session writes) that must not be shared"""
+    messages = getattr(request, "_messages", None)
+    # ({% if messages %} only iterates, and so marks them used, when there are any)
+    if messages is not None and ((messages.used and len(messages)) or messages.added_new):
+        return True
+    session = getattr(request, "session", None)
+    return session is not None and session.modified
+
+
+def _has_messages(request):
+    messages = getattr(request, "_messages", None)
+    return messages is not None and len(messages) > 0
+
+
+def cache_page(timeout, key_prefix="", vary_on_cookie=False, vary_on_headers=(), beta=1.0, wait=10):
+    """cache the GET responses of a view, regenerating an expired page in one request only
+
+    while one request (re)builds a page, concurrent requests for it wait up to
+    `wait` seconds for the result rather than all rendering it too.  Pages are
+    refreshed slightly before they expire, with a probability that grows with
+    `beta` and with the time the page took to render, so that busy pages are
+    usually rebuilt before anyone has to wait.
+
+    vary_on_cookie: cache pages per cookie (i.e. per session) for logged in
+    users.  Anonymous users share one copy regardless of their cookies, with
+    their own csrf token filled in on every hit.  Pages that rendered flash
+    messages or wrote to the session are never cached, and visitors with
+    pending messages always get a fresh page.
+    vary_on_headers: request headers (e.g. Accept) that select a different copy
+    """
+
+    def decorator(view_func):
+        def respond(request, entry, shared):
+            response = entry["response"]
+            return _fill_csrf_token(request, response) if shared and vary_on_cookie else response
+
+        def build(request, key, shared, args, kwargs):
+            start = time.monotonic()
+            request._csrf_placeholder = shared and vary_on_cookie
+            response = view_func(request, *args, **kwargs)
+            if callable(getattr(response, "render", None)):
+                response = response.render()
+            if key and request.method == "GET" and _cacheable(response) and not _personalized(request):
+                patch_response_headers(response, timeout)
+                patch_vary_headers(response, (*vary_on_headers, *(("Cookie",) if vary_on_cookie else ())))
+                entry = {"response": response, "expires": time.time() + timeout, "delta": time.monotonic() - start}
+                cache.set(key, entry, timeout)
+            return respond(request, {"response": response}, shared)
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view_func(request, *args, **kwargs)
+            user = getattr(request, "user", None)
+            shared = not (vary_on_cookie and user is not None and user.is_authenticated)
+            key = _page_cache_key(request, key_prefix, (*vary_on_headers, *(() if shared else ("Cookie",))))
+
+            if shared and _has_messages(request):
+                return build(request, None, shared, args, kwargs)
+            entry = cache.get(key)
+            if entry is not None and not _refresh_early(entry, beta):
+                return respond(request, entry, shared)
+            lock = f"{key}:lock"
+            locked = cache.add(lock, True, PAGE_LOCK_TIMEOUT)
+            if not locked:
+                # someone else is building this page: serve the current copy, or wait for theirs
+                deadline = time.monotonic() + wait
+                while entry is None and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    entry = cache.get(key)
+                if entry is not None:
+                    return respond(request, entry, shared)
+            try:
+                return build(request, key, shared, args, kwargs)
+            finally:
+                if locked:
+                    cache.delete(lock)
+
+        return _wrapped_view
+
+    return decorator
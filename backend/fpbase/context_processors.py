@@ -1,5 +1,7 @@
 from django.conf import settings
 
+from .cache import CSRF_PLACEHOLDER
+
 
 def api_keys(request):
     return {
@@ -18,3 +20,10 @@ def canonical(request):
         "ABSOLUTE_ROOT": request.build_absolute_uri("/")[:-1].strip("/"),
         "ABSOLUTE_ROOT_URL": request.build_absolute_uri("/").strip("/"),
     }
+
+
+def cached_csrf_token(request):
+    # pages shared by anonymous users in the page cache get a placeholder, see fpbase.cache.cache_page
+    if getattr(request, "_csrf_placeholder", False):
+        return {"csrf_token": CSRF_PLACEHOLDER}
+    return {}
@@ -0,0 +1,141 @@
+import threading
+
+from django.contrib import messages
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template import engines
+from django.test import RequestFactory, SimpleTestCase
+
+from ..cache import (
+    CSRF_PLACEHOLDER,
+    cache_page,
+    invalidate_tags,
+    swr_get,
+    swr_invalidate,
+    swr_patch,
+    uncache_path,
+)
+
+PAGE = engines["django"].from_string("<form>{% csrf_token %}</form>")
+MESSAGES = engines["django"].from_string(
+    "<p>{% if messages %}{% for m in messages %}{{ m }}{% endfor %}{% endif %}</p>"
+)
+
+
+class CachePageTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+        @cache_page(60, vary_on_cookie=True)
+        def view(request):
+            self.calls += 1
+            return HttpResponse(PAGE.render(request=request))
+
+        self.view = view
+
+    def request(self, cookie=""):
+        request = RequestFactory().get("/page/", HTTP_COOKIE=cookie)
+        request.user = AnonymousUser()
+        request._messages = CookieStorage(request)
+        return request
+
+    def get(self, cookie=""):
+        request = self.request(cookie)
+        return request, self.view(request)
+
+    def test_anonymous_users_share_a_page(self):
+        request1, response1 = self.get()
+        request2, response2 = self.get(cookie="sessionid=abc")
+        self.assertEqual(self.calls, 1)
+        for request, response in ((request1, response1), (request2, response2)):
+            self.assertNotIn(CSRF_PLACEHOLDER.encode(), response.content)
+            self.assertTrue(request.META.get("CSRF_COOKIE_NEEDS_UPDATE"))
+        self.assertNotEqual(response1.content, response2.content)
+
+    def test_uncache_path(self):
+        self.get()
+        uncache_path("/page/")
+        self.get()
+        self.assertEqual(self.calls, 2)
+
+    def test_messages_are_not_shared(self):
+        @cache_page(60, vary_on_cookie=True)
+        def view(request):
+            self.calls += 1
+            return HttpResponse(MESSAGES.render({"messages": messages.get_messages(request)}))
+
+        request = self.request()
+        messages.info(request, "You have signed out.")
+        self.assertIn(b"You have signed out.", view(request).content)
+        self.assertNotIn(b"You have signed out.", view(self.request()).content)
+        self.assertNotIn(b"You have signed out.", view(self.request()).content)
+        self.assertEqual(self.calls, 2)
+
+
+class SWRTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+        self.items = [1, 2]
+
+    def build(self):
+        self.builds += 1
+        return list(self.items)
+
+    def get(self):
+        return swr_get("items", self.build, tags=("numbers",))
+
+    def wait_for_refresh(self):
+        for thread in threading.enumerate():
+            if thread.name == "swr-items":
+                thread.join()
+
+    def test_get(self):
+        self.assertEqual(self.get(), [1, 2])
+        self.assertEqual(self.get(), [1, 2])
+        self.assertEqual(self.builds, 1)
+
+    def test_stale_entry_is_served_while_rebuilt(self):
+        self.get()
+        self.items.append(3)
+        invalidate_tags("numbers")
+        self.assertEqual(self.get(), [1, 2])
+        self.wait_for_refresh()
+        self.assertEqual(self.get(), [1, 2, 3])
+
+        self.items.append(4)
+        swr_invalidate("items")
+        self.get()
+        self.wait_for_refresh()
+        self.assertEqual(self.get(), [1, 2, 3, 4])
+        self.assertEqual(self.builds, 3)
+
+    def test_patch(self):
+        swr_patch("items", lambda items: [*items, 3])
+        self.assertIsNone(cache.get("items"))
+        self.get()
+        swr_patch("items", lambda items: [*items, 3])
+        self.assertEqual(self.get(), [1, 2, 3])
+        self.assertEqual(self.builds, 1)
+
+    def test_rebuild_keeps_concurrent_patch(self):
+        self.get()
+
+        def build():
+            # a new item (and its patch) lands while the now outdated value is being built
+            items = self.build()
+            self.items.append(3)
+            swr_patch("items", lambda items: [*items, 3])
+            return items
+
+        swr_invalidate("items")
+        swr_get("items", build, tags=("numbers",))
+        self.wait_for_refresh()
+        self.assertEqual(self.get(), [1, 2, 3])
+        # the patched entry is rebuilt in the background
+        self.wait_for_refresh()
+        self.assertEqual(self.get(), [1, 2, 3])
+        self.assertEqual(self.builds, 3)
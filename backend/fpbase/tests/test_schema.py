@@ -1,9 +1,14 @@
+import hashlib
 import json
 
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from graphene_django.utils.testing import GraphQLTestCase
 
 from proteins import models
 
+from ..cache import get_version
 from ..schema import schema
 
 OPTICAL_CONFIG = """
@@ -144,6 +149,68 @@ class SpectraQueriesTestCase(GraphQLTestCase):
             str(self.spectrum.category.upper()),
         )
 
+    def test_spectrum_fields_are_batched(self):
+        ids = [self.spectrum.id]
+        for i in range(4):
+            dye = models.Dye.objects.create(name=f"batch-dye-{i}")
+            spectrum = models.Spectrum.objects.create(
+                category=models.Spectrum.DYE, subtype=models.Spectrum.EM, owner_dye=dye, data=[[0, 1], [1, 1]]
+            )
+            ids.append(spectrum.id)
+
+        def run(ids):
+            cache.clear()
+            fields = " ".join(f"s{i}: spectrum(id: {id}) {{ id owner {{ name }} }}" for i, id in enumerate(ids))
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.query(f"{{ {fields} }}")
+            self.assertResponseNoErrors(response)
+            return json.loads(response.content)["data"], len(ctx)
+
+        data, one = run(ids[:1])
+        data, many = run(ids)
+        self.assertEqual(one, many)
+        self.assertEqual([data[f"s{i}"]["id"] for i in range(len(ids))], [str(i) for i in ids])
+
+    def test_versions_bumped_once_on_commit(self):
+        before = get_version("spectra")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spectrum.save()
+            self.assertEqual(get_version("spectra"), before)
+        self.assertEqual(get_version("spectra"), before + 1)
+
+    def test_local_brightness_invalidates_responses(self):
+        from proteins.tasks import refresh_local_brightness
+
+        for i, ec in enumerate((20000, 80000)):
+            models.State.objects.create(name=f"s{i}", em_max=510, ext_coeff=ec, qy=0.5, protein=self.protein)
+        query = "{ states { name localBrightness } }"
+
+        def brightness():
+            response = self.query(query)
+            self.assertResponseNoErrors(response)
+            return {s["name"]: s["localBrightness"] for s in json.loads(response.content)["data"]["states"]}
+
+        self.assertEqual(brightness(), {"s0": 1, "s1": 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_local_brightness()
+        self.assertEqual(brightness(), {"s0": 0.25, "s1": 4})
+
+    def test_persisted_query(self):
+        query = "{ spectra { id } }"
+        sha = hashlib.sha256(query.encode()).hexdigest()
+        extensions = {"persistedQuery": {"version": 1, "sha256Hash": sha}}
+
+        def post(body):
+            return self.client.post(self.GRAPHQL_URL, json.dumps(body), content_type="application/json")
+
+        missing = json.loads(post({"extensions": extensions}).content)
+        self.assertEqual(missing["errors"][0]["message"], "PersistedQueryNotFound")
+        first = post({"query": query, "extensions": extensions})
+        self.assertResponseNoErrors(first)
+        second = post({"extensions": extensions})
+        self.assertResponseNoErrors(second)
+        self.assertEqual(json.loads(first.content), json.loads(second.content))
+
     def test_spectra(self):
         response = self.query(
             """
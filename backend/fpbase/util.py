@@ -3,6 +3,8 @@ from django.http import HttpRequest
 from django.urls import reverse
 from django.utils.cache import get_cache_key
 
+from .cache import uncache_path
+
 
 def get_view_cache_key(view_name, args=None, namespace=None, key_prefix=None, request=None):
     """
@@ -39,8 +41,15 @@ def clear_view_cache(*args, **kwargs):
     return key_deleted
 
 
-def uncache_protein_page(slug, request):
-    clear_view_cache("proteins:protein-detail", args=[slug], request=request)
+def uncache_view(view_name, args=None, namespace=None):
+    """drop every cached copy of a view decorated with fpbase.cache.cache_page"""
+    if namespace:
+        view_name = namespace + ":" + view_name
+    uncache_path(reverse(view_name, args=args or []))
+
+
+def uncache_protein_page(slug, request=None):
+    uncache_view("proteins:protein-detail", args=[slug])
 
 
 def show_queries():
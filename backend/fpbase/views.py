@@ -1,11 +1,19 @@
+import hashlib
+import json
+
 from django.conf import settings
 from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.http import HttpResponseBadRequest
 from django.shortcuts import render
 from django.views.decorators.cache import cache_page
 from django.views.generic import TemplateView
 from django.views.generic.edit import FormView
+from graphene_django.views import GraphQLView, HttpError
+from graphql import OperationType, get_operation_ast, parse
 from sentry_sdk import last_event_id
 
+from fpbase.cache import get_versions
 from fpbase.forms import ContactForm
 from proteins.models import Protein, Spectrum
 
@@ -60,3 +68,82 @@ def testview(request):
     p = Protein.objects.get(name="mNeonGreen")
     logger.info(p)
     return render(request, "pages/test.html", {"protein": p})
+
+
+# model versions (see fpbase.cache) that cached GraphQL responses depend on
+GRAPHQL_CACHE_VERSIONS = ("spectra", "optical_configs", "proteins")
+PERSISTED_QUERY_TIMEOUT = 60 * 60 * 24 * 30
+GRAPHQL_RESPONSE_TIMEOUT = 60 * 60 * 24
+
+
+class CachedGraphQLView(GraphQLView):
+    """GraphQLView with persisted queries and a response cache
+
+    Persisted queries follow the Apollo "automatic persisted queries"
+    protocol: the client sends extensions.persistedQuery.sha256Hash instead of
+    the query, and resends the full query only if the server doesn't know
+    the hash yet.
+
+    Successful query (not mutation) responses are cached by (query hash,
+    variables, operation name) and the GRAPHQL_CACHE_VERSIONS counters, so
+    repeated queries are served without parsing or executing anything.
+    """
+
+    def resolve_persisted_query(self, request, data):
+        """fill in data["query"] from a persisted query hash; returns the query hash (or None)"""
+        extensions = request.GET.get("extensions") or data.get("extensions")
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                extensions = None
+        persisted = (extensions or {}).get("persistedQuery")
+        if not persisted:
+            return None
+        query_hash = str(persisted.get("sha256Hash", ""))
+        query = request.GET.get("query") or data.get("query")
+        key = f"graphql:pq:{query_hash}"
+        if query:
+            if hashlib.sha256(query.encode()).hexdigest() != query_hash:
+                raise HttpError(HttpResponseBadRequest("provided sha256Hash does not match query"))
+            cache.set(key, query, PERSISTED_QUERY_TIMEOUT)
+        else:
+            query = cache.get(key)
+            if query is None:
+                return False
+            data["query"] = query
+        return query_hash
+
+    def execute_graphql_request(self, request, data, query, variables, operation_name, show_graphiql=False):
+        result = super().execute_graphql_request(request, data, query, variables, operation_name, show_graphiql)
+        if result is not None and not result.errors:
+            operation = get_operation_ast(parse(query), operation_name)
+            request._graphql_cacheable = operation is not None and operation.operation == OperationType.QUERY
+        return result
+
+    def get_response(self, request, data, show_graphiql=False):
+        query_hash = self.resolve_persisted_query(request, data)
+        if query_hash is False:
+            errors = [{"message": "PersistedQueryNotFound", "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}}]
+            return self.json_encode(request, {"errors": errors}), 200
+
+        query, variables, operation_name, _ = self.get_graphql_params(request, data)
+        if self.batch or show_graphiql or not query or request.GET.get("pretty"):
+            return super().get_response(request, data, show_graphiql)
+
+        query_hash = query_hash or hashlib.sha256(query.encode()).hexdigest()
+        params = json.dumps([variables, operation_name], sort_keys=True)
+        key = "graphql:response:{}:{}:{}".format(
+            query_hash,
+            hashlib.md5(params.encode()).hexdigest(),
+            ".".join(map(str, get_versions(*GRAPHQL_CACHE_VERSIONS))),
+        )
+        result = cache.get(key)
+        if result is not None:
+            return result, 200
+
+        request._graphql_cacheable = False
+        result, status_code = super().get_response(request, data, show_graphiql)
+        if status_code == 200 and request._graphql_cacheable:
+            cache.set(key, result, GRAPHQL_RESPONSE_TIMEOUT)
+        return result, status_code
@@ -1,4 +1,4 @@
-from .align import ParasailAlignment, align_seqs
+from .align import ParasailAlignment, align_seqs, alignment_cache
 from .fpseq import FPSeq, from_fpbase
 from .mutations import Mutation, MutationSet, get_mutations, mutate_sequence
 from .skbio_protein import SkbSequence
@@ -10,6 +10,7 @@ __all__ = [
     "SkbSequence",
     "ParasailAlignment",
     "align_seqs",
+    "alignment_cache",
     "Mutation",
     "MutationSet",
     "get_mutations",
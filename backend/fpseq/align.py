@@ -1,22 +1,95 @@
 try:
-    from parasail import blosum62, nw_banded, nw_trace_scan_sat
+    from parasail import blosum62, nw_banded, nw_scan_sat, nw_trace_scan_sat
 except ImportError:
     import warnings
 
     warnings.warn("ERROR!!! could not import parasail... will not be able to align", stacklevel=2)
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
 from .util import chunked_lines
 
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+class AlignmentCache:
+    """Bounded, thread-safe LRU cache of alignment results
+
+    keys are a hash of (query, target, gop, gep, band_size), values are the
+    (cigar, cigar_tuple, score) of the alignment.
+    """
+
+    def __init__(self, maxsize=8192):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query, target, gop, gep, band_size):
+        return hashlib.blake2b(f"{query}\0{target}\0{gop}\0{gep}\0{band_size}".encode(), digest_size=16).digest()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+
+alignment_cache = AlignmentCache()
+
 
 def align_seqs(query, target, gop=5, gep=1, band_size=0):
     """basic parasail global alignment of two sequences
-    result is wrapped in ParasailAlignment Class"""
+    result is wrapped in ParasailAlignment Class
+
+    results are memoized in alignment_cache (see alignment_cache.info())"""
     query = str(query)
     target = str(target)
+    key = AlignmentCache.make_key(query, target, gop, gep, band_size)
+    cached = alignment_cache.get(key)
+    if cached is not None:
+        return ParasailAlignment.from_cigar(query, target, *cached)
     if band_size:
         result = nw_banded(target, query, gop, gep, band_size, blosum62)
     else:
         result = nw_trace_scan_sat(target, query, gop, gep, blosum62)
-    return ParasailAlignment(result)
+    algn = ParasailAlignment(result)
+    alignment_cache.set(key, (algn.cigar, tuple(algn.cigar_tuple), algn.score))
+    return algn
+
+
+def alignment_score(query, target, gop=5, gep=1, band_size=0):
+    """score of the global alignment of two sequences
+
+    no traceback is computed, so this is much faster than align_seqs when
+    only the score is needed (e.g. to rank many targets)"""
+    if band_size:
+        return nw_banded(str(target), str(query), gop, gep, band_size, blosum62).score
+    return nw_scan_sat(str(target), str(query), gop, gep, blosum62).score
 
 
 def parental_numbering(aseq1, aseq2):
@@ -126,6 +199,18 @@ class ParasailAlignment:
                 index += length
         return aligned_sequence
 
+    @classmethod
+    def from_cigar(cls, query, target, cigar, cigar_tuple, score):
+        """rebuild an alignment from a stored cigar (without re-running parasail)"""
+        self = cls.__new__(cls)
+        self.cigar = cigar
+        self._cigar_tuple = cigar_tuple
+        self.target = target
+        self.query = query
+        self.score = score
+        self._mutations = None
+        return self
+
     @classmethod
     def from_seqs(cls, query, target, **kwargs):
         return align_seqs(query, target, **kwargs)
@@ -1,6 +1,6 @@
 import pytest
 
-from . import Mutation, mutate_sequence
+from . import Mutation, align_seqs, alignment_cache, mutate_sequence
 
 
 class TestMutations:
@@ -65,3 +65,28 @@ class TestMutations:
         )
         result = mutate_sequence(mruby, "N2_S3delinsVSKGEE/L15M/I102V/A119V/A131P/*228MextDELYK")
         assert result == mruby2
+
+
+class TestAlignmentCache:
+    def test_cached_alignment(self):
+        alignment_cache.clear()
+        first = align_seqs("MVSKGEELFTGVV", "MVSKGEELFTG")
+        second = align_seqs("MVSKGEELFTGVV", "MVSKGEELFTG")
+        assert alignment_cache.info()[:2] == (1, 1)
+        assert (second.cigar, second.score) == (first.cigar, first.score)
+        assert list(second) == list(first)
+        assert str(second.as_mutations()) == str(first.as_mutations())
+
+    def test_cache_is_bounded(self):
+        alignment_cache.clear()
+        maxsize = alignment_cache.maxsize
+        alignment_cache.maxsize = 2
+        try:
+            for target in ("MVSK", "MVSKG", "MVSKGE"):
+                align_seqs("MVSKGEE", target)
+            assert alignment_cache.info().currsize == 2
+            align_seqs("MVSKGEE", "MVSK")
+            assert alignment_cache.info().hits == 0
+        finally:
+            alignment_cache.maxsize = maxsize
+            alignment_cache.clear()
@@ -1,10 +1,11 @@
 from rest_framework import serializers
 
-from ..models import Protein, Spectrum, State, StateTransition
+from ..models import FRETPair, Protein, Spectrum, State, StateTransition
 from ._tweaks import ModelSerializer
 
 
 class SpectrumSerializer(serializers.ModelSerializer):
+    data = serializers.SerializerMethodField()
     owner_id = serializers.IntegerField(source="owner.id")
     owner_slug = serializers.CharField(source="owner.slug")
     protein_name = serializers.SerializerMethodField()
@@ -28,6 +29,9 @@ class SpectrumSerializer(serializers.ModelSerializer):
             "peak_wave",
         )
 
+    def get_data(self, obj):
+        return obj.pairs()
+
     def get_protein_name(self, obj):
         if obj.owner_state:
             return obj.owner_state.protein.name
@@ -37,6 +41,26 @@ class SpectrumSerializer(serializers.ModelSerializer):
             return obj.owner_state.protein.slug
 
 
+class FRETPairSerializer(serializers.ModelSerializer):
+    donor = serializers.SlugRelatedField(read_only=True, slug_field="slug")
+    acceptor = serializers.SlugRelatedField(read_only=True, slug_field="slug")
+    donor_name = serializers.CharField(source="donor.name", read_only=True)
+    acceptor_name = serializers.CharField(source="acceptor.name", read_only=True)
+
+    class Meta:
+        model = FRETPair
+        fields = (
+            "donor",
+            "donor_name",
+            "acceptor",
+            "acceptor_name",
+            "overlap",
+            "forster",
+            "forster_qya",
+            "emdist",
+        )
+
+
 class StateTransitionSerializer(serializers.ModelSerializer):
     from_state = serializers.SlugRelatedField(read_only=True, slug_field="slug")
     to_state = serializers.SlugRelatedField(read_only=True, slug_field="slug")
@@ -48,7 +72,7 @@ class StateTransitionSerializer(serializers.ModelSerializer):
 
 class SpectrumField(serializers.Field):
     def to_representation(self, obj):
-        return obj.data
+        return obj.pairs()
 
 
 class StateSpectraSerializer(serializers.ModelSerializer):
@@ -23,6 +23,8 @@ urlpatterns = [
         name="basic-protein-api",
     ),
     path("proteins/states/", views.StatesListAPIView.as_view(), name="states-api"),
+    path("proteins/fret/", views.FRETPairListAPIView.as_view(), name="fret-api"),
+    path("proteins/similar/", views.similar_sequences, name="similar-api"),
     # /proteins/:slug/
     # re_path(
     #     r"^(?P<slug>[-\w]+)/$",
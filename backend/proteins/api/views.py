@@ -1,23 +1,27 @@
-from django.db.models import F, Max
-from django.http import HttpResponse
+from django.db.models import F, Max, Prefetch
+from django.http import HttpResponse, JsonResponse
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
 from django_filters import rest_framework as filters
 from rest_framework.generics import (
     ListAPIView,
     RetrieveAPIView,
     RetrieveUpdateDestroyAPIView,
 )
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.settings import api_settings
 from rest_framework_csv import renderers as r
 
-from ..filters import ProteinFilter, SpectrumFilter, StateFilter
-from ..models import Protein, State
+from fpbase.cache import cache_page
+
+from ..filters import FRETPairFilter, ProteinFilter, SpectrumFilter, StateFilter
+from ..models import FRETPair, Protein, State
 from ..models.microscope import get_cached_optical_configs
 from ..models.spectrum import Spectrum, get_cached_spectra_info
+from ..util.kmer import MAX_QUERY_LENGTH, similar_proteins
 from .serializers import (
     BasicProteinSerializer,
+    FRETPairSerializer,
     ProteinSerializer,
     ProteinSerializer2,
     ProteinSpectraSerializer,
@@ -36,15 +40,33 @@ def ocinfo(request):
     return HttpResponse(ocinfo, content_type="application/json")
 
 
+def similar_sequences(request):
+    """proteins with the most similar sequence to ?seq=, e.g. ?seq=MVSKGEELF...&n=5"""
+    seq = "".join(request.GET.get("seq", "").split()).upper()
+    if not seq:
+        return JsonResponse({"error": "the 'seq' parameter is required"}, status=400)
+    if len(seq) > MAX_QUERY_LENGTH:
+        return JsonResponse({"error": f"'seq' must be at most {MAX_QUERY_LENGTH} residues"}, status=400)
+    try:
+        n = min(max(int(request.GET.get("n", 10)), 1), 50)
+    except ValueError:
+        return JsonResponse({"error": "'n' must be an integer"}, status=400)
+    results = [
+        {"uuid": p.uuid, "name": p.name, "slug": p.slug, "identity": round(ident, 4), "score": score}
+        for p, ident, score in similar_proteins(seq, n=n)
+    ]
+    return JsonResponse(results, safe=False)
+
+
 class SpectrumList(ListAPIView):
-    queryset = Spectrum.objects.all()
+    queryset = Spectrum.objects.packed()
     serializer_class = SpectrumSerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filterset_class = SpectrumFilter
 
 
 class SpectrumDetail(RetrieveAPIView):
-    queryset = Spectrum.objects.prefetch_related("owner_state")
+    queryset = Spectrum.objects.packed().prefetch_related("owner_state")
     permission_classes = (AllowAny,)
     serializer_class = SpectrumSerializer
 
@@ -58,7 +80,7 @@ class ProteinListAPIView2(ListAPIView):
     filterset_class = ProteinFilter
     renderer_classes = [r.CSVRenderer, *api_settings.DEFAULT_RENDERER_CLASSES]
 
-    @method_decorator(cache_page(60 * 10))
+    @method_decorator(cache_page(60 * 10, vary_on_headers=("Accept",)))
     def dispatch(self, *args, **kwargs):
         return super().dispatch(*args, **kwargs)
 
@@ -72,7 +94,7 @@ class ProteinListAPIView(ListAPIView):
     filterset_class = ProteinFilter
     renderer_classes = [r.CSVRenderer, *api_settings.DEFAULT_RENDERER_CLASSES]
 
-    @method_decorator(cache_page(60 * 10))
+    @method_decorator(cache_page(60 * 10, vary_on_headers=("Accept",)))
     def dispatch(self, *args, **kwargs):
         return super().dispatch(*args, **kwargs)
 
@@ -114,4 +136,17 @@ class StatesListAPIView(ListAPIView):
 class ProteinSpectraListAPIView(ListAPIView):
     permission_classes = (AllowAny,)
     serializer_class = ProteinSpectraSerializer
-    queryset = Protein.objects.with_spectra().prefetch_related("states")
+    queryset = Protein.objects.with_spectra().prefetch_related(
+        "states", Prefetch("states__spectra", queryset=Spectrum.objects.packed())
+    )
+
+
+class FRETPairListAPIView(ListAPIView):
+    """precomputed FRET pairs, e.g. ?donor=egfp&forster__gt=5&emdist__gt=40&order_by=-forster"""
+
+    queryset = FRETPair.objects.select_related("donor", "acceptor")
+    permission_classes = (AllowAny,)
+    serializer_class = FRETPairSerializer
+    pagination_class = LimitOffsetPagination
+    filter_backends = (filters.DjangoFilterBackend,)
+    filterset_class = FRETPairFilter
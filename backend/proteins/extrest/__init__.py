@@ -74,10 +74,15 @@ def compare_info(gb_info, up_info):
 
 
 def integrity_check(protein):
-    changes = ChangeSet(protein)
-    warnings = []
     gbD = get_gb_info(protein.genbank) if protein.genbank else None
     upD = get_uniprot_info(protein.uniprot) if protein.uniprot else None
+    return compare_protein(protein, gbD, upD)
+
+
+def compare_protein(protein, gbD, upD):
+    """ChangeSet & warnings for a protein, given its genbank and uniprot info (either may be None)"""
+    changes = ChangeSet(protein)
+    warnings = []
     if gbD and upD:
         [warnings.append(item) for item in compare_info(gbD, upD)]
     if gbD:
@@ -1,10 +1,13 @@
+import collections
 import json
 import logging
 import re
+import threading
 import time
 import xml.etree.ElementTree as ET
 
 from Bio import Entrez, SeqIO
+from django.conf import settings
 from django.core.cache import cache
 
 from references.helpers import pmid2doi
@@ -12,6 +15,7 @@ from references.helpers import pmid2doi
 logger = logging.getLogger(__name__)
 
 Entrez.email = "talley_lambert@hms.harvard.edu"
+Entrez.api_key = settings.NCBI_API_KEY or None
 
 
 # genbank protein accession
@@ -22,17 +26,20 @@ gbnucrx = re.compile(r"^([A-Za-z]{2}\d{6}\.?\d?)|([A-Za-z]{1}\d{5}\.?\d?)")
 refseqrx = re.compile("(NC|AC|NG|NT|NW|NZ|NM|NR|XM|XR|NP|AP|XP|YP|ZP)_[0-9]+")
 
 
-def get_taxonomy_id(term, autochoose=False):
-    record = Entrez.read(Entrez.esearch(db="taxonomy", term=term))
+def get_taxonomy_id(term, autochoose=False, transport=None):
+    transport = transport or Entrez
+    ncbi_throttle()
+    record = transport.read(transport.esearch(db="taxonomy", term=term))
     if "ErrorList" in record and "PhraseNotFound" in record["ErrorList"]:
-        spell_cor = get_entrez_spelling(term)
+        spell_cor = get_entrez_spelling(term, transport=transport)
         if spell_cor:
             if autochoose:
                 response = "y"
             else:
                 response = input(f'By "{term}", did you mean "{spell_cor}"? (y/n): ')
             if response.lower() == "y":
-                record = Entrez.read(Entrez.esearch(db="taxonomy", term=spell_cor))
+                ncbi_throttle()
+                record = transport.read(transport.esearch(db="taxonomy", term=spell_cor))
     if record["Count"] == "1":
         return record["IdList"][0]
     elif int(record["Count"]) > 1:
@@ -40,8 +47,10 @@ def get_taxonomy_id(term, autochoose=False):
     return None
 
 
-def get_entrez_spelling(term, db="taxonomy"):
-    record = Entrez.read(Entrez.espell(db=db, term=term))
+def get_entrez_spelling(term, db="taxonomy", transport=None):
+    transport = transport or Entrez
+    ncbi_throttle()
+    record = transport.read(transport.espell(db=db, term=term))
     if record.get("CorrectedQuery"):
         return record.get("CorrectedQuery")
     else:
@@ -136,9 +145,11 @@ def fetch_ipg_sequence(protein_name=None, uid=None):
     return (ipg_uid, prot_seq)
 
 
-def get_ipgid_from_gbid(gbid):
-    with Entrez.esearch(db="ipg", term=gbid) as handle:
-        record = Entrez.read(handle)
+def get_ipgid_from_gbid(gbid, transport=None):
+    transport = transport or Entrez
+    ncbi_throttle()
+    with transport.esearch(db="ipg", term=gbid) as handle:
+        record = transport.read(handle)
     if record["Count"] == "1":  # we got a unique hit
         return record["IdList"][0]
 
@@ -154,17 +165,81 @@ def check_accession_type(gbid):
     return database
 
 
-def get_cached_gbseqs(gbids, max_age=60 * 60 * 24):
-    gbseqs = cache.get("gbseqs", {})
-    now = time.time()
-    tofetch = [id for id in gbids if id not in gbseqs or gbseqs[id][1] - now >= max_age]
-    gbseqs.update({k: (v, now) for k, v in fetch_gb_seqs(tofetch).items()})
-    cache.set("gbseqs", gbseqs, 60 * 60 * 24)
-    return gbseqs
+GBSEQ_KEY = "gbseq:{}"
+NCBI_RATE_KEY = "ncbi_requests:{}"
+
+
+_local_requests = collections.deque()
+_local_lock = threading.Lock()
+
+
+def _local_throttle(limit):
+    # sliding one second window, for this process only
+    with _local_lock:
+        while True:
+            now = time.monotonic()
+            while _local_requests and now - _local_requests[0] >= 1:
+                _local_requests.popleft()
+            if len(_local_requests) < limit:
+                _local_requests.append(now)
+                return
+            time.sleep(1 - (now - _local_requests[0]))
+
+
+def ncbi_throttle():
+    """block until another NCBI E-utilities request is allowed
+
+    NCBI allows 3 requests per second per IP (10 with an API key).  The count
+    is shared between processes through the cache, since celery workers and
+    web processes all hit NCBI from the same address.  Without a usable cache
+    (e.g. DummyCache in local development) requests are limited per process.
+    """
+    limit = 10 if Entrez.api_key else 3
+    while True:
+        now = time.time()
+        key = NCBI_RATE_KEY.format(int(now))
+        cache.add(key, 0, 5)
+        try:
+            count = cache.incr(key)
+        except ValueError:  # the counter isn't stored (or expired between add & incr)
+            return _local_throttle(limit)
+        if count <= limit:
+            return
+        time.sleep(1 - now % 1)
+
+
+def get_cached_gbseqs(gbids, max_age=60 * 60 * 24 * 7, transport=None):
+    """{accession: sequence} for genbank IDs, fetching only those not cached in the last max_age seconds
+
+    each accession is cached under its own key, so concurrent callers never
+    overwrite each other's results.  Accessions that NCBI doesn't know are
+    cached (as "") too, and left out of the result.
+    """
+    gbids = list(dict.fromkeys(gbids))
+    cached = cache.get_many([GBSEQ_KEY.format(id) for id in gbids])
+    seqs = {id: cached[GBSEQ_KEY.format(id)] for id in gbids if GBSEQ_KEY.format(id) in cached}
+    tofetch = [id for id in gbids if id not in seqs]
+    if tofetch:
+        fetched = fetch_gb_seqs(tofetch, transport=transport)
+        fetched = {id: fetched.get(id, "") for id in tofetch}
+        cache.set_many({GBSEQ_KEY.format(id): seq for id, seq in fetched.items()}, max_age)
+        seqs.update(fetched)
+    return {id: seq for id, seq in seqs.items() if seq}
 
 
-def fetch_gb_seqs(gbids):
-    """Retrieve protein sequence for multiple genbank IDs, (regardless of accession type)"""
+def _efetch_fasta(transport, db, ids):
+    ncbi_throttle()
+    with transport.efetch(db=db, id=ids, rettype="fasta", retmode="text") as handle:
+        return list(SeqIO.parse(handle, "fasta"))
+
+
+def fetch_gb_seqs(gbids, batch_size=200, transport=None):
+    """Retrieve protein sequence for multiple genbank IDs, (regardless of accession type)
+
+    IDs are fetched batch_size at a time.  transport defaults to Bio.Entrez,
+    anything with a compatible `efetch` (such as a fake in tests) will do.
+    """
+    transport = transport or Entrez
     prots = []
     nucs = []
     for id in gbids:
@@ -177,14 +252,12 @@ def fetch_gb_seqs(gbids):
             prots.append(id)
             logger.error(f"Could not determine accession type for {id}")
     records = {}
-    if len(nucs):
-        with Entrez.efetch(db="nuccore", id=nucs, rettype="fasta", retmode="text") as handle:
-            records.update(
-                {x.id.split(".")[0]: str(x.translate().seq).strip("*") for x in SeqIO.parse(handle, "fasta")}
-            )
-    if len(prots):
-        with Entrez.efetch(db="protein", id=prots, rettype="fasta", retmode="text") as handle:
-            records.update({x.id.split(".")[0]: str(x.seq).strip("*") for x in SeqIO.parse(handle, "fasta")})
+    for i in range(0, len(nucs), batch_size):
+        for x in _efetch_fasta(transport, "nuccore", nucs[i : i + batch_size]):
+            records[x.id.split(".")[0]] = str(x.translate().seq).strip("*")
+    for i in range(0, len(prots), batch_size):
+        for x in _efetch_fasta(transport, "protein", prots[i : i + batch_size]):
+            records[x.id.split(".")[0]] = str(x.seq).strip("*")
     return records
 
 
@@ -301,9 +374,8 @@ def parse_gbprot_record(record):
     annotations = getattr(record, "annotations", None)
     features = getattr(record, "features", None)
     D["desc"] = getattr(record, "description", None)
-    if hasattr(record, "_seq"):
-        if hasattr(record._seq, "_data"):
-            D["seq"] = record._seq._data
+    if getattr(record, "seq", None):
+        D["seq"] = str(record.seq)
 
     if annotations:
         refs = annotations.get("references")
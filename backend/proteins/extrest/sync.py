@@ -0,0 +1,173 @@
+"""Bulk version of integrity_check, for many proteins at once.
+
+integrity_check looks up one protein at a time, and each lookup makes
+several blocking requests (GenBank record, IPG ID, taxonomy ID, UniProt
+record & ID mappings, GenBank sequences of the mapped IDs).  ExternalSync
+makes the same lookups for all proteins in a few phases.  Each phase is a
+set of unique lookups run on a thread pool, so proteins from the same
+organism share one taxonomy lookup, and GenBank records are fetched
+batch_size per efetch request.  All NCBI requests pass through
+ncbi_throttle, so the pool size only bounds concurrency.
+
+`entrez` (Bio.Entrez) and `http` (requests) can be replaced by anything with
+the same methods, e.g. fakes serving recorded responses.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from Bio import Entrez, SeqIO
+
+from ..models import Protein
+from ..validators import validate_uniprot
+from . import compare_protein
+from .entrez import (
+    check_accession_type,
+    get_ipgid_from_gbid,
+    get_taxonomy_id,
+    ncbi_throttle,
+    parse_gbnuc_record,
+    parse_gbprot_record,
+)
+from .uniprot import get_uniprot_record, map_retrieve, parse_uniprot_record
+
+logger = logging.getLogger(__name__)
+
+
+def _base(accession):
+    return accession.split(".")[0]
+
+
+def _lines(text):
+    return [i for i in (text or "").strip().split("\n") if i]
+
+
+class ExternalSync:
+    def __init__(self, entrez=None, http=None, max_workers=4, batch_size=200):
+        self.entrez = entrez or Entrez
+        self.http = http or requests
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+
+    def lookup_all(self, items):
+        """{(kind, key): result} for the unique (kind, key) items, looked up on the thread pool
+
+        failed and empty lookups are logged and left out.
+        """
+        items = list(dict.fromkeys(i for i in items if i[1]))
+
+        def call(item):
+            kind, key = item
+            try:
+                return getattr(self, f"_get_{kind}")(key)
+            except Exception as e:
+                logger.warning(f"{kind} lookup for {key!r} failed: {e}")
+                return None
+
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            results = list(pool.map(call, items))
+        return {item: result for item, result in zip(items, results, strict=True) if result}
+
+    def _get_gb_records(self, batch):
+        db, ids = batch
+        ncbi_throttle()
+        with self.entrez.efetch(db=db, id=list(ids), rettype="gb", retmode="text") as handle:
+            return [(db, record) for record in SeqIO.parse(handle, "genbank")]
+
+    def _get_taxonomy(self, organism):
+        return get_taxonomy_id(organism, autochoose=True, transport=self.entrez)
+
+    def _get_ipg(self, accession):
+        return get_ipgid_from_gbid(accession, transport=self.entrez)
+
+    def _get_gb_uniprots(self, gb_prot):
+        return _lines(map_retrieve(gb_prot, source_fmt="EMBL", transport=self.http))
+
+    def _get_uniprot(self, uniprot):
+        return get_uniprot_record(uniprot, transport=self.http)
+
+    def _get_uniprot_embl(self, uniprot):
+        return _lines(map_retrieve(uniprot, target_fmt="EMBL", transport=self.http))
+
+    def genbank_records(self, accessions):
+        """{accession (without version): (db, SeqRecord)}, batch_size accessions per request"""
+        by_db = {}
+        for acc in dict.fromkeys(map(_base, accessions)):
+            db = check_accession_type(acc)
+            if db:
+                by_db.setdefault(db, []).append(acc)
+        batches = [
+            ("gb_records", (db, tuple(ids[i : i + self.batch_size])))
+            for db, ids in by_db.items()
+            for i in range(0, len(ids), self.batch_size)
+        ]
+        records = {}
+        for found in self.lookup_all(batches).values():
+            records.update({_base(record.id): (db, record) for db, record in found})
+        return records
+
+    def run(self, proteins=None):
+        """[(ChangeSet, warnings)] for proteins (default: all with a genbank or uniprot ID)"""
+        if proteins is None:
+            proteins = Protein.objects.exclude(genbank=None, uniprot=None).select_related("parent_organism")
+        proteins = list(proteins)
+
+        # 1. uniprot records and the genbank IDs they map to
+        uniprots = set()
+        for p in proteins:
+            try:
+                validate_uniprot(p.uniprot or "")
+                uniprots.add(p.uniprot)
+            except Exception:
+                if p.uniprot:
+                    logger.error(f"invalid uniprot ID for {p}: {p.uniprot}")
+        found = self.lookup_all([(kind, u) for u in uniprots for kind in ("uniprot", "uniprot_embl")])
+
+        # 2. genbank records, of our accessions and of those uniprot maps to
+        embl = {u: found.get(("uniprot_embl", u), []) for u in uniprots}
+        records = self.genbank_records(
+            [p.genbank for p in proteins if p.genbank] + [i for v in embl.values() for i in v]
+        )
+
+        gb_info = {}
+        for p in proteins:
+            if p.genbank and _base(p.genbank) in records:
+                db, record = records[_base(p.genbank)]
+                gb_info[p.genbank] = parse_gbprot_record(record) if db == "protein" else parse_gbnuc_record(record)
+
+        # 3. per genbank record: IPG ID, taxonomy ID of the organism & uniprot IDs
+        found.update(
+            self.lookup_all(
+                [("ipg", acc) for acc in gb_info]
+                + [("taxonomy", D.get("organism")) for D in gb_info.values()]
+                + [("gb_uniprots", D.get("gb_prot")) for D in gb_info.values()]
+            )
+        )
+        for acc, D in gb_info.items():
+            D.pop("pmids", None)
+            D["ipg_id"] = found.get(("ipg", acc))
+            taxid = found.get(("taxonomy", D.get("organism")))
+            if taxid:
+                D["organism"] = int(taxid)
+            else:
+                D.pop("organism", None)
+            D["uniprots"] = found.get(("gb_uniprots", D.get("gb_prot")), [])
+
+        up_info = {}
+        for u in uniprots:
+            if ("uniprot", u) not in found:
+                continue
+            D = parse_uniprot_record(found[("uniprot", u)])
+            D["uniprot"] = u
+            D["genbank"] = []
+            for acc in embl[u]:
+                db, record = records.get(_base(acc), (None, None))
+                if record is None:
+                    continue
+                seq = str(record.seq) if db == "protein" else parse_gbnuc_record(record).get("seq")
+                if seq == D["seq"]:
+                    D["genbank"].append(_base(acc))
+            up_info[u] = D
+
+        return [compare_protein(p, gb_info.get(p.genbank), up_info.get(p.uniprot)) for p in proteins]
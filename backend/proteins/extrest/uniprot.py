@@ -28,8 +28,8 @@ def get_uniprot_info(unip_id):
     return D
 
 
-def get_uniprot_record(id):
-    response = requests.get(BASE + KB_ENDPOINT + str(id) + ".xml")
+def get_uniprot_record(id, transport=None):
+    response = (transport or requests).get(BASE + KB_ENDPOINT + str(id) + ".xml")
     if response.status_code == 200:
         return response.content
     else:
@@ -52,7 +52,7 @@ def parse_uniprot_record(content):
     return D
 
 
-def map_retrieve(ids2map, source_fmt="ACC+ID", target_fmt="ACC", output_fmt="list"):
+def map_retrieve(ids2map, source_fmt="ACC+ID", target_fmt="ACC", output_fmt="list", transport=None):
     """Map database identifiers from/to UniProt accessions.
     The mapping is achieved using the RESTful mapping service provided by
     UniProt. While a great many identifiers can be mapped the documentation
@@ -66,6 +66,8 @@ def map_retrieve(ids2map, source_fmt="ACC+ID", target_fmt="ACC", output_fmt="lis
     target_fmt (str, optional): desired identifier format. Defaults
     to ACC, which is UniProt accessions.
     output_fmt (str, optional): return format of data. Defaults to list.
+    transport (optional): requests-like object used for the HTTP request.
+    Defaults to requests.
     Returns:
     mapped identifiers (str)
     """
@@ -77,7 +79,7 @@ def map_retrieve(ids2map, source_fmt="ACC+ID", target_fmt="ACC", output_fmt="lis
         "format": output_fmt,
         "query": ids2map,
     }
-    response = requests.get(BASE + TOOL_ENDPOINT, params=payload)
+    response = (transport or requests).get(BASE + TOOL_ENDPOINT, params=payload)
     if response.ok:
         return response.text
     else:
@@ -1,51 +1,58 @@
 import django_filters
 from Bio import Seq
 from django import forms
+from django.db.models import Case, When
 from django_filters import rest_framework as filters
 
-from .models import Organism, Protein, Spectrum, State
+from .models import FRETPair, Organism, Protein, Spectrum, State
+from .util.kmer import MAX_QUERY_LENGTH, get_seq_index
 from .validators import cdna_sequence_validator
 
 
+def validate_query_length(value):
+    if len("".join(value.split())) > MAX_QUERY_LENGTH:
+        raise forms.ValidationError(f"sequence must be at most {MAX_QUERY_LENGTH} residues")
+
+
 class SpectrumFilter(filters.FilterSet):
     class Meta:
         model = Spectrum
         fields = ("category", "subtype", "id", "owner_state")
 
 
+class FRETPairFilter(filters.FilterSet):
+    donor = django_filters.CharFilter(field_name="donor__slug", help_text="donor protein slug")
+    acceptor = django_filters.CharFilter(field_name="acceptor__slug", help_text="acceptor protein slug")
+    order_by = django_filters.OrderingFilter(fields=("forster", "forster_qya", "overlap", "emdist"))
+
+    class Meta:
+        model = FRETPair
+        fields = {
+            "forster": ["gt", "gte", "lt", "lte"],
+            "forster_qya": ["gt", "gte", "lt", "lte"],
+            "overlap": ["gt", "gte", "lt", "lte"],
+            "emdist": ["gt", "gte", "lt", "lte"],
+        }
+
+
 class StateFilter(filters.FilterSet):
     ex_spectra = django_filters.BooleanFilter(field_name="ex_spectra", lookup_expr="isnull")
     em_spectra = django_filters.BooleanFilter(field_name="em_spectra", lookup_expr="isnull")
     spectral_brightness = django_filters.NumberFilter(
-        field_name="spectral_brightness",
-        method="get_specbright",
+        field_name="local_brightness",
         help_text="fold brightness relative to spectral neighbors",
     )
     spectral_brightness__gt = django_filters.NumberFilter(
-        field_name="spectral_brightness",
-        method="get_specbright_gt",
+        field_name="local_brightness",
         lookup_expr="gt",
         help_text="fold brightness relative to spectral neighbors",
     )
     spectral_brightness__lt = django_filters.NumberFilter(
-        field_name="spectral_brightness",
-        method="get_specbright_lt",
+        field_name="local_brightness",
         lookup_expr="lt",
         help_text="fold brightness relative to spectral neighbors",
     )
 
-    def get_specbright(self, queryset, name, value):
-        qsALL = list(queryset.all())
-        return [P for P in qsALL if P.local_brightness == value]
-
-    def get_specbright_lt(self, queryset, name, value):
-        qsALL = list(queryset.all())
-        return [P for P in qsALL if P.local_brightness < value]
-
-    def get_specbright_gt(self, queryset, name, value):
-        qsALL = list(queryset.all())
-        return [P for P in qsALL if P.local_brightness > value]
-
     class Meta:
         model = State
         order_by = "em_max"
@@ -80,19 +87,16 @@ class CharArrayFilter(filters.BaseCSVFilter, filters.CharFilter):
 
 class ProteinFilter(filters.FilterSet):
     spectral_brightness = django_filters.NumberFilter(
-        field_name="spectral_brightness",
-        method="get_specbright",
+        field_name="default_state__local_brightness",
         help_text="fold brightness relative to spectral neighbors",
     )
     spectral_brightness__gt = django_filters.NumberFilter(
-        field_name="spectral_brightness",
-        method="get_specbright_gt",
+        field_name="default_state__local_brightness",
         lookup_expr="gt",
         help_text="fold brightness relative to spectral neighbors",
     )
     spectral_brightness__lt = django_filters.NumberFilter(
-        field_name="spectral_brightness",
-        method="get_specbright_lt",
+        field_name="default_state__local_brightness",
         lookup_expr="lt",
         help_text="fold brightness relative to spectral neighbors",
     )
@@ -102,6 +106,13 @@ class ProteinFilter(filters.FilterSet):
         lookup_expr="cdna_contains",
         help_text="cDNA sequence (in frame)",
     )
+    seq__similar = django_filters.CharFilter(
+        field_name="seq",
+        method="similar_seq",
+        lookup_expr="similar",
+        validators=[validate_query_length],
+        help_text="amino acid sequence (most similar first)",
+    )
     pdb__contains = CharArrayFilter(field_name="pdb", lookup_expr="contains")
     # aliases__contains = CharArrayFilter(field_name='aliases', lookup_expr='icontains')
     name__icontains = django_filters.CharFilter(
@@ -218,20 +229,13 @@ class ProteinFilter(filters.FilterSet):
     # def name_or_alias_istartswith(self, queryset, name, value):
     #     return queryset.filter(name__istartswith=value) | queryset.filter(aliases__istartswith=value)
 
-    def get_specbright(self, queryset, name, value):
-        qsALL = list(queryset.all())
-        ids = [P.id for P in qsALL if P.default_state and P.default_state.local_brightness == value]
-        return queryset.filter(id__in=ids)
-
-    def get_specbright_lt(self, queryset, name, value):
-        qsALL = list(queryset.all())
-        ids = [P.id for P in qsALL if P.default_state and P.default_state.local_brightness < value]
-        return queryset.filter(id__in=ids)
-
-    def get_specbright_gt(self, queryset, name, value):
-        qsALL = list(queryset.all())
-        ids = [P.id for P in qsALL if P.default_state and P.default_state.local_brightness > value]
-        return queryset.filter(id__in=ids)
-
     def translate_cdna(self, queryset, name, value):
         return queryset.filter(seq__icontains=Seq.translate(value))
+
+    def similar_seq(self, queryset, name, value):
+        value = "".join(value.split())
+        uuids = [key for key, *_ in get_seq_index().search(value, n=20)]
+        if not uuids:
+            return queryset.none()
+        order = Case(*[When(uuid=u, then=i) for i, u in enumerate(uuids)])
+        return queryset.filter(uuid__in=uuids).order_by(order)
@@ -1,5 +1,13 @@
 # myapp/handlers.py
 from corsheaders.signals import check_request_enabled
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from fpbase.cache import bump_version, invalidate_tags
 
 
 def cors_allow_api_to_everyone(sender, request, **kwargs):
@@ -7,3 +15,250 @@ def cors_allow_api_to_everyone(sender, request, **kwargs):
 
 
 check_request_enabled.connect(cors_allow_api_to_everyone)
+
+
+def _sequences_changed(protein, deleted=False):
+    from .util.blast import mark_blastdb_stale
+    from .util.kmer import update_seq_index
+
+    mark_blastdb_stale()
+    update_seq_index(protein, deleted=deleted)
+
+
+@receiver(post_save, sender="proteins.Protein")
+def protein_seq_saved(sender, instance, created, **kwargs):
+    if (created and instance.seq) or instance.seq_changed():
+        transaction.on_commit(lambda: _sequences_changed(instance))
+
+
+@receiver(post_delete, sender="proteins.Protein")
+def protein_deleted(sender, instance, **kwargs):
+    if instance.seq:
+        transaction.on_commit(lambda: _sequences_changed(instance, deleted=True))
+
+
+# local brightness of a state depends on all states with a similar em_max
+
+
+@receiver(post_save, sender="proteins.State")
+def state_brightness_saved(sender, instance, created, **kwargs):
+    from .tasks import schedule_local_brightness
+
+    if created or instance.brightness_changed():
+        instance._loaded_brightness = (instance.em_max, instance.brightness)
+        transaction.on_commit(schedule_local_brightness)
+
+
+@receiver(post_delete, sender="proteins.State")
+def state_brightness_deleted(sender, instance, **kwargs):
+    from .tasks import schedule_local_brightness
+
+    if instance.em_max and instance.brightness:
+        transaction.on_commit(schedule_local_brightness)
+
+
+# flag OcFluorEff rows that need to be recomputed
+
+
+def _dirty_effs(**kwargs):
+    from .models import OcFluorEff
+
+    return OcFluorEff.objects.filter(**kwargs)
+
+
+@receiver(post_save, sender="proteins.State")
+@receiver(post_save, sender="proteins.Dye")
+def fluor_saved(sender, instance, created, **kwargs):
+    if not created:
+        _dirty_effs(content_type=ContentType.objects.get_for_model(sender), object_id=instance.id).mark_dirty()
+
+
+@receiver(post_save, sender="proteins.OpticalConfig")
+def optical_config_saved(sender, instance, created, **kwargs):
+    if not created:
+        _dirty_effs(oc_id=instance.id).mark_dirty()
+
+
+@receiver([post_save, post_delete], sender="proteins.FilterPlacement")
+def filter_placement_changed(sender, instance, **kwargs):
+    _dirty_effs(oc_id=instance.config_id).mark_dirty()
+
+
+@receiver([post_save, post_delete], sender="proteins.Spectrum")
+def spectrum_changed(sender, instance, **kwargs):
+    from .models import Dye, State
+
+    if instance.owner_state_id:
+        effs = _dirty_effs(content_type=ContentType.objects.get_for_model(State), object_id=instance.owner_state_id)
+    elif instance.owner_dye_id:
+        effs = _dirty_effs(content_type=ContentType.objects.get_for_model(Dye), object_id=instance.owner_dye_id)
+    elif instance.owner_filter_id:
+        effs = _dirty_effs(oc__filters=instance.owner_filter_id)
+    elif instance.owner_light_id or instance.owner_camera_id:
+        q = Q(oc__light_id=instance.owner_light_id) if instance.owner_light_id else Q()
+        if instance.owner_camera_id:
+            q |= Q(oc__camera_id=instance.owner_camera_id)
+        effs = _dirty_effs().filter(q)
+    else:
+        return
+    effs.mark_dirty()
+
+
+# identifiers resolved by the search box (see SearchIdentifier)
+
+
+@receiver(post_save, sender="proteins.Protein")
+@receiver(post_save, sender="proteins.Organism")
+@receiver(post_save, sender="references.Author")
+@receiver(post_save, sender="references.Reference")
+def search_target_saved(sender, instance, created=False, **kwargs):
+    from .models import SearchIdentifier
+
+    SearchIdentifier.reindex(instance)
+    if sender._meta.model_name == "protein":
+        loaded = getattr(instance, "_loaded_parent_organism_id", None)
+        if created or loaded != instance.parent_organism_id:
+            _reindex_organisms(loaded, instance.parent_organism_id)
+            instance._loaded_parent_organism_id = instance.parent_organism_id
+
+
+@receiver(post_delete, sender="proteins.Protein")
+@receiver(post_delete, sender="proteins.Organism")
+@receiver(post_delete, sender="references.Author")
+@receiver(post_delete, sender="references.Reference")
+def search_target_deleted(sender, instance, **kwargs):
+    from .models import SearchIdentifier
+
+    SearchIdentifier.objects.for_object(instance).delete()
+    if sender._meta.model_name == "protein":
+        _reindex_organisms(instance.parent_organism_id)
+
+
+def _reindex_organisms(*ids):
+    # the number of proteins ranks organisms of the same name
+    from .models import Organism, SearchIdentifier
+
+    for organism in Organism.objects.filter(id__in={i for i in ids if i}):
+        SearchIdentifier.reindex(organism)
+
+
+@receiver([post_save, post_delete], sender="references.ReferenceAuthor")
+def author_publications_changed(sender, instance, **kwargs):
+    from references.models import Author
+
+    from .models import SearchIdentifier
+
+    # the number of publications ranks authors of the same name
+    author = Author.objects.filter(id=instance.author_id).first()
+    if author is not None:
+        SearchIdentifier.reindex(author)
+
+
+# data checks (see proteins.util.datachecks) rerun for the protein that changed
+
+
+def _checked_protein_id(instance):
+    if instance._meta.model_name == "protein":
+        return instance.id
+    if instance._meta.model_name == "spectrum":
+        from .models import State
+
+        if instance.owner_state_id is None:
+            return None  # dye, filter, light and camera spectra have no protein
+
+        # the owner state may already be gone when cascading a protein delete
+        return State.objects.filter(id=instance.owner_state_id).values_list("protein_id", flat=True).first()
+    return instance.protein_id
+
+
+@receiver([post_save, post_delete], sender="proteins.Protein")
+@receiver([post_save, post_delete], sender="proteins.State")
+@receiver([post_save, post_delete], sender="proteins.StateTransition")
+@receiver([post_save, post_delete], sender="proteins.Lineage")
+@receiver([post_save, post_delete], sender="proteins.Spectrum")
+def rerun_datachecks(sender, instance, **kwargs):
+    from .util.datachecks import run_checks, triggered_checks
+
+    if sender._meta.model_name == "protein" and kwargs["signal"] is post_delete:
+        return  # findings are deleted with the protein
+    protein_id = _checked_protein_id(instance)
+    names = triggered_checks(sender._meta.model_name)
+    if protein_id is not None and names:
+        transaction.on_commit(lambda: run_checks(names, [protein_id]))
+
+
+# cached spectra matrix & lists (splice deleted rows out, mark stale when owners change)
+
+
+@receiver([post_save, post_delete], sender="proteins.Spectrum")
+def fluor_matrix_changed(sender, **kwargs):
+    from .models.spectrum import FLUOR_MATRIX_CACHE_KEY
+
+    transaction.on_commit(lambda: cache.delete(FLUOR_MATRIX_CACHE_KEY))
+
+
+@receiver([post_save, post_delete], sender="proteins.State")
+@receiver([post_save, post_delete], sender="proteins.Spectrum")
+def forster_list_changed(sender, instance, **kwargs):
+    from .models.fret import FORSTER_LIST_CACHE_KEY
+
+    # the list depends on state spectra, quantum yields & extinction coefficients
+    if sender._meta.model_name == "state" or instance.owner_state_id:
+        transaction.on_commit(lambda: cache.delete(FORSTER_LIST_CACHE_KEY))
+
+
+@receiver(post_delete, sender="proteins.Spectrum")
+def spectrum_deleted(sender, instance, **kwargs):
+    from .models.spectrum import patch_cached_spectra_info
+
+    spectrum_id = instance.id
+    transaction.on_commit(lambda: patch_cached_spectra_info(spectrum_id))
+
+
+@receiver(post_delete, sender="proteins.OpticalConfig")
+def optical_config_deleted(sender, instance, **kwargs):
+    from .models.microscope import patch_cached_optical_configs
+
+    oc_id = instance.id
+    transaction.on_commit(lambda: patch_cached_optical_configs(oc_id))
+
+
+@receiver([post_save, post_delete], sender="proteins.Protein")
+@receiver([post_save, post_delete], sender="proteins.State")
+@receiver([post_save, post_delete], sender="proteins.Dye")
+@receiver([post_save, post_delete], sender="proteins.Filter")
+@receiver([post_save, post_delete], sender="proteins.Light")
+@receiver([post_save, post_delete], sender="proteins.Camera")
+def spectrum_owner_changed(sender, **kwargs):
+    invalidate_tags("spectrum_owners")
+
+
+@receiver([post_save, post_delete], sender="proteins.Microscope")
+def microscope_changed(sender, **kwargs):
+    invalidate_tags("microscopes")
+
+
+# versions of the models that cached GraphQL responses depend on (see fpbase.views.CachedGraphQLView)
+GRAPHQL_VERSION_MODELS = {
+    "spectrum": "spectra",
+    "opticalconfig": "optical_configs",
+    "filterplacement": "optical_configs",
+    "microscope": "optical_configs",
+}
+UNVERSIONED_MODELS = {
+    "ocfluoreff",
+    "fretpair",
+    "proteinalias",
+    "searchidentifier",
+    "datacheckrun",
+    "datacheckfinding",
+}
+
+
+@receiver([post_save, post_delete])
+def bump_graphql_versions(sender, **kwargs):
+    meta = sender._meta
+    if meta.app_label in ("proteins", "references") and meta.model_name not in UNVERSIONED_MODELS:
+        # after commit, or a concurrent request could cache pre-commit data under the new version
+        name = GRAPHQL_VERSION_MODELS.get(meta.model_name, "proteins")
+        transaction.on_commit(lambda: bump_version(name))
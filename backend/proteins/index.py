@@ -2,40 +2,12 @@ from algoliasearch_django import AlgoliaIndex
 from algoliasearch_django.decorators import register
 
 from .models import Organism, Protein
+from .util.search_index import PROTEIN_INDEX_FIELDS
 
 
 @register(Protein)
 class ProteinIndex(AlgoliaIndex):
-    fields = (
-        "name",
-        "uuid",
-        "aliases",
-        "pdb",
-        "genbank",
-        "uniprot",
-        "ipg_id",
-        "_agg",
-        "img_url",
-        "switchType",
-        "url",
-        "date_published",
-        "created",
-        "rank",
-        "ga_views",
-        "n_faves",
-        "n_cols",
-        "ex",
-        "em",
-        "pka",
-        "ec",
-        "qy",
-        "em_css",
-        "local_brightness",
-        "seq",
-        "first_author",
-        "cofactor",
-        "color",
-    )
+    fields = PROTEIN_INDEX_FIELDS
     should_index = "is_visible"
     tags = "tags"
 
@@ -1,12 +1,19 @@
 from django.core.cache import cache
 from django.core.management.base import BaseCommand
 
+from proteins.models.fret import FORSTER_LIST_CACHE_KEY
+from proteins.util.fret import update_fret_pairs
 from proteins.util.helpers import forster_list
 
 
 class Command(BaseCommand):
-    help = "Cache Forster distance calculations across database"
+    help = "Update precomputed Forster distances across database, and cache the FRET table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Recompute all pairs, not just changed proteins")
 
     def handle(self, *app_labels, **options):
+        n = update_fret_pairs(full=options["full"])
+        self.stdout.write(f"recomputed FRET pairs for {n} proteins")
         L = forster_list()
-        cache.set("forster_list", L, 60 * 60 * 24)
+        cache.set(FORSTER_LIST_CACHE_KEY, L, 60 * 60 * 24)
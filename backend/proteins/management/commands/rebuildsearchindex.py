@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from proteins.models import Organism, Protein, SearchIdentifier
+from references.models import Author, Reference
+
+
+class Command(BaseCommand):
+    help = "Rebuild the identifiers resolved by the search box (protein names, accessions, authors, DOIs, organisms)"
+
+    def handle(self, *app_labels, **options):
+        rows = []
+        for model in (Protein, Author, Reference, Organism):
+            for obj in model.objects.iterator():
+                keys = SearchIdentifier.keys_for(obj)
+                if keys:
+                    url = obj.get_absolute_url()
+                    rows.extend(
+                        SearchIdentifier(key=k, kind=kind, weight=w, url=url, target=obj) for k, kind, w in keys
+                    )
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f"TRUNCATE {SearchIdentifier._meta.db_table}")
+            SearchIdentifier.objects.bulk_create(rows, batch_size=1000)
+        self.stdout.write(f"indexed {len(rows)} identifiers")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from proteins.util.maintain import refresh_lineage_annotations
+
+
+class Command(BaseCommand):
+    help = "Update stored root-relative mutations and validation errors for lineage nodes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Recompute all nodes, not just changed ones")
+
+    def handle(self, *app_labels, **options):
+        n = refresh_lineage_annotations(force=options["force"])
+        self.stdout.write(f"updated {n} lineage nodes")
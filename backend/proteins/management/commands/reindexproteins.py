@@ -0,0 +1,42 @@
+import json
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from proteins.models import Protein
+from proteins.util.search_index import protein_index_batches
+
+
+class Command(BaseCommand):
+    help = "Push all protein records to the Algolia index in batches (or write them to a file)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Records per Algolia request")
+        parser.add_argument("--output", help="Write the records to this file (JSON lines) instead of Algolia")
+
+    def handle(self, *app_labels, **options):
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                n = 0
+                for records, _ in protein_index_batches(batch_size=options["batch_size"]):
+                    for record in records:
+                        f.write(json.dumps(record, cls=DjangoJSONEncoder) + "\n")
+                    n += len(records)
+            self.stdout.write(f"wrote {n} records to {options['output']}")
+            return
+
+        if not apps.is_installed("algoliasearch_django"):
+            raise CommandError("Algolia is not configured (set ALGOLIA_API_KEY), use --output to write records")
+        from algoliasearch_django import algolia_engine
+
+        index = algolia_engine.client.init_index(algolia_engine.get_adapter(Protein).index_name)
+        saved = deleted = 0
+        for records, hidden in protein_index_batches(batch_size=options["batch_size"]):
+            if records:
+                index.save_objects(records)
+            if hidden:
+                index.delete_objects(hidden)
+            saved += len(records)
+            deleted += len(hidden)
+        self.stdout.write(f"indexed {saved} proteins, removed {deleted} hidden proteins")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from proteins.util.datachecks import CHECKS, run_checks
+
+
+class Command(BaseCommand):
+    help = "Rerun the data checks listed on the problems pages and store their findings"
+
+    def add_arguments(self, parser):
+        parser.add_argument("checks", nargs="*", help=f"Checks to run (default: all). One of {', '.join(CHECKS)}")
+
+    def handle(self, *app_labels, **options):
+        unknown = set(options["checks"]) - set(CHECKS)
+        if unknown:
+            raise CommandError(f"Unknown checks: {', '.join(sorted(unknown))}")
+        run_checks(options["checks"] or None)
+        self.stdout.write(f"ran {len(options['checks'] or CHECKS)} data checks")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from proteins.extrest.sync import ExternalSync
+from proteins.models import Protein
+
+
+class Command(BaseCommand):
+    help = "Compare proteins with their GenBank and UniProt records, and report (or apply) the suggested changes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("slugs", nargs="*", help="Proteins to check (default: all with a genbank or uniprot ID)")
+        parser.add_argument("--workers", type=int, default=4, help="Concurrent requests")
+        parser.add_argument("--apply", action="store_true", help="Save the suggested changes")
+
+    def handle(self, *app_labels, **options):
+        proteins = Protein.objects.filter(slug__in=options["slugs"]) if options["slugs"] else None
+        results = ExternalSync(max_workers=options["workers"]).run(proteins)
+        for changes, warnings in results:
+            for warning in warnings:
+                self.stderr.write(f"{changes.obj}: {warning}")
+            if changes:
+                self.stdout.write(str(changes))
+                if options["apply"]:
+                    changes.execute()
+        n = sum(bool(changes) for changes, _ in results)
+        self.stdout.write(
+            f"checked {len(results)} proteins, {n} with changes{' (applied)' if options['apply'] else ''}"
+        )
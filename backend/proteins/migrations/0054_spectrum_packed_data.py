@@ -0,0 +1,42 @@
+# Generated by Django 4.2.1 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+from proteins.util.spectra import pack_spectrum
+
+
+def pack_spectra(apps, schema_editor):
+    Spectrum = apps.get_model("proteins", "Spectrum")
+    batch = []
+    for spectrum in Spectrum.objects.only("id", "data").iterator(chunk_size=500):
+        spectrum.wave_start, spectrum.wave_step, spectrum.y_packed = pack_spectrum(spectrum.data)
+        batch.append(spectrum)
+        if len(batch) >= 500:
+            Spectrum.objects.bulk_update(batch, ["wave_start", "wave_step", "y_packed"])
+            batch = []
+    Spectrum.objects.bulk_update(batch, ["wave_start", "wave_step", "y_packed"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("proteins", "0053_alter_protein_chromophore"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="spectrum",
+            name="wave_start",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="spectrum",
+            name="wave_step",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="spectrum",
+            name="y_packed",
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(pack_spectra, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.1 on 2026-10-18 12:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("proteins", "0054_spectrum_packed_data"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FRETPair",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "overlap",
+                    models.FloatField(help_text="Spectral overlap integral (10^15 M^-1 cm^-1 nm^4)"),
+                ),
+                ("forster", models.FloatField(db_index=True, help_text="Förster radius (nm)")),
+                ("forster_qya", models.FloatField(help_text="Förster radius * acceptor quantum yield")),
+                (
+                    "emdist",
+                    models.IntegerField(help_text="Distance between donor and acceptor emission maxima (nm)"),
+                ),
+                ("modified", models.DateTimeField(auto_now=True)),
+                (
+                    "acceptor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="fret_acceptor_pairs",
+                        to="proteins.protein",
+                    ),
+                ),
+                (
+                    "donor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="fret_donor_pairs",
+                        to="proteins.protein",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-forster"],
+                "unique_together": {("donor", "acceptor")},
+            },
+        ),
+    ]
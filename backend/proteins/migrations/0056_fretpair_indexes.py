@@ -0,0 +1,20 @@
+# Generated by Django 4.2.1 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("proteins", "0055_fretpair"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="fretpair",
+            index=models.Index(fields=["donor", "-forster"], name="fretpair_donor_forster"),
+        ),
+        migrations.AddIndex(
+            model_name="fretpair",
+            index=models.Index(fields=["acceptor", "-forster"], name="fretpair_acceptor_forster"),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.1 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("proteins", "0056_fretpair_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lineage",
+            name="aligned_rootmut",
+            field=models.CharField(
+                blank=True,
+                editable=False,
+                help_text="Mutations from the root sequence, by alignment",
+                max_length=1000,
+            ),
+        ),
+        migrations.AddField(
+            model_name="lineage",
+            name="validation_errors",
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name="lineage",
+            name="annotation_key",
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.1 on 2026-10-18 14:00
+
+from django.db import migrations, models
+from django.db.models import F, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Greatest
+
+
+def mark_outdated(apps, schema_editor):
+    # flag the rows that OcFluorEffQuerySet.outdated() used to find with subqueries
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    OcFluorEff = apps.get_model("proteins", "OcFluorEff")
+    for model_name in ("state", "dye"):
+        ct = ContentType.objects.filter(app_label="proteins", model=model_name).first()
+        if ct is None:
+            continue
+        Model = apps.get_model("proteins", model_name)
+        fluor_mod = (
+            Model.objects.filter(id=OuterRef("object_id"))
+            .annotate(m=Greatest(F("modified"), Max("spectra__modified")))
+            .values("m")
+        )
+        (
+            OcFluorEff.objects.filter(content_type=ct)
+            .annotate(fluor_mod=Subquery(fluor_mod))
+            .filter(Q(modified__lt=F("fluor_mod")) | Q(modified__lt=F("oc__modified")))
+            .update(dirty=True)
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("proteins", "0057_lineage_annotations"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ocfluoreff",
+            name="dirty",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="ocfluoreff",
+            index=models.Index(condition=models.Q(("dirty", True)), fields=["oc"], name="ocfluoreff_dirty"),
+        ),
+        migrations.RunPython(mark_outdated, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.1 on 2026-10-18 16:00
+
+from django.db import migrations, models
+
+
+def fill_local_brightness(apps, schema_editor):
+    from proteins.util.maintain import update_local_brightness
+
+    update_local_brightness(apps.get_model("proteins", "State"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("proteins", "0058_ocfluoreff_dirty"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="state",
+            name="local_brightness",
+            field=models.FloatField(
+                db_index=True,
+                default=1,
+                editable=False,
+                help_text="brightness relative to spectral neighbors.  1 = average",
+            ),
+        ),
+        migrations.RunPython(fill_local_brightness, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.1 on 2026-10-18 17:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def fill_alias_keys(apps, schema_editor):
+    # same keys as Protein.alias_keys_wanted
+    Protein = apps.get_model("proteins", "Protein")
+    ProteinAlias = apps.get_model("proteins", "ProteinAlias")
+    rows = []
+    for id, slug, aliases, base_name in Protein.objects.values_list("id", "slug", "aliases", "base_name"):
+        keys = {}
+        for kind, names in ((0, [slug]), (1, aliases or []), (2, [base_name])):
+            for key in (slugify(n) for n in names if n):
+                if key:
+                    keys.setdefault(key, kind)
+        rows.extend(ProteinAlias(protein_id=id, key=k, kind=v) for k, v in keys.items())
+    ProteinAlias.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("proteins", "0059_state_local_brightness"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProteinAlias",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("key", models.CharField(db_index=True, max_length=200)),
+                (
+                    "kind",
+                    models.PositiveSmallIntegerField(choices=[(0, "slug"), (1, "alias"), (2, "base name")]),
+                ),
+                (
+                    "protein",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="alias_keys",
+                        to="proteins.protein",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("protein", "key")},
+            },
+        ),
+        migrations.RunPython(fill_alias_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 4.2.1 on 2026-10-18 18:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.urls import reverse
+from django.utils.text import slugify
+
+
+def fill_search_identifiers(apps, schema_editor):
+    # same rows as SearchIdentifier.keys_for (see manage.py rebuildsearchindex)
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    SearchIdentifier = apps.get_model("proteins", "SearchIdentifier")
+    Protein = apps.get_model("proteins", "Protein")
+    Organism = apps.get_model("proteins", "Organism")
+    Author = apps.get_model("references", "Author")
+    Reference = apps.get_model("references", "Reference")
+
+    def objects():
+        for p in Protein.objects.exclude(status="hidden"):
+            keys = [(slugify(p.name), 0, 0)]
+            keys.extend((slugify(a), 1, 0) for a in p.aliases or ())
+            accessions = [p.uuid, p.genbank, p.uniprot, p.ipg_id, *(p.pdb or ())]
+            keys.extend((str(a).lower(), 2, 0) for a in accessions if a)
+            yield p, reverse("proteins:protein-detail", args=[p.slug]), keys
+        for a in Author.objects.annotate(n=Count("publications")):
+            yield a, reverse("references:author-detail", args=[a.id]), [(a.family.lower(), 3, a.n)]
+        for r in Reference.objects.exclude(doi=None).exclude(doi=""):
+            yield r, reverse("references:reference-detail", args=[r.id]), [(r.doi.lower(), 4, 0)]
+        for o in Organism.objects.annotate(n=Count("proteins")):
+            if o.scientific_name:
+                yield o, reverse("proteins:organism-detail", args=[o.pk]), [(o.scientific_name.lower(), 5, o.n)]
+
+    rows = []
+    content_types = {}
+    for obj, url, keys in objects():
+        model = obj._meta.model
+        if model not in content_types:
+            content_types[model], _ = ContentType.objects.get_or_create(
+                app_label=model._meta.app_label, model=model._meta.model_name
+            )
+        rows.extend(
+            SearchIdentifier(
+                key=key[:255], kind=kind, weight=w, url=url, content_type=content_types[model], object_id=obj.pk
+            )
+            for key, kind, w in dict.fromkeys(keys)
+            if key
+        )
+    SearchIdentifier.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("proteins", "0060_proteinalias"),
+        ("references", "0006_alter_author_id_alter_reference_id_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchIdentifier",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("key", models.CharField(max_length=255)),
+                (
+                    "kind",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (0, "protein name"),
+                            (1, "protein alias"),
+                            (2, "protein accession"),
+                            (3, "author"),
+                            (4, "doi"),
+                            (5, "organism"),
+                        ]
+                    ),
+                ),
+                (
+                    "weight",
+                    models.IntegerField(default=0, help_text="ranks matches of the same kind (higher first)"),
+                ),
+                ("url", models.CharField(max_length=255)),
+                ("object_id", models.PositiveIntegerField()),
+                (
+                    "content_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["key", "kind"], name="searchidentifier_key"),
+                    models.Index(fields=["key"], name="searchidentifier_key_like", opclasses=["varchar_pattern_ops"]),
+                    models.Index(fields=["content_type", "object_id"], name="searchidentifier_target"),
+                ],
+            },
+        ),
+        migrations.RunPython(fill_search_identifiers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.1 on 2026-10-18 19:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("proteins", "0061_searchidentifier"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DataCheckRun",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("check_name", models.CharField(max_length=64, unique=True)),
+                ("computed", models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="DataCheckFinding",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("check_name", models.CharField(max_length=64)),
+                ("detail", models.JSONField(blank=True, default=dict)),
+                (
+                    "protein",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="data_check_findings",
+                        to="proteins.protein",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("check_name", "protein")},
+            },
+        ),
+    ]
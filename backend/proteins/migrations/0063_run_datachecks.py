@@ -0,0 +1,22 @@
+# Generated by Django 4.2.1 on 2026-10-18 20:00
+
+from django.db import migrations
+
+
+def run_datachecks(apps, schema_editor):
+    # fill the /problems/ pages now instead of waiting for the nightly task.
+    # the checks query the current models, so this is elidable once squashed.
+    from proteins.util.datachecks import run_checks
+
+    if apps.get_model("proteins", "Protein").objects.exists():
+        run_checks()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("proteins", "0062_datacheck"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_datachecks, migrations.RunPython.noop, elidable=True),
+    ]
@@ -1,18 +1,22 @@
 from .bleach import BleachMeasurement
 from .collection import ProteinCollection
+from .datacheck import DataCheckFinding, DataCheckRun
 from .efficiency import OcFluorEff
 from .excerpt import Excerpt
+from .fret import FRETPair
 from .lineage import Lineage
 from .microscope import FilterPlacement, Microscope, OpticalConfig
 from .organism import Organism
 from .oser import OSERMeasurement
-from .protein import Protein
+from .protein import Protein, ProteinAlias
+from .search import SearchIdentifier
 from .spectrum import Camera, Filter, Light, Spectrum
 from .state import Dye, Fluorophore, State
 from .transition import StateTransition
 
 __all__ = [
     "Protein",
+    "ProteinAlias",
     "Organism",
     "BleachMeasurement",
     "OSERMeasurement",
@@ -31,4 +35,8 @@ __all__ = [
     "Excerpt",
     "OcFluorEff",
     "Lineage",
+    "FRETPair",
+    "SearchIdentifier",
+    "DataCheckRun",
+    "DataCheckFinding",
 ]
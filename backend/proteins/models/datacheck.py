@@ -0,0 +1,28 @@
+from django.db import models
+
+
+class DataCheckRun(models.Model):
+    """When a data check (see proteins.util.datachecks) was last run"""
+
+    check_name = models.CharField(max_length=64, unique=True)
+    computed = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.check_name} ({self.computed:%Y-%m-%d %H:%M})"
+
+
+class DataCheckFinding(models.Model):
+    """A protein flagged by a data check, with check-specific details
+
+    rows are replaced whenever the check is rerun for that protein.
+    """
+
+    check_name = models.CharField(max_length=64)
+    protein = models.ForeignKey("Protein", on_delete=models.CASCADE, related_name="data_check_findings")
+    detail = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        unique_together = (("check_name", "protein"),)
+
+    def __str__(self):
+        return f"{self.check_name}: {self.protein_id}"
@@ -3,26 +3,21 @@ from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
-from django.db.models import F, Max, OuterRef, Q, Subquery
 from model_utils.models import TimeStampedModel
 
 from ..util.efficiency import oc_efficiency_report
-from .state import Dye, State
 
 
 class OcFluorEffQuerySet(models.QuerySet):
     def outdated(self):
-        state_id = ContentType.objects.get(app_label="proteins", model="state").id
-        dye_id = ContentType.objects.get(app_label="proteins", model="dye").id
+        """rows whose fluor, fluor spectra or optical config changed since they were computed
 
-        state_mod = State.objects.filter(id=OuterRef("object_id")).annotate(m=Max("spectra__modified")).values("m")
-        dye_mod = Dye.objects.filter(id=OuterRef("object_id")).annotate(m=Max("spectra__modified")).values("m")
+        (flagged by the signal handlers in proteins.handlers)
+        """
+        return self.filter(dirty=True)
 
-        q = self.filter(content_type=state_id).annotate(fluor_mod=F("state__modified"), spec_mod=Subquery(state_mod))
-        r = self.filter(content_type=dye_id).annotate(fluor_mod=F("dye__modified"), spec_mod=Subquery(dye_mod))
-        return (q | r).filter(
-            Q(modified__lt=F("fluor_mod")) | Q(modified__lt=F("spec_mod")) | Q(modified__lt=F("oc__modified"))
-        )
+    def mark_dirty(self):
+        return self.update(dirty=True)
 
 
 class OcFluorEff(TimeStampedModel):
@@ -51,10 +46,13 @@ class OcFluorEff(TimeStampedModel):
         validators=[MinValueValidator(0), MaxValueValidator(1)],
     )
     brightness = models.FloatField(null=True, blank=True)
+    # needs recompute (set when the fluor, its spectra, or the optical config change)
+    dirty = models.BooleanField(default=False, editable=False)
     objects = OcFluorEffQuerySet.as_manager()
 
     class Meta:
         unique_together = ("oc", "content_type", "object_id")
+        indexes = [models.Index(fields=["oc"], condition=models.Q(dirty=True), name="ocfluoreff_dirty")]
 
     def clean(self):
         if self.content_type_id not in ContentType.objects.filter(self.limit).values_list("id", flat=True):
@@ -74,8 +72,9 @@ class OcFluorEff(TimeStampedModel):
         return (self.modified < self.oc.modified) or (self.modified < self.fluor.modified)
 
     def save(self, *args, **kwargs):
-        if self.pk is None or self.outdated:
+        if self.pk is None or self.dirty or self.outdated:
             self.update_effs()
+            self.dirty = False
         if not self.fluor_name:
             self.fluor_name = str(self.fluor)
         super().save(*args, **kwargs)
@@ -0,0 +1,35 @@
+from django.db import models
+
+# formatted forster_list() output, cleared when fluorophore spectra change
+FORSTER_LIST_CACHE_KEY = "forster_list"
+
+
+class FRETPair(models.Model):
+    """precomputed spectral overlap & Förster radius for a donor/acceptor pair
+
+    rows are maintained by proteins.util.fret.update_fret_pairs, (only pairs
+    involving proteins that changed since the last run are recomputed)
+    """
+
+    donor = models.ForeignKey("Protein", on_delete=models.CASCADE, related_name="fret_donor_pairs")
+    acceptor = models.ForeignKey("Protein", on_delete=models.CASCADE, related_name="fret_acceptor_pairs")
+    overlap = models.FloatField(help_text="Spectral overlap integral (10^15 M^-1 cm^-1 nm^4)")
+    forster = models.FloatField(db_index=True, help_text="Förster radius (nm)")
+    forster_qya = models.FloatField(help_text="Förster radius * acceptor quantum yield")
+    emdist = models.IntegerField(help_text="Distance between donor and acceptor emission maxima (nm)")
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("donor", "acceptor")
+        ordering = ["-forster"]
+        indexes = [
+            # single donor (or acceptor) lookups, ranked by Förster radius
+            models.Index(fields=["donor", "-forster"], name="fretpair_donor_forster"),
+            models.Index(fields=["acceptor", "-forster"], name="fretpair_acceptor_forster"),
+        ]
+
+    def __str__(self):
+        return f"{self.donor} -> {self.acceptor}"
+
+    def __repr__(self):
+        return f"<FRETPair: {self.donor.slug} -> {self.acceptor.slug}>"
@@ -1,5 +1,5 @@
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from model_utils.models import TimeStampedModel
 from mptt.models import MPTTModel, TreeForeignKey
@@ -53,6 +53,15 @@ class Lineage(MPTTModel, TimeStampedModel, Authorable):
         related_name="descendants",
         verbose_name="Root Node",
     )
+    # precomputed by util.maintain.refresh_lineage_annotations (see refresh_lineages task)
+    aligned_rootmut = models.CharField(
+        max_length=1000,
+        blank=True,
+        editable=False,
+        help_text="Mutations from the root sequence, by alignment",
+    )
+    validation_errors = models.JSONField(default=list, blank=True, editable=False)
+    annotation_key = models.CharField(max_length=32, blank=True, editable=False)
 
     class MPTTMeta:
         order_insertion_by = ["protein"]
@@ -74,6 +83,17 @@ class Lineage(MPTTModel, TimeStampedModel, Authorable):
         else:
             self.rootmut = ""
         super().save(*args, **kwargs)
+        self.schedule_refresh()
+
+    def schedule_refresh(self):
+        """recompute the stored annotations of this tree once the transaction commits
+
+        (debounced: saving many nodes of a tree queues a single refresh)
+        """
+        from ..tasks import schedule_lineage_refresh
+
+        tree_id = self.tree_id
+        transaction.on_commit(lambda: schedule_lineage_refresh(tree_id))
 
     def mut_from_root(self, root=None):
         if root:
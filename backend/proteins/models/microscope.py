@@ -1,16 +1,18 @@
+import bisect
 import json
 import urllib.parse
 
 from django.contrib.postgres.fields import ArrayField
-from django.core.cache import cache
 from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 from django.utils.functional import cached_property
 
-from ..util.efficiency import spectral_product
+from fpbase.cache import swr_get, swr_patch
+
 from ..util.helpers import shortuuid
+from ..util.spectral import DenseSpectrum, laser, product
 from .collection import OwnedCollection
 from .spectrum import Camera, Filter, Light, sorted_ex2em
 
@@ -152,28 +154,45 @@ class Microscope(OwnedCollection):
         return [spec.d3dict() for spec in self.spectra]
 
 
-def invert(sp):
-    return [[a[0], 1 - a[1]] for a in sp]
+OC_CACHE_KEY = "optical_config_list"
 
 
-OC_CACHE_KEY = "optical_config_list"
+def _optical_config_list(ids=None):
+    vals = OpticalConfig.objects.all()
+    if ids is not None:
+        vals = vals.filter(id__in=ids)
+    vals = vals.values("id", "name", "comments", "microscope__id", "microscope__name")
+    ocinfo = []
+    for val in vals:
+        scope = {
+            "id": val.pop("microscope__id"),
+            "name": val.pop("microscope__name"),
+        }
+        val["microscope"] = scope
+        ocinfo.append(val)
+    return ocinfo
+
+
+def _optical_configs_json():
+    return json.dumps({"data": {"opticalConfigs": _optical_config_list()}})
 
 
 def get_cached_optical_configs(timeout=60 * 60):
-    ocinfo = cache.get(OC_CACHE_KEY)
-    if not ocinfo:
-        vals = OpticalConfig.objects.all().values("id", "name", "comments", "microscope__id", "microscope__name")
-        ocinfo = []
-        for val in vals:
-            scope = {
-                "id": val.pop("microscope__id"),
-                "name": val.pop("microscope__name"),
-            }
-            val["microscope"] = scope
-            ocinfo.append(val)
-        ocinfo = json.dumps({"data": {"opticalConfigs": ocinfo}})
-        cache.set(OC_CACHE_KEY, ocinfo, timeout)
-    return ocinfo
+    return swr_get(OC_CACHE_KEY, _optical_configs_json, fresh=timeout, tags=("microscopes",))
+
+
+def patch_cached_optical_configs(oc_id):
+    """replace (or remove, if deleted) one optical config in the cached list"""
+
+    def patch(info):
+        info = json.loads(info)
+        ocinfo = [oc for oc in info["data"]["opticalConfigs"] if oc["id"] != oc_id]
+        for oc in _optical_config_list(ids=[oc_id]):
+            bisect.insort(ocinfo, oc, key=lambda x: x["name"])
+        info["data"]["opticalConfigs"] = ocinfo
+        return json.dumps(info)
+
+    swr_patch(OC_CACHE_KEY, patch)
 
 
 class OpticalConfig(OwnedCollection):
@@ -207,8 +226,8 @@ class OpticalConfig(OwnedCollection):
         ordering = ["name"]
 
     def save(self, **kwargs):
-        cache.delete(OC_CACHE_KEY)
         super().save(**kwargs)
+        transaction.on_commit(lambda: patch_cached_optical_configs(self.id))
 
     @cached_property
     def ex_filters(self):
@@ -234,13 +253,15 @@ class OpticalConfig(OwnedCollection):
         """returns components in the excitation path"""
         p = []
         if self.laser:
-            p.append([[self.laser - 1, 0], [self.laser, 1], [self.laser + 1, 0]])
+            p.append(laser(self.laser))
         elif self.light:
-            p.append(self.light.spectrum.data)
+            p.append(DenseSpectrum.from_data(self.light.spectrum.data))
         for x in self.filterplacement_set.filter(path=FilterPlacement.BS):
-            p.append(invert(x.filter.spectrum.data) if not x.reflects else x.filter.spectrum.data)
+            sp = DenseSpectrum.from_data(x.filter.spectrum.data)
+            p.append(sp.invert() if not x.reflects else sp)
         for x in self.filterplacement_set.filter(path=FilterPlacement.EX):
-            p.append(invert(x.filter.spectrum.data) if x.reflects else x.filter.spectrum.data)
+            sp = DenseSpectrum.from_data(x.filter.spectrum.data)
+            p.append(sp.invert() if x.reflects else sp)
         return p
 
     @cached_property
@@ -248,20 +269,24 @@ class OpticalConfig(OwnedCollection):
         """returns components in the emissino path"""
         p = []
         if self.camera:
-            p.append(self.camera.spectrum.data)
+            p.append(DenseSpectrum.from_data(self.camera.spectrum.data))
         for x in self.filterplacement_set.filter(path=FilterPlacement.BS):
-            p.append(invert(x.filter.spectrum.data) if x.reflects else x.filter.spectrum.data)
+            sp = DenseSpectrum.from_data(x.filter.spectrum.data)
+            p.append(sp.invert() if x.reflects else sp)
         for x in self.filterplacement_set.filter(path=FilterPlacement.EM):
-            p.append(invert(x.filter.spectrum.data) if x.reflects else x.filter.spectrum.data)
+            sp = DenseSpectrum.from_data(x.filter.spectrum.data)
+            p.append(sp.invert() if x.reflects else sp)
         return p
 
     @cached_property
     def combined_ex_spectra(self):
-        return spectral_product(self.ex_spectra)
+        """product of all excitation path components (DenseSpectrum)"""
+        return product(self.ex_spectra)
 
     @cached_property
     def combined_em_spectra(self):
-        return spectral_product(self.em_spectra)
+        """product of all emission path components (DenseSpectrum)"""
+        return product(self.em_spectra)
 
     @cached_property
     def inverted_bs(self):
@@ -16,7 +16,7 @@ from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.search import TrigramSimilarity
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.db import models
-from django.db.models import Count, F, Func, Q, Value
+from django.db.models import Count, Min, Q
 from django.urls import reverse
 from django.utils.text import slugify
 from model_utils import Choices
@@ -53,23 +53,26 @@ def prot_uuid(k=5, opts="ABCDEFGHJKLMNOPQRSTUVWXYZ123456789"):
 
 
 def findname(name):
-    queries = [
-        {"name__iexact": name},
-        {"aliases__icontains": name},
-        # {'name__icontains': name},
-        {"name__iexact": re.sub(r" \((Before|Planar|wild).*", "", name)},
-        {"aliases__icontains": re.sub(r" \((Before|Planar|wild).*", "", name)},
-        # {'name__icontains': re.sub(r' \((Before|Planar).*', '', name)},
-        {"name__iexact": name.strip("1")},
-        # {'name__icontains': name.strip('1')},
-    ]
-    for query in queries:
-        with contextlib.suppress(Exception):
-            return Protein.objects.get(**query)
-    return None
+    names = [name, re.sub(r" \((Before|Planar|wild).*", "", name), name.strip("1")]
+    return Protein.objects.by_alias(*names, max_kind=ProteinAlias.BASE_NAME).first()
 
 
 class ProteinQuerySet(models.QuerySet):
+    def by_alias(self, *names, max_kind=None):
+        """proteins whose slug or aliases match any of names (after slugify), best match first
+
+        with max_kind=ProteinAlias.BASE_NAME, base names (e.g. Cherry for mCherry) also match.
+        """
+        if max_kind is None:
+            max_kind = ProteinAlias.ALIAS
+        keys = {slugify(n) for n in names} - {""}
+        # annotating after the filter groups the matched keys per protein (no duplicates)
+        return (
+            self.filter(alias_keys__key__in=keys, alias_keys__kind__lte=max_kind)
+            .annotate(alias_kind=Min("alias_keys__kind"))
+            .order_by("alias_kind", "id")
+        )
+
     def fasta(self):
         seqs = list(self.exclude(seq__isnull=True).values("uuid", "name", "seq"))
         for s in seqs:
@@ -93,21 +96,17 @@ class ProteinQuerySet(models.QuerySet):
 
 class ProteinManager(models.Manager):
     def deep_get(self, name):
-        slug = slugify(name)
-        with contextlib.suppress(Protein.DoesNotExist):
-            return self.get(slug=slug)
-        aliases_lower = Func(Func(F("aliases"), function="unnest"), function="LOWER")
-        remove_space = Func(aliases_lower, Value(" "), Value("-"), function="replace")
-        final = Func(remove_space, Value("."), Value(""), function="replace")
-        D = dict(Protein.objects.annotate(aka=final).values_list("aka", "id"))
-        if slug in D:
-            return self.get(id=D[slug])
-        else:
+        protein = self.by_alias(name).first()
+        if protein is None:
             raise Protein.DoesNotExist("Protein matching query does not exist.")
+        return protein
 
     def get_queryset(self):
         return ProteinQuerySet(self.model, using=self._db)
 
+    def by_alias(self, *names, max_kind=None):
+        return self.get_queryset().by_alias(*names, max_kind=max_kind)
+
     def with_counts(self):
         from django.db import connection
 
@@ -507,6 +506,20 @@ class Protein(Authorable, StatusModel, TimeStampedModel):
         if errors:
             raise ValidationError(errors)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember the sequence as loaded, so that save() can tell if it changed
+        if "seq" in field_names:
+            instance._loaded_seq = values[field_names.index("seq")]
+        if "parent_organism_id" in field_names:
+            instance._loaded_parent_organism_id = values[field_names.index("parent_organism_id")]
+        return instance
+
+    def seq_changed(self):
+        """True if seq differs from the value loaded from the database"""
+        return hasattr(self, "_loaded_seq") and str(self._loaded_seq or "") != str(self.seq or "")
+
     def save(self, *args, **kwargs):
         # if the IPG ID has changed... refetch the sequence
         # if self.ipg_id != self.__original_ipg_id:
@@ -515,11 +528,40 @@ class Protein(Authorable, StatusModel, TimeStampedModel):
 
         self.slug = slugify(self.name)
         self.base_name = self._base_name
+        seq_changed = self.seq_changed()
         super().save(*args, **kwargs)
+        self.update_alias_keys()
         if self.set_default_state():
             super().save()
+        if seq_changed:
+            self._loaded_seq = self.seq
+            with contextlib.suppress(ObjectDoesNotExist):
+                self.lineage.schedule_refresh()
         # self.__original_ipg_id = self.ipg_id
 
+    def alias_keys_wanted(self):
+        """{key: kind} of the ProteinAlias rows this protein should have"""
+        keys = {}
+        for kind, names in (
+            (ProteinAlias.SLUG, [self.slug]),
+            (ProteinAlias.ALIAS, self.aliases or []),
+            (ProteinAlias.BASE_NAME, [self.base_name]),
+        ):
+            for key in (slugify(n) for n in names if n):
+                if key:
+                    keys.setdefault(key, kind)
+        return keys
+
+    def update_alias_keys(self):
+        wanted = self.alias_keys_wanted()
+        current = dict(self.alias_keys.values_list("key", "kind"))
+        if current == wanted:
+            return
+        self.alias_keys.exclude(key__in=[k for k, v in wanted.items() if current.get(k) == v]).delete()
+        ProteinAlias.objects.bulk_create(
+            [ProteinAlias(protein=self, key=k, kind=v) for k, v in wanted.items() if current.get(k) != v]
+        )
+
     # Meta
     class Meta:
         ordering = ["name"]
@@ -633,3 +675,29 @@ class Protein(Authorable, StatusModel, TimeStampedModel):
     def first_author(self):
         if self.primary_reference and self.primary_reference.first_author:
             return self.primary_reference.first_author.family
+
+
+class ProteinAlias(models.Model):
+    """A slugified name (slug, alias or base name) that a protein can be looked up by
+
+    maintained by Protein.save, see ProteinQuerySet.by_alias
+    """
+
+    SLUG = 0
+    ALIAS = 1
+    BASE_NAME = 2
+    KIND_CHOICES = (
+        (SLUG, "slug"),
+        (ALIAS, "alias"),
+        (BASE_NAME, "base name"),
+    )
+
+    protein = models.ForeignKey("Protein", related_name="alias_keys", on_delete=models.CASCADE)
+    key = models.CharField(max_length=200, db_index=True)
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+
+    class Meta:
+        unique_together = (("protein", "key"),)
+
+    def __str__(self):
+        return f"{self.key} ({self.get_kind_display()}): {self.protein_id}"
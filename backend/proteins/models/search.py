@@ -0,0 +1,108 @@
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+
+class SearchIdentifierQuerySet(models.QuerySet):
+    def resolve(self, query):
+        """the best identifier matching a search box query (or None), in one query
+
+        proteins (by name or alias, then by accession) beat author names,
+        which beat DOIs and organisms.  Queries longer than 5 characters also
+        match the start of organism names.
+        """
+        query = query.strip()
+        keys = {query.lower(), slugify(query)} - {""}
+        if not keys:
+            return None
+        q = Q(key__in=keys)
+        if len(query) > 5:
+            q |= Q(kind=SearchIdentifier.ORGANISM, key__startswith=query.lower())
+        return self.filter(q).order_by("kind", "-weight").first()
+
+    def for_object(self, obj):
+        return self.filter(content_type=ContentType.objects.get_for_model(obj), object_id=obj.pk)
+
+
+class SearchIdentifier(models.Model):
+    """A normalized name or identifier that the search box resolves to a page
+
+    one row per protein name, alias & accession, author family name, DOI and
+    organism name, maintained by the signal handlers in proteins.handlers
+    (and rebuilt with manage.py rebuildsearchindex).
+    """
+
+    PROTEIN_NAME = 0
+    PROTEIN_ALIAS = 1
+    PROTEIN_ID = 2
+    AUTHOR = 3
+    DOI = 4
+    ORGANISM = 5
+    KIND_CHOICES = (
+        (PROTEIN_NAME, "protein name"),
+        (PROTEIN_ALIAS, "protein alias"),
+        (PROTEIN_ID, "protein accession"),
+        (AUTHOR, "author"),
+        (DOI, "doi"),
+        (ORGANISM, "organism"),
+    )
+
+    key = models.CharField(max_length=255)
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    weight = models.IntegerField(default=0, help_text="ranks matches of the same kind (higher first)")
+    url = models.CharField(max_length=255)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    target = GenericForeignKey("content_type", "object_id")
+
+    objects = SearchIdentifierQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["key", "kind"], name="searchidentifier_key"),
+            models.Index(fields=["key"], name="searchidentifier_key_like", opclasses=["varchar_pattern_ops"]),
+            models.Index(fields=["content_type", "object_id"], name="searchidentifier_target"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.get_kind_display()})"
+
+    @classmethod
+    def keys_for(cls, obj):
+        """[(key, kind, weight)] of the identifiers for a Protein, Author, Reference or Organism"""
+        from references.models import Author, Reference
+
+        from .organism import Organism
+        from .protein import Protein
+
+        keys = []
+        if isinstance(obj, Protein):
+            if obj.status == "hidden":
+                return []
+            keys.append((slugify(obj.name), cls.PROTEIN_NAME, 0))
+            keys.extend((slugify(a), cls.PROTEIN_ALIAS, 0) for a in obj.aliases or ())
+            accessions = [obj.uuid, obj.genbank, obj.uniprot, obj.ipg_id, *(obj.pdb or ())]
+            keys.extend((str(a).lower(), cls.PROTEIN_ID, 0) for a in accessions if a)
+        elif isinstance(obj, Author):
+            keys.append((obj.family.lower(), cls.AUTHOR, obj.publications.count()))
+        elif isinstance(obj, Reference):
+            if obj.doi:
+                keys.append((obj.doi.lower(), cls.DOI, 0))
+        elif isinstance(obj, Organism):
+            if obj.scientific_name:
+                keys.append((obj.scientific_name.lower(), cls.ORGANISM, obj.proteins.count()))
+        return [(key[:255], kind, weight) for key, kind, weight in dict.fromkeys(keys) if key]
+
+    @classmethod
+    def reindex(cls, obj):
+        """replace the identifiers of obj"""
+        keys = cls.keys_for(obj)
+        url = obj.get_absolute_url() if keys else ""
+        ct = ContentType.objects.get_for_model(obj)
+        with transaction.atomic():
+            cls.objects.filter(content_type=ct, object_id=obj.pk).delete()
+            cls.objects.bulk_create(
+                [cls(key=k, kind=kind, weight=w, url=url, content_type=ct, object_id=obj.pk) for k, kind, w in keys]
+            )
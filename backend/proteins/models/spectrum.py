@@ -1,23 +1,32 @@
 import ast
+import bisect
 import json
 
 import numpy as np
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.search import TrigramSimilarity
-from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.forms import CharField, Textarea
 from django.urls import reverse
 from django.utils.text import slugify
 from model_utils.managers import QueryManager
 from model_utils.models import TimeStampedModel
 
+from fpbase.cache import swr_get, swr_patch
 from references.models import Reference
 
 from ..util.helpers import wave_to_hex
-from ..util.spectra import interp_linear, interp_univar, norm2one, norm2P, step_size
+from ..util.spectra import (
+    interp_linear,
+    interp_univar,
+    norm2one,
+    norm2P,
+    pack_spectrum,
+    step_size,
+    unpack_spectrum,
+)
 from .mixins import AdminURLMixin, Authorable, Product
 
 
@@ -64,17 +73,46 @@ def sorted_ex2em(filterset):
 
 
 SPECTRA_CACHE_KEY = "spectra_sluglist"
+# bump the version whenever the layout of the cached FluorSpectralMatrix changes
+FLUOR_MATRIX_CACHE_KEY = "fluor_spectral_matrix_v1"
+
+
+def _spectra_info_json():
+    return json.dumps({"data": {"spectra": Spectrum.objects.sluglist()}})
 
 
 def get_cached_spectra_info(timeout=60 * 60):
-    spectrainfo = cache.get(SPECTRA_CACHE_KEY)
-    if not spectrainfo:
-        spectrainfo = json.dumps({"data": {"spectra": Spectrum.objects.sluglist()}})
-        cache.set(SPECTRA_CACHE_KEY, spectrainfo, timeout)
-    return spectrainfo
+    """the sluglist as json, rebuilt in the background once stale
+
+    saving or deleting a spectrum splices its row into the cached list (see
+    patch_cached_spectra_info), changes to the owners mark it stale.
+    """
+    return swr_get(SPECTRA_CACHE_KEY, _spectra_info_json, fresh=timeout, tags=("spectrum_owners",))
+
+
+def _owner_name(row):
+    return row["owner"]["name"]
+
+
+def patch_cached_spectra_info(spectrum_id):
+    """replace (or remove, if deleted) the row of one spectrum in the cached sluglist"""
+
+    def patch(info):
+        info = json.loads(info)
+        spectra = [s for s in info["data"]["spectra"] if s["id"] != spectrum_id]
+        for row in Spectrum.objects.sluglist(ids=[spectrum_id]):
+            bisect.insort(spectra, row, key=_owner_name)
+        info["data"]["spectra"] = spectra
+        return json.dumps(info)
+
+    swr_patch(SPECTRA_CACHE_KEY, patch)
 
 
 class SpectrumManager(models.Manager):
+    def packed(self):
+        """skip loading the nested data array; x/y/pairs() then decode the packed y-vector"""
+        return self.get_queryset().defer("data")
+
     def state_slugs(self):
         L = (
             self.get_queryset()
@@ -89,8 +127,11 @@ class SpectrumManager(models.Manager):
             self.get_queryset().filter(category=self.DYE).values_list("owner_dye__slug", "owner_dye__name").distinct()
         )
 
-    def sluglist(self):
-        """probably using this one going forward for spectra page"""
+    def sluglist(self, ids=None):
+        """probably using this one going forward for spectra page
+
+        ids: only include these spectra
+        """
 
         owners = ["state", "dye", "filter", "light", "camera"]
         vals = [
@@ -107,7 +148,10 @@ class SpectrumManager(models.Manager):
         for suffix in ["slug", "id", "name"]:
             for owner in owners:
                 vals.append(f"owner_{owner}__{suffix}")
-        Q = self.get_queryset().values(*vals)
+        Q = self.get_queryset()
+        if ids is not None:
+            Q = Q.filter(id__in=ids)
+        Q = Q.values(*vals)
 
         out = []
         for v in Q:
@@ -153,7 +197,7 @@ class SpectrumManager(models.Manager):
                     "owner": {"slug": slug, "name": name, "id": owner_id, "url": url},
                 }
             )
-        return sorted(out, key=lambda k: k["owner"]["name"])
+        return sorted(out, key=_owner_name)
 
     # FIXME:  Stupid dumb dumb
     def fluorlist(self, withdyes=True):
@@ -343,6 +387,11 @@ class Spectrum(Authorable, TimeStampedModel, AdminURLMixin):
     }
 
     data = SpectrumData()
+    # packed copy of data (filled on save): the y values as float32 bytes, on
+    # x = wave_start + i * wave_step.  null if data doesn't have a uniform step.
+    wave_start = models.FloatField(null=True, blank=True, editable=False)
+    wave_step = models.FloatField(null=True, blank=True, editable=False)
+    y_packed = models.BinaryField(null=True, blank=True, editable=False)
     category = models.CharField(max_length=1, choices=CATEGORIES, verbose_name="Spectrum Type", db_index=True)
     subtype = models.CharField(
         max_length=2,
@@ -413,8 +462,9 @@ class Spectrum(Authorable, TimeStampedModel, AdminURLMixin):
         if sum(bool(x) for x in self.owner_set) > 1:
             raise ValidationError("Spectrum must have only one owner!")
         # self.category = self.owner.__class__.__name__.lower()[0]
-        cache.delete(SPECTRA_CACHE_KEY)
+        self.wave_start, self.wave_step, self.y_packed = pack_spectrum(self.data)
         super().save(*args, **kwargs)
+        transaction.on_commit(lambda: patch_cached_spectra_info(self.id))
 
     def _norm2one(self):
         if self.subtype == self.TWOP:
@@ -512,10 +562,14 @@ class Spectrum(Authorable, TimeStampedModel, AdminURLMixin):
 
     @property
     def min_wave(self):
+        if self._use_packed():
+            return self.wave_start
         return self.data[0][0]
 
     @property
     def max_wave(self):
+        if self._use_packed():
+            return self.wave_start + self.wave_step * (len(self.y_array) - 1)
         return self.data[-1][0]
 
     @property
@@ -528,13 +582,17 @@ class Spectrum(Authorable, TimeStampedModel, AdminURLMixin):
         return list(s)[0]
 
     def scaled_data(self, scale):
-        return [[n[0], n[1] * scale] for n in self.data]
+        return [[n[0], n[1] * scale] for n in self.pairs()]
 
     def color(self):
         return wave_to_hex(self.peak_wave)
 
     def waverange(self, waverange):
         assert len(waverange) == 2, "waverange argument must be an iterable of len 2"
+        if self._use_packed():
+            x, y = self.x_array, self.y_array
+            mask = (waverange[0] <= x) & (x <= waverange[1])
+            return np.column_stack((x[mask], y[mask])).round(6).tolist()
         return [d for d in self.data if waverange[0] <= d[0] <= waverange[1]]
 
     def avg(self, waverange):
@@ -581,7 +639,7 @@ class Spectrum(Authorable, TimeStampedModel, AdminURLMixin):
         return D
 
     def d3data(self):
-        return [{"x": elem[0], "y": elem[1]} for elem in self.data]
+        return [{"x": elem[0], "y": elem[1]} for elem in self.pairs()]
         # out = [{'x': w, 'y': 0} for w in range(300, int(self.min_wave))]
         # out.extend([{'x': elem[0], 'y': elem[1]} for elem in self.data])
         # out.extend([{'x': w, 'y': 0} for w in range(int(self.max_wave + 1), 801)])
@@ -590,12 +648,40 @@ class Spectrum(Authorable, TimeStampedModel, AdminURLMixin):
     def wave_value_pairs(self):
         output = {}
         # arrayLength = len(self.data)
-        for elem in self.data:
+        for elem in self.pairs():
             output[elem[0]] = elem[1]
         return output
 
+    def _use_packed(self):
+        """True when data was deferred and the packed y-vector can stand in for it"""
+        deferred = self.get_deferred_fields()
+        if "data" not in deferred or deferred & {"wave_start", "wave_step", "y_packed"}:
+            return False
+        return self.y_packed is not None
+
+    @property
+    def x_array(self):
+        if self._use_packed():
+            return unpack_spectrum(self.wave_start, self.wave_step, self.y_packed)[0]
+        return np.array(self.x)
+
+    @property
+    def y_array(self):
+        """numpy y values (a read-only view on y_packed when data is deferred)"""
+        if self._use_packed():
+            return unpack_spectrum(self.wave_start, self.wave_step, self.y_packed)[1]
+        return np.array(self.y)
+
+    def pairs(self):
+        """data as a list of [x, y] pairs, decoded from y_packed when data is deferred"""
+        if self._use_packed():
+            return np.column_stack((self.x_array, self.y_array)).round(6).tolist()
+        return self.data
+
     @property
     def x(self):
+        if self._use_packed():
+            return self.x_array.round(6).tolist()
         self._x = []
         for i in self.data:
             self._x.append(i[0])
@@ -603,6 +689,8 @@ class Spectrum(Authorable, TimeStampedModel, AdminURLMixin):
 
     @property
     def y(self):
+        if self._use_packed():
+            return self.y_array.astype(float).round(6).tolist()
         self._y = []
         for i in self.data:
             self._y.append(i[1])
@@ -1,7 +1,6 @@
 from django.contrib.contenttypes.fields import GenericRelation
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
-from django.db.models import Avg
 from django.utils.text import slugify
 
 from ..util.helpers import wave_to_hex
@@ -210,6 +209,13 @@ class State(Fluorophore):
         on_delete=models.CASCADE,
     )
     oc_eff = GenericRelation("OcFluorEff", related_query_name="state")
+    # see proteins.util.maintain.update_local_brightness
+    local_brightness = models.FloatField(
+        default=1,
+        db_index=True,
+        editable=False,
+        help_text="brightness relative to spectral neighbors.  1 = average",
+    )
 
     # Managers
     objects = FluorophoreManager()
@@ -229,14 +235,17 @@ class State(Fluorophore):
     def makeslug(self):
         return f"{self.protein.slug}_{slugify(self.name)}"
 
-    @property
-    def local_brightness(self):
-        """brightness relative to spectral neighbors.  1 = average"""
-        if not (self.em_max and self.brightness):
-            return 1
-        B = State.objects.exclude(id=self.id).filter(em_max__around=self.em_max).aggregate(Avg("brightness"))
-        try:
-            v = round(self.brightness / B["brightness__avg"], 4)
-        except TypeError:
-            v = 1
-        return v
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember what local_brightness depends on, so that handlers can tell if it changed
+        if "em_max" in field_names and "brightness" in field_names:
+            instance._loaded_brightness = (
+                values[field_names.index("em_max")],
+                values[field_names.index("brightness")],
+            )
+        return instance
+
+    def brightness_changed(self):
+        """True if em_max or brightness differ from the values loaded from the database"""
+        return getattr(self, "_loaded_brightness", None) != (self.em_max, self.brightness)
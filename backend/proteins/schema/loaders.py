@@ -0,0 +1,157 @@
+"""Request-scoped batch loaders for the GraphQL schema.
+
+graphene 3 only ships an asyncio DataLoader, and our schema executes
+synchronously.  These loaders batch by *priming*: before the first of several
+sibling fields (e.g. 50 aliased ``spectrum(id: ...)`` fields) is resolved, the
+ids requested by all of them are read from the operation and fetched at once,
+so that the remaining resolvers are served from the per-request cache.
+"""
+
+from django.core.cache import cache
+from graphql import FieldNode, VariableNode
+
+from .. import models
+
+
+class ModelLoader:
+    """Batch loads model instances by id, once per request
+
+    subclasses set `model` and may override `get_queryset`.  If `cache_prefix`
+    is set, instances are also shared across requests in the django cache,
+    read with a single get_many.
+    """
+
+    model = None
+    cache_prefix = None
+    cache_timeout = 60 * 60 * 24
+
+    def __init__(self):
+        self._loaded = {}
+
+    def get_queryset(self):
+        return self.model.objects.all()
+
+    def _cache_key(self, id):
+        return f"{self.cache_prefix}{id}"
+
+    def prime(self, ids):
+        """fetch all ids not loaded yet with (at most) one cache read and one query"""
+        missing = {int(i) for i in ids if i is not None} - self._loaded.keys()
+        if not missing:
+            return
+        if self.cache_prefix:
+            keys = {self._cache_key(i): i for i in missing}
+            for key, obj in cache.get_many(list(keys)).items():
+                self._loaded[keys[key]] = obj
+                missing.discard(keys[key])
+        if missing:
+            found = self.get_queryset().in_bulk(missing)
+            if self.cache_prefix and found:
+                cache.set_many({self._cache_key(i): obj for i, obj in found.items()}, self.cache_timeout)
+            for i in missing:
+                self._loaded[i] = found.get(i)
+
+    def load(self, id):
+        if id is None:
+            return None
+        id = int(id)
+        if id not in self._loaded:
+            self.prime([id])
+        return self._loaded[id]
+
+    def load_many(self, ids):
+        self.prime(ids)
+        return [self.load(i) for i in ids]
+
+
+class SpectrumLoader(ModelLoader):
+    model = models.Spectrum
+    cache_prefix = "_spectrum_"
+
+    def get_queryset(self):
+        return models.Spectrum.objects.packed().select_related(
+            "owner_state",
+            "owner_state__protein",
+            "owner_dye",
+            "owner_camera",
+            "owner_filter",
+            "owner_light",
+        )
+
+
+class StateLoader(ModelLoader):
+    model = models.State
+
+    def get_queryset(self):
+        return models.State.objects.select_related("protein")
+
+
+class DyeLoader(ModelLoader):
+    model = models.Dye
+
+
+class FilterLoader(ModelLoader):
+    model = models.Filter
+
+
+class LightLoader(ModelLoader):
+    model = models.Light
+
+
+class CameraLoader(ModelLoader):
+    model = models.Camera
+
+
+# Spectrum owner field -> loader
+OWNER_LOADERS = {
+    "owner_state": StateLoader,
+    "owner_dye": DyeLoader,
+    "owner_filter": FilterLoader,
+    "owner_light": LightLoader,
+    "owner_camera": CameraLoader,
+}
+
+
+def get_loader(context, loader_class):
+    """the instance of loader_class for this request (info.context)"""
+    try:
+        loaders = context._fpbase_loaders
+    except AttributeError:
+        loaders = {}
+        try:
+            context._fpbase_loaders = loaders
+        except AttributeError:  # context can't hold attributes: no request-scoped cache
+            return loader_class()
+    if loader_class not in loaders:
+        loaders[loader_class] = loader_class()
+    return loaders[loader_class]
+
+
+def _argument_value(node, variables):
+    if isinstance(node, VariableNode):
+        return variables.get(node.name.value)
+    return getattr(node, "value", None)
+
+
+def sibling_arguments(info, argument="id"):
+    """values of `argument` in every field of the same name as this one, in the same selection set"""
+    parent = info.operation.selection_set if not info.path.prev else None
+    field_node = info.field_nodes[0]
+    if parent is None:
+        # nested field: only the fields merged into this one are known
+        nodes = info.field_nodes
+    else:
+        nodes = [s for s in parent.selections if isinstance(s, FieldNode) and s.name.value == field_node.name.value]
+    values = []
+    for node in nodes:
+        for arg in node.arguments or ():
+            if arg.name.value == argument:
+                values.append(_argument_value(arg.value, info.variable_values or {}))
+    return values
+
+
+def load_with_siblings(info, loader_class, id, argument="id"):
+    """load id, batched with the ids requested by the sibling fields of this one"""
+    loader = get_loader(info.context, loader_class)
+    loader.prime([id, *sibling_arguments(info, argument)])
+    return loader.load(id)
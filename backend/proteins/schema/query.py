@@ -1,5 +1,4 @@
 import graphene
-from django.core.cache import cache
 from graphene_django.filter import DjangoFilterConnectionField
 from graphql import FieldNode, GraphQLError, GraphQLResolveInfo
 
@@ -7,29 +6,7 @@ from .. import models
 from ..filters import ProteinFilter
 from . import _optimizer as gdo
 from . import relay, types
-
-
-def get_cached_spectrum(id, timeout=60 * 60 * 24):
-    key = f"_spectrum_{id}"
-    spectrum = cache.get(key)
-    if not spectrum:
-        try:
-            spectrum = (
-                models.Spectrum.objects.filter(id=id)
-                .select_related(
-                    "owner_state",
-                    "owner_state__protein",
-                    "owner_dye",
-                    "owner_camera",
-                    "owner_filter",
-                    "owner_light",
-                )
-                .get()
-            )
-            cache.set(key, spectrum, timeout)
-        except models.Spectrum.DoesNotExist:
-            return None
-    return spectrum
+from .loaders import SpectrumLoader, StateLoader, load_with_siblings
 
 
 def get_requested_fields(info: GraphQLResolveInfo) -> set[str]:
@@ -102,7 +79,8 @@ class Query(graphene.ObjectType):
 
     def resolve_spectrum(self, info, **kwargs):
         _id = kwargs.get("id")
-        return get_cached_spectrum(_id) if _id is not None else None
+        # batched with all other spectrum(id:) fields in the query
+        return load_with_siblings(info, SpectrumLoader, _id) if _id is not None else None
 
     # def resolve_spectra(self, info, **kwargs):
     #     return gdo.query(models.Spectrum.objects.all(), info)
@@ -111,11 +89,11 @@ class Query(graphene.ObjectType):
     states = graphene.List(types.State)
 
     def resolve_states(self, info, **kwargs):
-        return models.State.objects.all()
+        return gdo.query(models.State.objects.all(), info)
 
     def resolve_state(self, info, **kwargs):
         _id = kwargs.get("id")
-        return models.State.objects.get(id=_id) if _id is not None else None
+        return load_with_siblings(info, StateLoader, _id) if _id is not None else None
 
     opticalConfigs = graphene.List(types.OpticalConfig)
     opticalConfig = graphene.Field(types.OpticalConfig, id=graphene.Int())
@@ -8,6 +8,7 @@ from graphene_django.types import DjangoObjectType
 from references.schema import Reference
 
 from .. import models
+from .loaders import OWNER_LOADERS, get_loader
 
 
 def nullable_enum_from_field(_model, _field):
@@ -192,29 +193,18 @@ class SpectrumOwnerUnion(graphene.Union):
         types = (State,)
 
 
-# class SpectrumLoader(DataLoader):
-#     def batch_load_fn(self, keys):
-#         spectra = {
-#             spectrum.id: spectrum
-#             for spectrum in models.Spectrum.objects.filter(id__in=keys).select_related(
-#                 "owner_state",
-#                 "owner_state__protein",
-#                 "owner_dye",
-#                 "owner_camera",
-#                 "owner_filter",
-#                 "owner_light",
-#             )
-#         }
-#         return Promise.resolve([spectra.get(spectra_id) for spectra_id in keys])
-
-
 class Spectrum(gdo.OptimizedDjangoObjectType):
     class Meta:
         model = models.Spectrum
-        fields = "__all__"
+        exclude = ("wave_start", "wave_step", "y_packed")
 
     owner = graphene.Field(SpectrumOwnerInterface)
     color = graphene.String()
+    data = graphene.List(graphene.List(graphene.Float))
+
+    @gdo.resolver_hints(only=("wave_start", "wave_step", "y_packed"))
+    def resolve_data(self, info, **kwargs):
+        return self.pairs()
 
     @gdo.resolver_hints(
         select_related=(
@@ -233,7 +223,13 @@ class Spectrum(gdo.OptimizedDjangoObjectType):
         ),
     )
     def resolve_owner(self, info, **kwargs):
-        return self.owner
+        for field, loader in OWNER_LOADERS.items():
+            owner_id = getattr(self, f"{field}_id")
+            if owner_id is not None:
+                if self._meta.get_field(field).is_cached(self):
+                    return getattr(self, field)
+                return get_loader(info.context, loader).load(owner_id)
+        return None
 
     def resolve_color(self, info, **kwargs):
         return self.color()
@@ -1,45 +1,219 @@
-from celery import shared_task
-from sentry_sdk import capture_exception
+import contextlib
 
+from celery import chord, shared_task
+from celery.utils import uuid
+from django.core.cache import cache
+
+from .models.fret import FORSTER_LIST_CACHE_KEY
+from .util.fret import update_fret_pairs
 from .util.helpers import forster_list
 
 
 @shared_task
-def calc_fret():
-    return forster_list()
+def calc_fret(full=False):
+    """update FRETPair rows for changed proteins, then refresh the cached forster list"""
+    try:
+        update_fret_pairs(full=full)
+        L = forster_list()
+        cache.set(FORSTER_LIST_CACHE_KEY, L, 60 * 60 * 24)
+    finally:
+        cache.delete("calc_fret_job")
+    return len(L)
+
+
+def _lineage_scheduled_key(tree_id):
+    return f"lineage_refresh_scheduled:{tree_id}"
+
+
+@shared_task
+def refresh_lineages(tree_id=None, force=False):
+    """update stored root-relative mutations & validation errors of lineage nodes that changed"""
+    from proteins.models import Lineage
+    from proteins.util.datachecks import run_checks
+    from proteins.util.maintain import refresh_lineage_annotations
+
+    if tree_id is not None:
+        cache.delete(_lineage_scheduled_key(tree_id))
+    qs = Lineage.objects.filter(tree_id=tree_id) if tree_id is not None else None
+    n = refresh_lineage_annotations(qs, force=force)
+    if n:
+        protein_ids = list(qs.values_list("protein_id", flat=True)) if qs is not None else None
+        run_checks(["linprobs"], protein_ids)
+    return n
+
+
+def schedule_lineage_refresh(tree_id, countdown=10):
+    """run refresh_lineages for a tree soon, once for any number of calls in the meantime"""
+    if cache.add(_lineage_scheduled_key(tree_id), True, countdown + 60):
+        refresh_lineages.apply_async((tree_id,), countdown=countdown)
+
+
+@shared_task
+def run_datachecks(names=None, protein_ids=None):
+    """rerun data checks (default: all of them, for all proteins) and store their findings"""
+    from proteins.util.datachecks import run_checks
+
+    run_checks(names, protein_ids)
+
+
+LOCAL_BRIGHTNESS_SCHEDULED_KEY = "local_brightness_scheduled"
+
+
+@shared_task
+def refresh_local_brightness():
+    """recompute the stored local brightness of all states"""
+    from proteins.util.maintain import update_local_brightness
+
+    cache.delete(LOCAL_BRIGHTNESS_SCHEDULED_KEY)
+    return update_local_brightness()
+
+
+def schedule_local_brightness(countdown=10):
+    """run refresh_local_brightness soon, once for any number of calls in the meantime"""
+    if cache.add(LOCAL_BRIGHTNESS_SCHEDULED_KEY, True, countdown + 60):
+        refresh_local_brightness.apply_async(countdown=countdown)
 
 
 @shared_task(bind=True)
 def calculate_scope_report(self, scope_id, outdated_ids=None, fluor_collection=None):
+    from proteins.models import Microscope, OcFluorEff
+    from proteins.util.efficiency import bulk_update_oc_effs
+
+    def progress(current, total):
+        self.update_state(state="PROGRESS", meta={"current": current, "total": total})
+
+    try:
+        m = Microscope.objects.get(id=scope_id)
+        oclist = m.optical_configs.all()
+        only = None
+        if outdated_ids:
+            rows = OcFluorEff.objects.filter(id__in=outdated_ids).values_list("oc", "content_type__model", "object_id")
+            only = {(oc_id, (model, obj_id)) for oc_id, model, obj_id in rows}
+            oclist = oclist.filter(id__in={oc_id for oc_id, _ in only})
+        return bulk_update_oc_effs(oclist, fluor_collection, only=only, progress=progress)
+    finally:
+        finish_scope_report(scope_id, self.request.id)
+
+
+# number of fluorophores per shard when a scope report is split across workers
+SCOPE_REPORT_SHARD_SIZE = 250
+
+
+# how long a started report blocks another one for the same scope (if it never finishes)
+SCOPE_REPORT_TIMEOUT = 60 * 60
+
+
+def _running_key(scope_id):
+    return f"scope_report_running:{scope_id}"
+
+
+def running_scope_report(scope_id):
+    """id of the report job currently running for a scope, or None"""
+    return cache.get(_running_key(scope_id))
+
+
+def finish_scope_report(scope_id, job_id):
+    """forget the running report of a scope, if it is still job_id"""
+    key = _running_key(scope_id)
+    if job_id and cache.get(key) == job_id:
+        cache.delete(key)
+
+
+def _progress_keys(job_id):
+    return f"scope_report_{job_id}_current", f"scope_report_{job_id}_total", f"scope_report_{job_id}_shards"
+
+
+def get_scope_report_progress(job_id):
+    """aggregated {"current": ..., "total": ...} of a sharded scope report, or None"""
+    current, total, _ = _progress_keys(job_id)
+    values = cache.get_many([current, total])
+    if total not in values:
+        return None
+    return {"current": values.get(current, 0), "total": values[total]}
+
+
+def revoke_scope_report_shards(job_id):
+    from celery import current_app
+
+    for shard_id in cache.get(_progress_keys(job_id)[2]) or ():
+        current_app.control.revoke(shard_id, terminate=True)
+
+
+def _scope_report_fluor_keys(outdated_ids=None):
+    from proteins.models import Dye, OcFluorEff, State
+
+    if outdated_ids:
+        rows = OcFluorEff.objects.filter(id__in=outdated_ids).values_list("content_type__model", "object_id")
+        return sorted(set(rows))
+    keys = [("state", i) for i in State.objects.with_spectra().values_list("id", flat=True)]
+    return keys + [("dye", i) for i in Dye.objects.with_spectra().values_list("id", flat=True)]
+
+
+def start_scope_report(scope_id, outdated_ids=None, shard_size=SCOPE_REPORT_SHARD_SIZE):
+    """start calculating a scope report, returns the id of the job to poll
+
+    small reports run as a single calculate_scope_report task. Larger ones are
+    sharded by fluorophore across workers with a chord: each shard computes its
+    slice of the efficiency matrix, and merge_scope_report writes them all.
+    If a report is already running for the scope, its job id is returned instead.
+    """
+    from proteins.models import OpticalConfig
+
+    job_id = uuid()
+    if not cache.add(_running_key(scope_id), job_id, SCOPE_REPORT_TIMEOUT):
+        return running_scope_report(scope_id)
+
+    keys = _scope_report_fluor_keys(outdated_ids)
+    if len(keys) <= shard_size:
+        calculate_scope_report.apply_async((scope_id,), {"outdated_ids": outdated_ids}, task_id=job_id)
+        return job_id
+
+    current, total, shards = _progress_keys(job_id)
+    noc = OpticalConfig.objects.filter(microscope_id=scope_id).count()
+    cache.set_many({current: 0, total: noc * len(keys)}, 60 * 60)
+    header = [
+        calculate_scope_report_shard.s(scope_id, keys[i : i + shard_size], outdated_ids, job_id).set(task_id=uuid())
+        for i in range(0, len(keys), shard_size)
+    ]
+    cache.set(shards, [sig.options["task_id"] for sig in header], 60 * 60)
+    chord(header)(merge_scope_report.s(job_id, scope_id).set(task_id=job_id))
+    return job_id
+
+
+@shared_task
+def calculate_scope_report_shard(scope_id, fluor_keys, outdated_ids=None, job_id=None):
+    """efficiency rows (see util.efficiency.compute_oc_effs) for a slice of the fluorophores"""
     from proteins.models import Dye, Microscope, OcFluorEff, State
+    from proteins.util.efficiency import compute_oc_effs, get_fluor_matrix
 
-    if not fluor_collection:
-        fluor_collection = list(State.objects.with_spectra())
-        fluor_collection += list(Dye.objects.with_spectra())
-    m = Microscope.objects.get(id=scope_id)
-    updated = []
-    i = 0
+    ids = {"state": [], "dye": []}
+    for model, obj_id in fluor_keys:
+        ids[model].append(obj_id)
+    fluors = list(State.objects.filter(id__in=ids["state"]).select_related("protein"))
+    fluors += list(Dye.objects.filter(id__in=ids["dye"]))
+
+    oclist = Microscope.objects.get(id=scope_id).optical_configs.all()
+    only = None
     if outdated_ids:
-        total = len(outdated_ids)
-        for x in OcFluorEff.objects.filter(id__in=outdated_ids).all():
-            i += 1
-            self.update_state(state="PROGRESS", meta={"current": i, "total": total})
-            x.save()
-        return
-    total = m.optical_configs.count() * len(fluor_collection)
-    for oc in m.optical_configs.all():
-        for f in set(fluor_collection):
-            i += 1
-            self.update_state(state="PROGRESS", meta={"current": i, "total": total})
-            try:
-                kwargs = {"oc": oc}
-                kwargs[f.__class__.__name__.lower()] = f
-                obj = OcFluorEff.objects.get(**kwargs)
-                if obj.outdated:
-                    obj.save()
-                    updated.append((oc, f))
-            except OcFluorEff.DoesNotExist:
-                try:
-                    OcFluorEff.objects.create(oc=oc, fluor=f)
-                except Exception as e:
-                    capture_exception(e)
+        rows = OcFluorEff.objects.filter(id__in=outdated_ids).values_list("oc", "content_type__model", "object_id")
+        only = {(oc_id, (model, obj_id)) for oc_id, model, obj_id in rows}
+
+    def progress(current, total):
+        if job_id:
+            with contextlib.suppress(ValueError):  # progress expired or cleared
+                cache.incr(_progress_keys(job_id)[0], len(fluor_keys))
+
+    return compute_oc_effs(oclist, fluors, only=only, progress=progress, matrix=get_fluor_matrix())
+
+
+@shared_task
+def merge_scope_report(shard_rows, job_id=None, scope_id=None):
+    """chord callback: write the rows computed by all shards"""
+    from proteins.util.efficiency import write_oc_effs
+
+    try:
+        return write_oc_effs([row for rows in shard_rows for row in rows])
+    finally:
+        if job_id:
+            cache.delete_many(_progress_keys(job_id))
+            finish_scope_report(scope_id, job_id)
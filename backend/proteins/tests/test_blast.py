@@ -0,0 +1,87 @@
+import os
+import tempfile
+import threading
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from ..util import blast
+
+
+class FakeBuild:
+    """stands in for make_blastdb, writing a numbered database file"""
+
+    def __init__(self):
+        self.n = 0
+
+    def __call__(self, path):
+        self.n += 1
+        with open(path, "w") as fd:
+            fd.write(str(self.n))
+        return path
+
+
+def read(path):
+    with open(path) as fd:
+        return fd.read()
+
+
+class TestBlastDB(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "FPbase_blastdb.fsa")
+        self.build = FakeBuild()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_versioned_swap(self):
+        self.assertIsNone(blast.current_db(self.db))
+        for n in range(1, 4):
+            path = blast.rebuild_blastdb(self.db, self.build)
+            self.assertEqual(blast.current_db(self.db), os.path.join(self.tmp.name, "current", "FPbase_blastdb.fsa"))
+            self.assertEqual(read(blast.current_db(self.db)), str(n))
+            self.assertEqual(read(path), str(n))
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp.name, "versions"))), blast.KEEP_VERSIONS)
+
+    def test_failed_build_keeps_current(self):
+        blast.rebuild_blastdb(self.db, self.build)
+
+        def fail(path):
+            open(path, "w").close()
+            raise RuntimeError("makeblastdb failed")
+
+        with self.assertRaises(RuntimeError):
+            blast.rebuild_blastdb(self.db, fail)
+        self.assertEqual(read(blast.current_db(self.db)), "1")
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp.name, "versions"))), 1)
+
+    def test_build_lock(self):
+        with blast._build_lock(self.tmp.name):
+            threads = [threading.Thread(target=blast.ensure_blastdb, args=(self.db, self.build)) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            threads[0].join(0.2)
+            # the builds wait for the lock
+            self.assertTrue(threads[0].is_alive())
+            self.assertIsNone(blast.current_db(self.db))
+        for thread in threads:
+            thread.join()
+        # the database is only built once, by one of the concurrent callers
+        self.assertEqual(self.build.n, 1)
+        self.assertEqual(read(blast.ensure_blastdb(self.db, self.build)), "1")
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp.name, "versions"))), 1)
+
+    def test_stale_flag(self):
+        blast.mark_blastdb_stale()
+        # nothing to refresh before the first build
+        self.assertIsNone(blast.refresh_stale_blastdb(self.db, self.build))
+        self.assertTrue(cache.get(blast.BLASTDB_STALE_KEY))
+
+        blast.ensure_blastdb(self.db, self.build)
+        thread = blast.refresh_stale_blastdb(self.db, self.build)
+        thread.join()
+        self.assertIsNone(cache.get(blast.BLASTDB_STALE_KEY))
+        self.assertEqual(read(blast.current_db(self.db)), "2")
+        self.assertIsNone(blast.refresh_stale_blastdb(self.db, self.build))
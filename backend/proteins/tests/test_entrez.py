@@ -0,0 +1,119 @@
+import io
+import json
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..extrest.entrez import fetch_gb_seqs, get_cached_gbseqs, ncbi_throttle
+from ..extrest.sync import ExternalSync
+from ..models import Protein
+
+SEQS = {"AAB02572": "MSKGEELFTGVVPILVELDGDVNGHKFSVSGEG", "ACO48282": "MVSKGEEDNMAIIKEFMRFKVHMEGSVNGHEFE"}
+
+GENPEPT = """LOCUS       {id}                  {n} aa            linear   SYN 30-JUL-1996
+DEFINITION  green fluorescent protein.
+ACCESSION   {id}
+VERSION     {id}.1
+KEYWORDS    .
+SOURCE      Aequorea victoria
+  ORGANISM  Aequorea victoria
+            Eukaryota; Metazoa; Cnidaria.
+FEATURES             Location/Qualifiers
+     Protein         1..{n}
+                     /product="green fluorescent protein"
+ORIGIN
+        1 {seq}
+//
+"""
+
+
+class FakeEntrez:
+    """stands in for Bio.Entrez, serving records from dicts & counting requests"""
+
+    def __init__(self, seqs, searches=None):
+        self.seqs = seqs
+        self.searches = searches or {}
+        self.requests = []
+
+    def efetch(self, db, id, rettype, retmode):
+        self.requests.append((db, list(id)))
+        if rettype == "gb":
+            return io.StringIO(
+                "".join(GENPEPT.format(id=i, n=len(s), seq=s.lower()) for i, s in self.seqs.items() if i in id)
+            )
+        return io.StringIO("".join(f">{i}.1 fake\n{self.seqs[i]}\n" for i in id if i in self.seqs))
+
+    def esearch(self, db, term):
+        self.requests.append((db, term))
+        ids = [self.searches[term]] if term in self.searches else []
+        return io.StringIO(json.dumps({"Count": str(len(ids)), "IdList": ids}))
+
+    def read(self, handle):
+        return json.loads(handle.read())
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.content = text.encode()
+        self.status_code = 200
+        self.ok = True
+
+
+class FakeUniprot:
+    """stands in for requests, serving UniProt records & ID mappings"""
+
+    def __init__(self, seqs, embl):
+        self.seqs = seqs
+        self.embl = embl
+
+    def get(self, url, params=None):
+        if params is None:
+            id = url.rsplit("/", 1)[-1].replace(".xml", "")
+            xml = f"<uniprot><entry><accession>{id}</accession><sequence>{self.seqs[id]}</sequence></entry></uniprot>"
+            return FakeResponse(xml)
+        if params["to"] == "EMBL":
+            return FakeResponse("\n".join(self.embl.get(params["query"], [])))
+        return FakeResponse("\n".join(u for u, gbs in self.embl.items() if params["query"] in gbs))
+
+
+class TestGenbankCache(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fetch_batches(self):
+        fake = FakeEntrez(SEQS)
+        self.assertEqual(fetch_gb_seqs(list(SEQS), batch_size=1, transport=fake), SEQS)
+        self.assertEqual(len(fake.requests), 2)
+
+    def test_cached_per_accession(self):
+        fake = FakeEntrez(SEQS)
+        self.assertEqual(get_cached_gbseqs(["AAB02572", "ABC12345"], transport=fake), {"AAB02572": SEQS["AAB02572"]})
+        # only the uncached accession is fetched, unknown accessions are not refetched
+        self.assertEqual(get_cached_gbseqs([*SEQS, "ABC12345"], transport=fake), SEQS)
+        self.assertEqual(fake.requests, [("protein", ["AAB02572", "ABC12345"]), ("protein", ["ACO48282"])])
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
+    def test_throttle_without_cache(self):
+        start = time.monotonic()
+        for _ in range(4):
+            ncbi_throttle()
+        self.assertTrue(0.5 < time.monotonic() - start < 2)
+        self.assertEqual(get_cached_gbseqs(list(SEQS), transport=FakeEntrez(SEQS)), SEQS)
+
+
+class TestExternalSync(TestCase):
+    def test_run(self):
+        egfp = Protein.objects.create(name="EGFP", genbank="AAB02572", uniprot="P42212")
+        Protein.objects.create(name="mCherry", genbank="ACO48282")
+        entrez = FakeEntrez(SEQS, searches={"Aequorea victoria": "6100", "AAB02572": "123"})
+        http = FakeUniprot({"P42212": SEQS["AAB02572"]}, embl={"P42212": ["AAB02572.1"]})
+
+        results = {changes.id: (changes, warnings) for changes, warnings in ExternalSync(entrez, http).run()}
+        changes, warnings = results[egfp.id]
+        self.assertEqual(warnings, [])
+        self.assertEqual(changes.changes, {"seq": SEQS["AAB02572"], "parent_organism": 6100, "ipg_id": "123"})
+        # one genbank request for both proteins, one taxonomy lookup for their shared organism
+        self.assertEqual(sum(db == "protein" for db, _ in entrez.requests), 1)
+        self.assertEqual(sum(db == "taxonomy" for db, _ in entrez.requests), 1)
@@ -0,0 +1,37 @@
+import io
+
+from ..util.kmer import KmerIndex, kmers
+
+GFP = "MVSKGEELFTGVVPILVELDGDVNGHKFSVSGEGEGDATYGKLTLKFICTTGKLPVPWPTLVTTLTYGVQCFSRYPDHMKQHDFFKSAMPEGYVQERTIFFKDDGNYKTRAEVKFEGDTLVNRIELKGIDFKEDGNILGHKLEYNYNSHNVYIMADKQKNGIKVNFKIRHNIEDGSVQLADHYQQNTPIGDGPVLLPDNHYLSTQSALSKDPNEKRDHMVLLEFVTAAGITLGMDELYK"  # noqa
+MCHERRY = "MVSKGEEDNMAIIKEFMRFKVHMEGSVNGHEFEIEGEGEGRPYEGTQTAKLKVTKGGPLPFAWDILSPQFMYGSKAYVKHPADIPDYLKLSFPEGFKWERVMNFEDGGVVTVTQDSSLQDGEFIYKVKLRGTNFPSDGPVMQKKTMGWEASSERMYPEDGALKGEIKQRLKLKDGGHYDAEVKTTYKAKKPVQLPGAYNVNIKLDITSHNEDYTIVEQYERAEGRHSTGGMDELYK"  # noqa
+FASTA = f">AAAAA EGFP\n{GFP}\n>BBBBB mCherry\n{MCHERRY}\n>CCCCC short\nMVS"
+
+
+class TestKmerIndex:
+    def test_kmers(self):
+        assert len(kmers("AAAA")) == 1
+        assert len(kmers("ACDE")) == 2
+        assert len(kmers("AC")) == 0
+        assert (kmers("acde") == kmers("ACDE")).all()
+
+    def test_from_fasta(self):
+        index = KmerIndex.from_fasta(io.StringIO(FASTA))
+        assert len(index) == 3
+        assert "BBBBB" in index
+
+    def test_search(self):
+        index = KmerIndex.from_fasta(io.StringIO(FASTA))
+        query = GFP[:64] + "W" + GFP[65:]
+        hits = index.search(query, n=2)
+        assert [h[0] for h in hits] == ["AAAAA", "BBBBB"]
+        assert hits[0][1] > 0.99
+        assert index.search(MCHERRY)[0][:2] == ("BBBBB", 1)
+
+    def test_update(self):
+        index = KmerIndex.from_fasta(io.StringIO(FASTA))
+        index.add("AAAAA", MCHERRY)
+        assert {h[0] for h in index.search(MCHERRY, n=2) if h[1] == 1} == {"AAAAA", "BBBBB"}
+        index.remove("BBBBB")
+        assert "BBBBB" not in index
+        assert index.search(MCHERRY)[0][0] == "AAAAA"
+        assert index.candidates("WWWWWW") == []
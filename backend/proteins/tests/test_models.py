@@ -1,6 +1,33 @@
+import io
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Avg
 from django.test import TestCase
 
-from ..models import Protein, Spectrum, State
+from .. import tasks
+from ..models import (
+    DataCheckFinding,
+    DataCheckRun,
+    Filter,
+    FilterPlacement,
+    Lineage,
+    Microscope,
+    OcFluorEff,
+    OpticalConfig,
+    Organism,
+    Protein,
+    ProteinAlias,
+    SearchIdentifier,
+    Spectrum,
+    State,
+)
+from ..models.fret import FORSTER_LIST_CACHE_KEY
+from ..models.spectrum import FLUOR_MATRIX_CACHE_KEY
+from ..util import maintain
+from ..util.datachecks import run_checks
+from ..util.efficiency import bulk_update_oc_effs
 
 
 class TestProteinModel(TestCase):
@@ -52,3 +79,277 @@ class TestProteinModel(TestCase):
     def test_spectra_img(self):
         for ext in ("png", "svg", "tif", "pdf", "jpeg"):
             assert self.protA.spectra_img(fmt=ext)
+
+    def test_fluor_matrix_invalidated_on_commit(self):
+        spectrum = Spectrum.objects.filter(owner_state__protein=self.protA).first()
+        for change in (spectrum.save, spectrum.delete):
+            cache.set(FLUOR_MATRIX_CACHE_KEY, "matrix")
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+                self.assertEqual(cache.get(FLUOR_MATRIX_CACHE_KEY), "matrix")
+            self.assertIsNone(cache.get(FLUOR_MATRIX_CACHE_KEY))
+
+    def test_forster_list_invalidated_on_commit(self):
+        state = self.protA.states.first()
+        state.qy = 0.5
+        for change in (state.save, state.spectra.first().save):
+            cache.set(FORSTER_LIST_CACHE_KEY, ["pair"])
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+                self.assertEqual(cache.get(FORSTER_LIST_CACHE_KEY), ["pair"])
+            self.assertIsNone(cache.get(FORSTER_LIST_CACHE_KEY))
+
+
+class TestLocalBrightness(TestCase):
+    def test_update_local_brightness(self):
+        from ..util.maintain import update_local_brightness
+
+        protein = Protein.objects.create(name="ProteinC")
+        for i, (em, ec) in enumerate([(500, 20000), (510, 50000), (530, 80000), (600, 30000), (650, None)]):
+            State.objects.create(name=f"s{i}", em_max=em, ext_coeff=ec, qy=0.5, protein=protein)
+        update_local_brightness()
+        for state in State.objects.all():
+            if not (state.em_max and state.brightness):
+                self.assertEqual(state.local_brightness, 1)
+                continue
+            B = State.objects.exclude(id=state.id).filter(em_max__around=state.em_max).aggregate(Avg("brightness"))
+            expected = round(state.brightness / B["brightness__avg"], 4) if B["brightness__avg"] else 1
+            self.assertAlmostEqual(state.local_brightness, expected)
+        self.assertEqual(State.objects.filter(local_brightness__gt=1.2).count(), 1)
+
+
+class TestProteinAlias(TestCase):
+    def test_by_alias(self):
+        protein = Protein.objects.create(name="mCherry2", aliases=["mCh 2.0"])
+        self.assertEqual(Protein.objects.deep_get("mCherry2"), protein)
+        self.assertEqual(Protein.objects.deep_get("mch-20"), protein)
+        self.assertIsNone(Protein.objects.by_alias("Cherry2").first())
+        self.assertEqual(Protein.objects.by_alias("Cherry2", max_kind=ProteinAlias.BASE_NAME).first(), protein)
+        protein.aliases = []
+        protein.save()
+        with self.assertRaises(Protein.DoesNotExist):
+            Protein.objects.deep_get("mCh 2.0")
+
+    def test_by_alias_shared(self):
+        first = Protein.objects.create(name="mFoo", aliases=["FooFP"])
+        second = Protein.objects.create(name="mBar", aliases=["FooFP", "mFoo"])
+        self.assertEqual(Protein.objects.deep_get("FooFP"), first)
+        # an exact name beats a shared alias, and each protein is listed once
+        self.assertEqual(list(Protein.objects.by_alias("FooFP", "mBar")), [second, first])
+
+
+class TestSearchIdentifier(TestCase):
+    def test_organism_weight(self):
+        # bulk_create skips Organism.save, which looks the names up at NCBI
+        aeq, dis = Organism.objects.bulk_create(
+            [Organism(id=6100, scientific_name="Aequorea victoria"), Organism(id=86600, scientific_name="Discosoma")]
+        )
+        for organism in (aeq, dis):
+            SearchIdentifier.reindex(organism)
+
+        def weights():
+            rows = SearchIdentifier.objects.filter(kind=SearchIdentifier.ORGANISM)
+            return dict(rows.values_list("object_id", "weight"))
+
+        protein = Protein.objects.create(name="EGFP", parent_organism=aeq)
+        Protein.objects.create(name="mCherry", parent_organism=dis)
+        self.assertEqual(weights(), {aeq.id: 1, dis.id: 1})
+        protein = Protein.objects.get(id=protein.id)
+        protein.parent_organism = dis
+        protein.save()
+        self.assertEqual(weights(), {aeq.id: 0, dis.id: 2})
+        protein.delete()
+        self.assertEqual(weights(), {aeq.id: 0, dis.id: 1})
+
+
+class TestLineageAnnotations(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.parent = Protein.objects.create(name="Parent", seq="MVSKGEELFTGVVPILVELDGDVNGHKF")
+        cls.child = Protein.objects.create(name="Child", seq="MVSKGEELFTGVVPILVELDGDANGHKF")
+        cls.root = Lineage.objects.create(protein=cls.parent)
+        cls.node = Lineage.objects.create(protein=cls.child, parent=cls.root, mutation="V23A")
+
+    def refresh(self, **kwargs):
+        out = io.StringIO()
+        call_command("refreshlineages", stdout=out, **kwargs)
+        return out.getvalue().strip()
+
+    def test_fingerprint(self):
+        node = Lineage.objects.get(id=self.node.id)
+        key = maintain.lineage_fingerprint(node)
+        node.reference = None
+        self.assertEqual(maintain.lineage_fingerprint(node), key)
+        node.protein.seq = "MVSKGEELFTGVVPILVELDGDGNGHKF"
+        self.assertNotEqual(maintain.lineage_fingerprint(node), key)
+
+    def test_refresh_command(self):
+        self.assertEqual(self.refresh(), "updated 2 lineage nodes")
+        self.assertEqual(self.refresh(), "updated 0 lineage nodes")
+        self.assertEqual(self.refresh(force=True), "updated 2 lineage nodes")
+        node = Lineage.objects.get(id=self.node.id)
+        self.assertEqual(node.aligned_rootmut, "V23A")
+        self.assertEqual(node.validation_errors, [])
+
+        Protein.objects.filter(id=self.child.id).update(seq="MVSKGEELFTGVVPILVELDGDGNGHKF")
+        self.assertEqual(self.refresh(), "updated 1 lineage nodes")
+        self.assertTrue(Lineage.objects.get(id=self.node.id).validation_errors)
+
+    def test_refresh_keeps_going_after_errors(self):
+        annotate = maintain.annotate_lineage_node
+
+        def fail_on_root(node):
+            if node.id == self.root.id:
+                raise ValueError("alignment failed")
+            annotate(node)
+
+        with mock.patch.object(maintain, "annotate_lineage_node", fail_on_root):
+            self.assertEqual(maintain.refresh_lineage_annotations(), 2)
+        root, node = Lineage.objects.get(id=self.root.id), Lineage.objects.get(id=self.node.id)
+        self.assertEqual(root.validation_errors, ["could not check Parent: alignment failed"])
+        self.assertEqual(root.annotation_key, "")
+        self.assertEqual(node.aligned_rootmut, "V23A")
+        # the failed node is retried
+        self.assertEqual(maintain.refresh_lineage_annotations(), 1)
+        self.assertEqual(Lineage.objects.get(id=self.root.id).validation_errors, [])
+
+    def test_schedule_refresh_on_commit(self):
+        cache.clear()
+        with mock.patch.object(tasks.refresh_lineages, "apply_async") as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.node.schedule_refresh()
+                self.root.save()
+                apply_async.assert_not_called()
+            # one refresh for the tree, however many of its nodes were saved
+            apply_async.assert_called_once_with((self.node.tree_id,), countdown=10)
+
+            tasks.refresh_lineages(self.node.tree_id)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.node.schedule_refresh()
+            self.assertEqual(apply_async.call_count, 2)
+
+
+def ramp(start, stop):
+    return [[float(w), round((w - start) / (stop - start), 4)] for w in range(start, stop + 1)]
+
+
+class TestOcFluorEff(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.scope = scope = Microscope.objects.create(name="Scope")
+        cls.filter = Filter.objects.create(name="Emitter")
+        Spectrum.objects.create(
+            category=Spectrum.FILTER, subtype=Spectrum.BP, owner_filter=cls.filter, data=ramp(500, 560)
+        )
+        cls.oc1 = OpticalConfig.objects.create(name="GFP", microscope=scope)
+        cls.oc1.add_filter(cls.filter, FilterPlacement.EM)
+        cls.oc2 = OpticalConfig.objects.create(name="Open", microscope=scope)
+        protein = Protein.objects.create(name="ProteinA")
+        cls.states = []
+        for i in range(2):
+            state = State.objects.create(
+                name=f"s{i}", ex_max=488, em_max=510, qy=0.5, ext_coeff=50000, protein=protein
+            )
+            Spectrum.objects.create(
+                category=Spectrum.PROTEIN, subtype=Spectrum.EX, owner_state=state, data=ramp(450 + 10 * i, 500)
+            )
+            Spectrum.objects.create(
+                category=Spectrum.PROTEIN, subtype=Spectrum.EM, owner_state=state, data=ramp(490 + 10 * i, 580)
+            )
+            cls.states.append(state)
+        bulk_update_oc_effs([cls.oc1, cls.oc2], cls.states)
+
+    def dirty(self):
+        return set(OcFluorEff.objects.outdated().values_list("oc__name", "object_id"))
+
+    def test_fluor_spectrum_changed(self):
+        s0, s1 = self.states
+        self.assertEqual(self.dirty(), set())
+        s0.spectra.first().save()
+        self.assertEqual(self.dirty(), {("GFP", s0.id), ("Open", s0.id)})
+
+    def test_filter_spectrum_changed(self):
+        s0, s1 = self.states
+        self.filter.spectrum.save()
+        self.assertEqual(self.dirty(), {("GFP", s0.id), ("GFP", s1.id)})
+
+    def test_optical_config_changed(self):
+        s0, s1 = self.states
+        self.oc2.save()
+        self.assertEqual(self.dirty(), {("Open", s0.id), ("Open", s1.id)})
+        OcFluorEff.objects.update(dirty=False)
+        self.oc2.add_filter(self.filter, FilterPlacement.EM)
+        self.assertEqual(self.dirty(), {("Open", s0.id), ("Open", s1.id)})
+
+    def test_recompute_clears_flag(self):
+        OcFluorEff.objects.mark_dirty()
+        bulk_update_oc_effs([self.oc1], self.states)
+        self.assertEqual(self.dirty(), {("Open", s.id) for s in self.states})
+        eff = OcFluorEff.objects.outdated().first()
+        eff.save()
+        eff.refresh_from_db()
+        self.assertFalse(eff.dirty)
+        self.assertEqual(len(self.dirty()), 1)
+
+    def test_recompute_in_place(self):
+        ids = set(OcFluorEff.objects.values_list("id", flat=True))
+        self.assertEqual(len(ids), 4)
+        OcFluorEff.objects.mark_dirty()
+        with mock.patch.object(tasks.calculate_scope_report, "update_state"):
+            result = tasks.calculate_scope_report.apply((self.scope.id,), {"fluor_collection": self.states})
+        self.assertEqual(result.get(), 4)
+        bulk_update_oc_effs([self.oc1, self.oc2], self.states)
+        self.assertEqual(set(OcFluorEff.objects.values_list("id", flat=True)), ids)
+        self.assertEqual(self.dirty(), set())
+
+        # same values as recomputing each row on its own
+        fields = ("ex_eff", "ex_eff_broad", "em_eff", "brightness")
+        for eff in OcFluorEff.objects.all():
+            stored = [getattr(eff, f) for f in fields]
+            eff.update_effs()
+            for value, expected in zip(stored, (getattr(eff, f) for f in fields), strict=True):
+                if expected is None:
+                    self.assertIsNone(value)
+                else:
+                    self.assertAlmostEqual(value, expected, places=6)
+        self.assertTrue(OcFluorEff.objects.filter(oc=self.oc1).exclude(em_eff=None).exists())
+
+
+class TestDataChecks(TestCase):
+    def test_run_checks(self):
+        bare = Protein.objects.create(name="Bare")
+        tagged = Protein.objects.create(name="Tagged", seq="MHHHHHHVSKGEE")
+        run_checks(["noseqs", "nostates", "histags"])
+        findings = set(DataCheckFinding.objects.values_list("check_name", "protein_id"))
+        self.assertIn(("noseqs", bare.id), findings)
+        self.assertNotIn(("noseqs", tagged.id), findings)
+        self.assertIn(("histags", tagged.id), findings)
+        self.assertEqual(DataCheckRun.objects.filter(check_name__in=["noseqs", "nostates", "histags"]).count(), 3)
+
+        # rerunning for one protein leaves the findings of the others alone
+        State.objects.create(protein=bare, ex_max=488, em_max=510)
+        run_checks(["nostates"], [bare.id])
+        nostates = set(DataCheckFinding.objects.filter(check_name="nostates").values_list("protein_id", flat=True))
+        self.assertEqual(nostates, {tagged.id})
+
+    def test_rerun_on_save(self):
+        protein = Protein.objects.create(name="Bare")
+        with mock.patch("proteins.util.datachecks.run_checks") as rerun:
+            with self.captureOnCommitCallbacks(execute=True):
+                state = State.objects.create(protein=protein, ex_max=488, em_max=510)
+            self.assertEqual(rerun.call_args.args[1], [protein.id])
+            rerun.reset_mock()
+            # spectra without an owner state belong to no protein
+            with self.captureOnCommitCallbacks(execute=True):
+                Spectrum.objects.create(
+                    category=Spectrum.FILTER,
+                    subtype=Spectrum.BP,
+                    owner_filter=Filter.objects.create(name="Emitter"),
+                    data=ramp(500, 560),
+                )
+            rerun.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                Spectrum.objects.create(
+                    category=Spectrum.PROTEIN, subtype=Spectrum.EX, owner_state=state, data=ramp(400, 500)
+                )
+            self.assertEqual(rerun.call_args.args[1], [protein.id])
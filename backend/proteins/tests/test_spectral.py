@@ -0,0 +1,180 @@
+import csv
+import importlib.util
+import io
+
+import numpy as np
+import pytest
+
+from ..util.fret import forster_radius, overlap_integrals
+from ..util.spectra import (
+    grid_values,
+    iter_spectra_arrow,
+    iter_spectra_csv,
+    iter_spectra_npz,
+    pack_spectrum,
+    unpack_spectrum,
+)
+from ..util.spectral import DenseSpectrum, SpectralMatrix, laser, product
+
+
+def _loop_product(arrlist):
+    # reference implementation: walk the overlapping wavelengths in python
+    minwave = max(int(a[0][0]) for a in arrlist)
+    maxwave = min(int(a[-1][0]) for a in arrlist)
+    out = []
+    for w in range(minwave, maxwave + 1):
+        val = 1
+        for a in arrlist:
+            val *= a[w - int(a[0][0])][1]
+        out.append([w, val])
+    return out
+
+
+def _loop_area(arr):
+    return sum((arr[i][1] + arr[i + 1][1]) / 2 for i in range(len(arr) - 1))
+
+
+A = [[400.0 + i, v] for i, v in enumerate(np.linspace(0, 1, 50))]
+B = [[420.0 + i, v] for i, v in enumerate(np.linspace(1, 0.2, 60))]
+
+
+class TestDenseSpectrum:
+    def test_roundtrip(self):
+        assert DenseSpectrum.from_data(A).to_data() == A
+
+    def test_product_matches_loop(self):
+        combo = product([A, B])
+        assert combo.start == 420
+        np.testing.assert_allclose(combo.to_data(), _loop_product([A, B]))
+
+    def test_area_matches_loop(self):
+        assert DenseSpectrum.from_data(A).area() == pytest.approx(_loop_area(A))
+        combo = product([A, B])
+        assert combo.area() == pytest.approx(_loop_area(_loop_product([A, B])))
+
+    def test_no_overlap(self):
+        far = [[700.0, 1], [701.0, 1]]
+        assert not product([A, far])
+        assert product([A, far]).area() == 0
+        assert product([]) is None
+
+    def test_invert(self):
+        inv = DenseSpectrum.from_data(A).invert()
+        np.testing.assert_allclose(inv.y, 1 - np.array(A)[:, 1])
+
+    def test_laser(self):
+        combo = laser(420) * DenseSpectrum.from_data(A)
+        assert combo.start == 419
+        assert combo.area() == pytest.approx(A[20][1])
+
+    def test_from_xy(self):
+        x = np.arange(400.0, 450.0, 2)
+        y = np.linspace(0, 1, len(x))
+        spectrum = DenseSpectrum.from_xy(x, y)
+        assert (spectrum.start, spectrum.stop) == (400, 449)
+        np.testing.assert_allclose(spectrum.y, np.interp(np.arange(400, 449), x, y))
+        assert DenseSpectrum.from_xy(np.array(A)[:, 0], np.array(A)[:, 1]).y.tolist() == [v for _, v in A]
+        assert not DenseSpectrum.from_xy([], [])
+        assert not DenseSpectrum.from_xy([400.5], [1])
+
+
+class TestSpectralMatrix:
+    def test_product_areas_match_dense(self):
+        rows = [A, B, None, [[700.0, 1], [701.0, 1]], [[449.0, 0.5], [450.0, 0.5]]]
+        matrix = SpectralMatrix(rows)
+        assert matrix.start == 400 and matrix.stop == 702
+        np.testing.assert_array_equal(matrix.present, [True, True, False, True, True])
+        for other in (B, laser(430), laser(449), DenseSpectrum(300, np.ones(500))):
+            expected = [product([r, other]).area() if r else 0 for r in rows]
+            np.testing.assert_allclose(matrix.product_areas(other), expected, rtol=1e-5, atol=1e-6)
+
+    def test_areas(self):
+        matrix = SpectralMatrix([A, None])
+        np.testing.assert_allclose(matrix.areas, [_loop_area(A), 0])
+
+
+class TestPackedSpectrum:
+    def test_roundtrip(self):
+        data = [[400.0 + i, round(v, 4)] for i, v in enumerate(np.linspace(0, 1, 50))]
+        start, step, packed = pack_spectrum(data)
+        assert (start, step, len(packed)) == (400, 1, 200)
+        x, y = unpack_spectrum(start, step, packed)
+        assert np.column_stack((x, y)).round(6).tolist() == data
+
+    def test_uneven_step(self):
+        assert pack_spectrum([[400, 0.1], [401, 0.2], [403, 0.3]]) == (None, None, None)
+        assert pack_spectrum([]) == (None, None, None)
+
+
+class FakeSpectrum:
+    category = "p"
+    subtype = "ex"
+
+    def __init__(self, id, data):
+        self.id = id
+        self.x_array = np.array([x for x, _ in data])
+        self.y_array = np.array([y for _, y in data])
+
+    def __str__(self):
+        return f"spectrum {self.id}"
+
+
+SPECTRA = [FakeSpectrum(1, [[400.0, 0.5], [402.0, 1.0]]), FakeSpectrum(2, []), FakeSpectrum(3, [[401.0, 0.2]])]
+GRID = np.arange(399, 403)
+
+
+class TestSpectraExport:
+    def test_grid_values(self):
+        np.testing.assert_allclose(grid_values(SPECTRA[0], GRID), [np.nan, 0.5, 0.75, 1.0])
+        assert np.isnan(grid_values(SPECTRA[1], GRID)).all()
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(b"".join(iter_spectra_csv(SPECTRA, GRID)).decode())))
+        assert rows[0] == ["id", "name", "category", "subtype", "399", "400", "401", "402"]
+        assert rows[1] == ["1", "spectrum 1", "p", "ex", "", "0.5", "0.75", "1.0"]
+        assert rows[2] == ["2", "spectrum 2", "p", "ex", "", "", "", ""]
+        assert rows[3][4:] == ["", "", "0.2", ""]
+
+    def test_npz(self):
+        # spectrum 4 was deleted while streaming
+        npz = np.load(io.BytesIO(b"".join(iter_spectra_npz([1, 2, 3, 4], SPECTRA, GRID))))
+        assert npz["ids"].tolist() == [1, 2, 3, 4]
+        assert npz["wavelengths"].tolist() == GRID.tolist()
+        assert npz["y"].shape == (4, 4)
+        np.testing.assert_allclose(npz["y"][0], [np.nan, 0.5, 0.75, 1.0])
+        assert np.isnan(npz["y"][3]).all()
+        assert npz["names"].tolist() == ["spectrum 1", "spectrum 2", "spectrum 3", ""]
+
+    def test_empty(self):
+        grid = np.arange(0)
+        assert b"".join(iter_spectra_csv([], grid)) == b"id,name,category,subtype\r\n"
+        npz = np.load(io.BytesIO(b"".join(iter_spectra_npz([], [], grid))))
+        assert npz["y"].shape == (0, 0)
+
+    @pytest.mark.skipif(importlib.util.find_spec("pyarrow") is None, reason="pyarrow is not installed")
+    def test_arrow(self):
+        import pyarrow as pa
+
+        table = pa.ipc.open_stream(b"".join(iter_spectra_arrow(SPECTRA, GRID, batch_size=2))).read_all()
+        assert table.column("id").to_pylist() == [1, 2, 3]
+        assert table.schema.metadata[b"wavelengths"] == b"399,400,401,402"
+        assert table.column("y").to_pylist()[0][1:] == [0.5, 0.75, 1.0]
+
+
+class TestOverlapIntegrals:
+    def test_matches_loop(self):
+        donors = [A, B]
+        acceptors = [B, A, [[700.0, 1], [701.0, 1]]]
+        ec = [50000, 80000, 10000]
+        J = overlap_integrals(SpectralMatrix(donors, 400, 702), SpectralMatrix(acceptors, 400, 702), ec)
+        assert J.shape == (2, 3)
+        for i, don in enumerate(donors):
+            for j, acc in enumerate(acceptors):
+                D, Acc = dict(map(tuple, don)), dict(map(tuple, acc))
+                total = sum(y for _, y in don)
+                expected = sum(w**4 * Acc[w] * ec[j] * D[w] / total for w in D if w in Acc)
+                assert J[i, j] == pytest.approx(expected, rel=1e-5)
+
+    def test_forster_radius(self):
+        assert forster_radius(0, 0.8) == 0
+        assert forster_radius(1e15, 1) == pytest.approx(0.2108 * (2 / 3 * 1.329**-4 * 1e15) ** (1 / 6))
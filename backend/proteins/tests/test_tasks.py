@@ -0,0 +1,61 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import tasks
+from ..models import Microscope, OpticalConfig, Protein, Spectrum, State
+
+
+class TestScopeReportJobs(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.scope = Microscope.objects.create(name="Scope")
+        OpticalConfig.objects.create(name="GFP", microscope=cls.scope)
+        protein = Protein.objects.create(name="ProteinA")
+        for i in range(3):
+            state = State.objects.create(name=f"s{i}", ex_max=488, em_max=510, protein=protein)
+            Spectrum.objects.create(
+                category=Spectrum.PROTEIN,
+                subtype=Spectrum.EX,
+                owner_state=state,
+                data=[[480.0, 0.5], [488.0, 1.0], [496.0, 0.5]],
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_start_returns_running_job(self):
+        with mock.patch.object(tasks.calculate_scope_report, "apply_async") as apply_async:
+            job_id = tasks.start_scope_report(self.scope.id)
+            self.assertEqual(tasks.start_scope_report(self.scope.id), job_id)
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args.kwargs["task_id"], job_id)
+        self.assertEqual(tasks.running_scope_report(self.scope.id), job_id)
+
+        tasks.finish_scope_report(self.scope.id, "some-other-job")
+        self.assertEqual(tasks.running_scope_report(self.scope.id), job_id)
+        tasks.finish_scope_report(self.scope.id, job_id)
+        self.assertIsNone(tasks.running_scope_report(self.scope.id))
+
+    def test_sharded_progress(self):
+        with mock.patch.object(tasks, "chord") as chord:
+            job_id = tasks.start_scope_report(self.scope.id, shard_size=1)
+            self.assertEqual(tasks.start_scope_report(self.scope.id, shard_size=1), job_id)
+        chord.assert_called_once()
+        self.assertEqual(len(chord.call_args.args[0]), 3)
+        self.assertEqual(tasks.get_scope_report_progress(job_id), {"current": 0, "total": 3})
+
+        tasks.merge_scope_report([], job_id, self.scope.id)
+        self.assertIsNone(tasks.get_scope_report_progress(job_id))
+        self.assertIsNone(tasks.running_scope_report(self.scope.id))
+
+    def test_update_view_returns_running_job(self):
+        cache.set(f"scope_report_running:{self.scope.id}", "running-job")
+        response = self.client.post(
+            reverse("proteins:microscope-report", args=[self.scope.id]),
+            {"action": "update", "scope_id": self.scope.id},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        self.assertEqual(response.json()["job"], "running-job")
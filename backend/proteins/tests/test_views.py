@@ -1,8 +1,28 @@
+import csv
+import importlib.util
+import io
+from unittest import skipIf
+
+import numpy as np
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 
-from proteins.models import Protein, State
+from proteins.models import (
+    Filter,
+    FilterPlacement,
+    FRETPair,
+    Microscope,
+    OcFluorEff,
+    OpticalConfig,
+    Protein,
+    Spectrum,
+    State,
+)
+from proteins.util.efficiency import bulk_update_oc_effs
+
+from .test_models import ramp
 
 User = get_user_model()
 
@@ -65,3 +85,191 @@ class ProteinViewTests(TestCase):
 
         assert response.status_code == 302
         assert response.url == new_prot.get_absolute_url()
+
+    def test_search_resolves_identifiers(self):
+        protein = Protein.objects.create(name="Test Protein", aliases=["TP-1"], genbank="AB12345")
+        for q in ("test protein", "tp-1", "ab12345"):
+            response = self.client.get(reverse("proteins:search"), {"q": q})
+            self.assertRedirects(response, protein.get_absolute_url(), fetch_redirect_response=False)
+        response = self.client.get(reverse("proteins:search"), {"q": "nothing like it"})
+        self.assertTrue(response["Location"].startswith("/search/?name__iexact="))
+
+
+class SpectraExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        protein = Protein.objects.create(name="ProteinA")
+        state = State.objects.create(name="default", ex_max=488, em_max=510, protein=protein)
+        cls.ex = Spectrum.objects.create(
+            category=Spectrum.PROTEIN, subtype=Spectrum.EX, owner_state=state, data=[[480.0, 0.5], [482.0, 1.0]]
+        )
+        cls.em = Spectrum.objects.create(
+            category=Spectrum.PROTEIN, subtype=Spectrum.EM, owner_state=state, data=[[500.0, 1.0], [501.0, 0.5]]
+        )
+
+    def export(self, **params):
+        response = self.client.get(reverse("proteins:spectra_export"), params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def test_csv(self):
+        rows = list(csv.reader(io.StringIO(self.export().decode())))
+        self.assertEqual(rows[0][4:], [str(w) for w in range(480, 502)])
+        self.assertEqual([r[0] for r in rows[1:]], [str(self.ex.id), str(self.em.id)])
+        self.assertEqual(rows[1][4:7], ["0.5", "0.75", "1.0"])
+        self.assertEqual(rows[2][-2:], ["1.0", "0.5"])
+
+    def test_filter(self):
+        rows = list(csv.reader(io.StringIO(self.export(q=str(self.em.id), min=495).decode())))
+        self.assertEqual(rows[0][4], "495")
+        self.assertEqual([r[0] for r in rows[1:]], [str(self.em.id)])
+
+    def test_npz(self):
+        npz = np.load(io.BytesIO(self.export(format="npz")))
+        self.assertEqual(npz["ids"].tolist(), [self.ex.id, self.em.id])
+        self.assertEqual(npz["y"].shape, (2, 22))
+
+    @skipIf(importlib.util.find_spec("pyarrow") is None, "pyarrow is not installed")
+    def test_arrow(self):
+        import pyarrow as pa
+
+        table = pa.ipc.open_stream(self.export(format="arrow")).read_all()
+        self.assertEqual(table.column("id").to_pylist(), [self.ex.id, self.em.id])
+
+    def test_empty_selection(self):
+        self.assertEqual(self.export(q="0"), b"id,name,category,subtype\r\n")
+        self.assertEqual(np.load(io.BytesIO(self.export(q="0", format="npz")))["y"].shape, (0, 0))
+
+    def test_bad_request(self):
+        for params in ({"format": "xls"}, {"q": "a"}, {"min": 500, "max": 400}):
+            response = self.client.get(reverse("proteins:spectra_export"), params)
+            self.assertEqual(response.status_code, 400)
+
+
+class SimilarSequenceTests(TestCase):
+    def test_length_cap(self):
+        seq = "M" * 5001
+        response = self.client.get(reverse("api:similar-api"), {"seq": seq})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("api:protein-api"), {"seq__similar": seq})
+        self.assertEqual(response.status_code, 400)
+
+
+class FRETPairAPITests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        egfp, mcherry, tagrfp = (Protein.objects.create(name=n) for n in ("EGFP", "mCherry", "TagRFP"))
+        FRETPair.objects.bulk_create(
+            [
+                FRETPair(donor=egfp, acceptor=mcherry, overlap=1.2, forster=5.1, forster_qya=1.1, emdist=103),
+                FRETPair(donor=egfp, acceptor=tagrfp, overlap=2.0, forster=5.8, forster_qya=2.8, emdist=76),
+                FRETPair(donor=tagrfp, acceptor=mcherry, overlap=3.1, forster=6.2, forster_qya=1.4, emdist=26),
+            ]
+        )
+
+    def get(self, **params):
+        response = self.client.get(reverse("api:fret-api"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def pairs(self, **params):
+        return [(p["donor"], p["acceptor"]) for p in self.get(**params)["results"]]
+
+    def test_serializer(self):
+        data = self.get(donor="egfp", acceptor="tagrfp")
+        self.assertEqual(data["count"], 1)
+        self.assertEqual(
+            data["results"][0],
+            {
+                "donor": "egfp",
+                "donor_name": "EGFP",
+                "acceptor": "tagrfp",
+                "acceptor_name": "TagRFP",
+                "overlap": 2.0,
+                "forster": 5.8,
+                "forster_qya": 2.8,
+                "emdist": 76,
+            },
+        )
+
+    def test_filter(self):
+        self.assertEqual(self.pairs(donor="egfp"), [("egfp", "tagrfp"), ("egfp", "mcherry")])
+        self.assertEqual(self.pairs(acceptor="mcherry", emdist__gt=40), [("egfp", "mcherry")])
+        self.assertEqual(self.pairs(forster__gte=5.8, forster_qya__lt=2), [("tagrfp", "mcherry")])
+        self.assertEqual(self.pairs(donor="nothing"), [])
+
+    def test_ordering(self):
+        # by descending Förster radius by default
+        self.assertEqual(self.pairs(), [("tagrfp", "mcherry"), ("egfp", "tagrfp"), ("egfp", "mcherry")])
+        self.assertEqual([p["emdist"] for p in self.get(order_by="emdist")["results"]], [26, 76, 103])
+        self.assertEqual([p["overlap"] for p in self.get(order_by="-overlap", limit=2)["results"]], [3.1, 2.0])
+
+
+class ScopeReportJsonTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.scope = Microscope.objects.create(name="Scope")
+        emitter = Filter.objects.create(name="Emitter")
+        Spectrum.objects.create(
+            category=Spectrum.FILTER, subtype=Spectrum.BP, owner_filter=emitter, data=ramp(500, 560)
+        )
+        exciter = Filter.objects.create(name="Exciter")
+        Spectrum.objects.create(
+            category=Spectrum.FILTER, subtype=Spectrum.BP, owner_filter=exciter, data=ramp(460, 500)
+        )
+        cls.oc = OpticalConfig.objects.create(name="GFP", microscope=cls.scope)
+        cls.oc.add_filter(exciter, FilterPlacement.EX)
+        cls.oc.add_filter(emitter, FilterPlacement.EM)
+        protein = Protein.objects.create(name="ProteinA")
+        cls.states = []
+        for i in range(2):
+            state = State.objects.create(
+                name=f"s{i}", ex_max=488, em_max=510, qy=0.5, ext_coeff=50000, protein=protein
+            )
+            Spectrum.objects.create(
+                category=Spectrum.PROTEIN, subtype=Spectrum.EX, owner_state=state, data=ramp(450 + 10 * i, 500)
+            )
+            Spectrum.objects.create(
+                category=Spectrum.PROTEIN, subtype=Spectrum.EM, owner_state=state, data=ramp(490 + 10 * i, 580)
+            )
+            cls.states.append(state)
+        bulk_update_oc_effs([cls.oc], cls.states)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self):
+        response = self.client.get(reverse("proteins:scope_report_json", args=[self.scope.id]))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_columnar_payload(self):
+        payload = self.get()
+        self.assertEqual(payload["microscope"], self.scope.id)
+        fluors, (config,) = payload["fluors"], payload["configs"]
+        self.assertEqual(sorted(fluors["slug"]), sorted(s.slug for s in self.states))
+        self.assertEqual(fluors["type"], ["p", "p"])
+        self.assertEqual(fluors["qy"], [0.5, 0.5])
+        self.assertEqual(config["name"], "GFP")
+        self.assertEqual(sorted(config["fluor"]), [0, 1])
+        for field in ("ex_eff", "ex_eff_broad", "em_eff", "brightness"):
+            self.assertEqual(len(config[field]), 2)
+        for j, i in enumerate(config["fluor"]):
+            state = State.objects.get(slug=fluors["slug"][i])
+            eff = OcFluorEff.objects.get(oc=self.oc, object_id=state.id)
+            self.assertAlmostEqual(config["em_eff"][j], eff.em_eff)
+
+    def test_cached_until_version_changes(self):
+        payload = self.get()
+        with self.assertNumQueries(2):  # the microscope & the version
+            self.assertEqual(self.get(), payload)
+
+        OcFluorEff.objects.mark_dirty()
+        dirty = self.get()
+        self.assertNotEqual(dirty["version"], payload["version"])
+
+        State.objects.filter(id__in=[s.id for s in self.states]).update(qy=0.25)
+        bulk_update_oc_effs([self.oc], list(State.objects.filter(id__in=[s.id for s in self.states])))
+        updated = self.get()
+        self.assertNotEqual(updated["version"], dirty["version"])
+        self.assertEqual(updated["fluors"]["qy"], [0.25, 0.25])
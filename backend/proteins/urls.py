@@ -73,6 +73,7 @@ urlpatterns = [
     re_path(r"^spectra/(?P<slug>[-\w]+)", views.protein_spectra, name="spectra"),
     path("spectra/", views.protein_spectra, name="spectra"),
     re_path(r"^spectra_csv/", views.spectra_csv, name="spectra_csv"),
+    path("spectra_export/", views.spectra_export, name="spectra_export"),
     re_path(
         r"^spectra_img/(?P<slug>[-\w]+)(\.(?P<extension>(png)|(svg)|(tif?f)|(pdf)|(jpe?g))?)?$",
         views.spectra_image,
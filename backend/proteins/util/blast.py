@@ -1,12 +1,31 @@
+"""BLAST searches against a versioned, local copy of the FPbase sequence database.
+
+Each database build is written to a fresh directory under blastdb/versions and
+then published by atomically replacing the blastdb/current symlink, so a search
+never reads a half-built database.  Searches are funneled through a BlastWorker
+thread that combines queries queued while a search is running into a single
+multi-query invocation.
+"""
+
 import contextlib
+import fcntl
 import json
 import os
+import queue
+import shutil
 import sys
 import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
 from pathlib import Path
 from shutil import copyfileobj
 from subprocess import run
 
+from django.core.cache import cache
+from django.db import connection
+
 from ..models import Protein
 
 ROOT = Path(__file__).parent.parent.parent
@@ -14,6 +33,10 @@ BIN_DIR = ROOT / "bin"
 BLAST_DB = "blastdb/FPbase_blastdb.fsa"
 BIN_SUFFIX = "osx" if sys.platform == "darwin" else "nix"
 MAKEBLASTDB = str(BIN_DIR / f"makeblastdb_{BIN_SUFFIX}")
+# set when a protein sequence changes, cleared by whoever starts the rebuild
+BLASTDB_STALE_KEY = "blastdb_stale"
+# number of database versions kept on disk (searches may still be reading the previous one)
+KEEP_VERSIONS = 2
 
 
 def serialize_alignment(alignment):
@@ -48,7 +71,13 @@ def write_fasta(fpath):
 
 
 def make_blastdb(fpath: str | None = None):
-    fasta_name = write_fasta(fpath or BLAST_DB)
+    """build a BLAST database of all FPbase sequences at fpath
+
+    without fpath, a new version of the site database is built and published.
+    """
+    if fpath is None:
+        return rebuild_blastdb()
+    fasta_name = write_fasta(fpath)
     cmd = [
         MAKEBLASTDB,
         "-in",
@@ -61,24 +90,120 @@ def make_blastdb(fpath: str | None = None):
         "-dbtype",
         "prot",
     ]
-    run(cmd)
+    run(cmd, check=True)
+    return fpath
 
 
-def blast(seq, binary="blastp", db: str | None = None, max_hits=30, fmt=15, **kwargs):
+def _db_paths(db=None):
+    """(root directory, database file name) for the versioned database"""
     db = db or BLAST_DB
+    return os.path.dirname(os.path.abspath(db)), os.path.basename(db)
+
+
+def current_db(db=None):
+    """path of the published database, or None if none has been built yet"""
+    root, name = _db_paths(db)
+    path = os.path.join(root, "current", name)
+    return path if os.path.isfile(path) else None
+
+
+@contextlib.contextmanager
+def _build_lock(root):
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".lock"), "w") as fd:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def rebuild_blastdb(db=None, build=None):
+    """build a new database version and atomically make it the current one
+
+    build(path) writes the database files (default: make_blastdb).
+    returns the path of the new database.
+    """
+    root, _ = _db_paths(db)
+    with _build_lock(root):
+        return _build_version(db, build)
+
+
+def _build_version(db=None, build=None):
+    # rebuild_blastdb without the lock: the caller must hold _build_lock
+    build = build or make_blastdb
+    root, name = _db_paths(db)
+    versions = os.path.join(root, "versions")
+    os.makedirs(versions, exist_ok=True)
+    vdir = tempfile.mkdtemp(prefix=time.strftime("%Y%m%d%H%M%S_"), dir=versions)
+    try:
+        build(os.path.join(vdir, name))
+    except Exception:
+        shutil.rmtree(vdir, ignore_errors=True)
+        raise
+    link = os.path.join(root, f"current.{os.getpid()}")
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(link)
+    os.symlink(os.path.relpath(vdir, root), link)
+    os.replace(link, os.path.join(root, "current"))
+
+    old = sorted((e for e in os.scandir(versions) if e.is_dir()), key=lambda e: e.stat().st_mtime)
+    for entry in old[:-KEEP_VERSIONS]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+    return os.path.join(vdir, name)
+
+
+def ensure_blastdb(db=None, build=None):
+    """path of the current database, building the first version if there is none
+
+    concurrent callers wait for the one building it rather than each building a version.
+    """
+    path = current_db(db)
+    if path is None:
+        root, _ = _db_paths(db)
+        with _build_lock(root):
+            path = current_db(db) or _build_version(db, build)
+    return path
+
+
+def mark_blastdb_stale():
+    """flag the database for a rebuild (called when protein sequences change)"""
+    cache.set(BLASTDB_STALE_KEY, True, None)
+
+
+def refresh_stale_blastdb(db=None, build=None):
+    """rebuild the database in a background thread if it was flagged stale
+
+    searches keep using the current version until the new one is swapped in.
+    returns the rebuild thread, or None if nothing was started.
+    """
+    if current_db(db) is None or not cache.delete(BLASTDB_STALE_KEY):
+        return None
+
+    def _rebuild():
+        try:
+            rebuild_blastdb(db, build)
+        finally:
+            connection.close()
 
-    assert binary in ("blastp", "blastx"), "Unrecognized blast binary"
-    if not os.path.isfile(db) or len(os.listdir(os.path.dirname(db))) <= 5:
-        make_blastdb(db)
+    thread = threading.Thread(target=_rebuild, name="blastdb-rebuild", daemon=True)
+    thread.start()
+    return thread
 
+
+def _normalize_query(seq):
+    seq = seq.strip()
+    if not seq.startswith(">"):
+        seq = ">query\n" + seq
+    return seq + "\n"
+
+
+def _run_blast(query, binary, db, max_hits, fmt, **kwargs):
+    """run a single blast invocation on a (possibly multi-record) fasta query"""
     binary = BIN_DIR / f"{binary}_{BIN_SUFFIX}"
-    max_hits = kwargs.pop("max_target_seqs", max_hits)
-    fmt = kwargs.pop("outfmt", fmt)
     with tempfile.NamedTemporaryFile(suffix=".fsa") as tmp:
-        if not seq.startswith(">"):
-            seq = ">query\n" + seq
-        tmp.write(seq.encode())
-        tmp.seek(0)
+        tmp.write(query.encode())
+        tmp.flush()
         cmd = [
             str(binary),
             "-query",
@@ -111,3 +236,111 @@ def _extracted_from_blast_(cmd, outfile, fmt):
         return outfile.file.read().decode()
     out = outfile.file.read().decode()
     return json.loads(out).get("BlastOutput2")
+
+
+class _Job:
+    __slots__ = ("query", "key", "nrecords", "future")
+
+    def __init__(self, query, key):
+        self.query = query
+        self.key = key
+        self.nrecords = sum(1 for line in query.splitlines() if line.startswith(">"))
+        self.future = Future()
+
+
+class BlastWorker:
+    """A background thread that runs queued blast searches in batches
+
+    Queries that were queued while the previous batch was running (and share
+    the same search parameters) are concatenated into one multi-query fasta
+    and searched with a single blast process.  The per-query reports are then
+    split back out to the callers.  Only the json (15) and xml (5) output
+    formats can be split; other formats are searched one query at a time.
+
+    A lone query is searched immediately.  With `wait` > 0, the worker
+    instead waits up to that many seconds for more queries to batch with it
+    (only worth it when many requests are served concurrently by one process).
+    """
+
+    BATCHABLE_FORMATS = (5, 15)
+
+    def __init__(self, max_batch=32, wait=0):
+        self.max_batch = max_batch
+        self.wait = wait
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # (re)start the thread, e.g. after the process forked
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = None
+            if self._thread is None or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._loop, name="blast-worker", daemon=True)
+                self._thread.start()
+
+    def submit(self, seq, binary="blastp", db=None, max_hits=30, fmt=15, **kwargs):
+        """queue a search, returning a Future with its result"""
+        assert binary in ("blastp", "blastx"), "Unrecognized blast binary"
+        key = (binary, db, max_hits, fmt, tuple(sorted(kwargs.items())))
+        job = _Job(_normalize_query(seq), key)
+        self._ensure_started()
+        self._queue.put(job)
+        return job.future
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            refresh_stale_blastdb()
+            groups = defaultdict(list)
+            for job in batch:
+                groups[job.key].append(job)
+            for key, jobs in groups.items():
+                self._run_jobs(key, jobs)
+
+    def _run_jobs(self, key, jobs):
+        binary, db, max_hits, fmt, kwargs = key
+        kwargs = dict(kwargs)
+        try:
+            db = db or ensure_blastdb()
+            if len(jobs) > 1 and fmt in self.BATCHABLE_FORMATS:
+                reports = _run_blast("".join(j.query for j in jobs), binary, db, max_hits, fmt, **kwargs)
+                if reports is not None and len(reports) == sum(j.nrecords for j in jobs):
+                    i = 0
+                    for job in jobs:
+                        job.future.set_result(reports[i : i + job.nrecords])
+                        i += job.nrecords
+                    return
+        except Exception as e:
+            for job in jobs:
+                job.future.set_exception(e)
+            return
+        # single job, or the batch could not be split: search one query at a time
+        for job in jobs:
+            try:
+                job.future.set_result(_run_blast(job.query, binary, db, max_hits, fmt, **kwargs))
+            except Exception as e:
+                job.future.set_exception(e)
+
+
+blast_worker = BlastWorker()
+
+
+def blast(seq, binary="blastp", db: str | None = None, max_hits=30, fmt=15, timeout=120, **kwargs):
+    max_hits = kwargs.pop("max_target_seqs", max_hits)
+    fmt = kwargs.pop("outfmt", fmt)
+    return blast_worker.submit(seq, binary, db, max_hits, fmt, **kwargs).result(timeout)
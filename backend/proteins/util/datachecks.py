@@ -0,0 +1,192 @@
+"""Data quality checks behind the problems/gaps and problems/inconsistencies pages.
+
+Every check is registered with @datacheck: it finds the problematic
+proteins among a Protein queryset and returns {protein_id: detail}.
+Findings are stored as DataCheckFinding rows, so that the pages only read
+them.  All checks are rerun daily (tasks.run_datachecks).  Checks are also
+rerun for a single protein when a model listed in their `triggers` is saved
+(see proteins.handlers), unless they are `scheduled` only (because they call
+out to GenBank or realign sequences).
+"""
+
+import operator
+from dataclasses import dataclass, field
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .maintain import suggested_switch_type
+
+CHECKS = {}
+
+
+@dataclass(frozen=True)
+class DataCheck:
+    name: str
+    func: callable
+    page: str  # "gaps" or "inconsistencies"
+    triggers: frozenset = field(default_factory=frozenset)
+    scheduled: bool = False
+    sort_key: callable = None
+
+
+def datacheck(page, triggers=(), scheduled=False, sort_key=None):
+    def decorator(func):
+        CHECKS[func.__name__] = DataCheck(func.__name__, func, page, frozenset(triggers), scheduled, sort_key)
+        return func
+
+    return decorator
+
+
+def _ids(qs):
+    return {id: {} for id in qs.values_list("id", flat=True)}
+
+
+# gaps
+
+
+@datacheck("gaps", triggers={"protein"})
+def noseqs(proteins):
+    return _ids(proteins.filter(seq__isnull=True))
+
+
+@datacheck("gaps", triggers={"protein", "state"})
+def nostates(proteins):
+    return _ids(proteins.filter(states=None))
+
+
+@datacheck("gaps", triggers={"state", "spectrum"})
+def only2p(proteins):
+    from ..models import State
+
+    states = State.objects.filter(protein__in=proteins, spectra__subtype="2p").exclude(spectra__subtype="ex")
+    return {id: {} for id in states.values_list("protein_id", flat=True)}
+
+
+@datacheck("gaps", triggers={"protein"})
+def noparent(proteins):
+    return _ids(proteins.filter(parent_organism__isnull=True))
+
+
+@datacheck("gaps", triggers={"protein", "lineage", "spectrum"}, sort_key=lambda f: -f.detail["n_spectra"])
+def nolineage(proteins):
+    qs = proteins.filter(lineage=None).annotate(ns=Count("states__spectra"))
+    return {id: {"n_spectra": ns} for id, ns in qs.values_list("id", "ns")}
+
+
+# inconsistencies
+
+
+@datacheck("inconsistencies", scheduled=True)
+def linprobs(proteins):
+    """lineage nodes with validation errors (also rerun by tasks.refresh_lineages)"""
+    from ..models import Lineage
+    from .maintain import refresh_lineage_annotations
+
+    nodes = Lineage.objects.filter(protein__in=proteins)
+    refresh_lineage_annotations(nodes)
+    nodes = nodes.exclude(validation_errors=[])
+    return {id: {"error": errors[0]} for id, errors in nodes.values_list("protein_id", "validation_errors")}
+
+
+@datacheck("inconsistencies", scheduled=True)
+def mismatch(proteins):
+    """sequences that differ from their genbank record"""
+    from ..extrest.entrez import get_cached_gbseqs
+
+    with_genbank = list(proteins.exclude(genbank=None).exclude(seq=None).values("id", "genbank", "seq"))
+    if not with_genbank:
+        return {}
+    gbseqs = get_cached_gbseqs([g["genbank"] for g in with_genbank])
+    out = {}
+    for item in with_genbank:
+        if item["genbank"] in gbseqs:
+            gbseq = gbseqs[item["genbank"]]
+            if item["seq"] != gbseq:
+                out[item["id"]] = {"genbank": item["genbank"], "mutations": str(item["seq"].mutations_to(gbseq))}
+    return out
+
+
+@datacheck("inconsistencies", triggers={"protein"})
+def nomet(proteins):
+    qs = proteins.exclude(seq__isnull=True).exclude(seq__istartswith="M")
+    return {id: {"seq": str(seq)[:15]} for id, seq in qs.values_list("id", "seq")}
+
+
+@datacheck("inconsistencies", triggers={"protein"})
+def histags(proteins):
+    return _ids(proteins.filter(seq__icontains="HHHHH"))
+
+
+@datacheck("inconsistencies", triggers={"protein", "state", "statetransition"})
+def bad_switch(proteins):
+    from ..models import Protein
+
+    qs = (
+        proteins.annotate(ndark=Count("states", filter=Q(states__is_dark=True)))
+        .annotate(nfrom=Count("transitions__from_state", distinct=True))
+        .prefetch_related("states", "transitions")
+    )
+    out = {}
+    for prot in qs:
+        suggestion = suggested_switch_type(prot)
+        if (prot.switch_type or suggestion) and (prot.switch_type != suggestion):
+            out[prot.id] = {"suggestion": dict(Protein.SWITCHING_CHOICES).get(suggestion)}
+    return out
+
+
+@datacheck("inconsistencies", triggers={"protein", "state"})
+def switchers(proteins):
+    """proteins that look switchable by name or publication title, but have a single state"""
+    titles = reduce(
+        operator.or_,
+        (Q(primary_reference__title__icontains=item) for item in ["activat", "switch", "convert", "dark", "revers"]),
+    )
+    names = reduce(operator.or_, (Q(name__startswith=item) for item in ["PA", "rs", "mPA", "PS", "mPS"]))
+    qs = proteins.filter((titles & ~Q(name__startswith="mCerulean")) | names)
+    return _ids(qs.annotate(ns=Count("states")).filter(ns=1))
+
+
+def triggered_checks(model_name):
+    """names of the checks to rerun when an instance of model_name is saved or deleted"""
+    return [c.name for c in CHECKS.values() if not c.scheduled and model_name in c.triggers]
+
+
+def run_checks(names=None, protein_ids=None):
+    """rerun checks (default: all) for all proteins, or only for protein_ids"""
+    from ..models import DataCheckFinding, DataCheckRun, Protein
+
+    proteins = Protein.objects.all()
+    if protein_ids is not None:
+        proteins = proteins.filter(id__in=protein_ids)
+    for name in names or list(CHECKS):
+        found = CHECKS[name].func(proteins)
+        with transaction.atomic():
+            old = DataCheckFinding.objects.filter(check_name=name)
+            if protein_ids is not None:
+                old = old.filter(protein_id__in=protein_ids)
+            old.delete()
+            DataCheckFinding.objects.bulk_create(
+                [DataCheckFinding(check_name=name, protein_id=id, detail=detail) for id, detail in found.items()]
+            )
+            if protein_ids is None:
+                DataCheckRun.objects.update_or_create(check_name=name, defaults={"computed": timezone.now()})
+
+
+def page_findings(page):
+    """{check name: [DataCheckFinding]} for the checks on a page, plus "computed": the oldest full run"""
+    from ..models import DataCheckFinding, DataCheckRun
+
+    checks = [c for c in CHECKS.values() if c.page == page]
+    out = {c.name: [] for c in checks}
+    findings = DataCheckFinding.objects.filter(check_name__in=out).select_related("protein").order_by("protein__name")
+    for finding in findings:
+        out[finding.check_name].append(finding)
+    for check in checks:
+        if check.sort_key:
+            out[check.name].sort(key=check.sort_key)
+    computed = DataCheckRun.objects.filter(check_name__in=[c.name for c in checks]).aggregate(Min("computed"))
+    out["computed"] = computed["computed__min"]
+    return out
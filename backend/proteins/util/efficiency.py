@@ -1,33 +1,12 @@
 import numpy as np
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.utils import timezone
 
+from ..models.spectrum import FLUOR_MATRIX_CACHE_KEY, Spectrum
 from ..models.state import Dye, State
-
-
-def spectral_product(arrlist):
-    # calculate (overlapping) product of a list of spectra.values
-    # assumes monotonic increase with step = 1
-    if not len(arrlist):
-        return None
-    minwaves = [int(a[0][0]) for a in arrlist]
-    minwave = max(minwaves)
-    offsets = [minwave - i for i in minwaves]
-    waverange = min([int(a[-1][0]) for a in arrlist]) - minwave
-    vals = []
-    for w in range(waverange + 1):
-        vals.append(
-            [
-                w + minwave,
-                np.product([a[w + offsets[i]][1] for i, a in enumerate(arrlist)]),
-            ]
-        )
-    return vals
-
-
-def area(arr):
-    area = 0
-    for i in range(len(arr) - 1):
-        area += (arr[i][1] + arr[i + 1][1]) / 2
-    return area
+from .spectra import unpack_spectrum
+from .spectral import DenseSpectrum, SpectralMatrix
 
 
 def print_scope_report(report, sortby="bright", show=("bright", "ex", "em"), limit=10):
@@ -46,41 +25,218 @@ def microscope_efficiency_report(scope, *args, **kwargs):
     return oclist_efficiency_report(scope.optical_configs.all(), *args, **kwargs)
 
 
+def fluor_key(fluor):
+    return (fluor._meta.model_name, fluor.id)
+
+
+class FluorSpectralMatrix:
+    """excitation and emission spectra for a set of fluorophores, stacked on a common grid
+
+    rows are looked up with self.index[fluor_key(fluor)].  As with
+    Fluorophore.ex_spectrum/em_spectrum, the absorption spectrum is used
+    when there is no ex or em spectrum.
+    """
+
+    def __init__(self, keys, ex_spectra, em_spectra):
+        self.index = {key: i for i, key in enumerate(keys)}
+        self.ex = SpectralMatrix(ex_spectra)
+        self.em = SpectralMatrix(em_spectra)
+
+    def __len__(self):
+        return len(self.index)
+
+    @classmethod
+    def from_fluors(cls, fluor_collection):
+        keys, ex, em = [], [], []
+        for fluor in fluor_collection:
+            keys.append(fluor_key(fluor))
+            ex.append(fluor.ex_spectrum.data if fluor.ex_spectrum else None)
+            em.append(fluor.em_spectrum.data if fluor.em_spectrum else None)
+        return cls(keys, ex, em)
+
+    @classmethod
+    def from_db(cls):
+        """build the matrix for every state and dye with a single query"""
+        spectra = {}
+        unpacked = []
+        qs = (
+            Spectrum.objects.filter(subtype__in=(Spectrum.EX, Spectrum.ABS, Spectrum.EM))
+            .exclude(owner_state=None, owner_dye=None)
+            .values_list("id", "owner_state_id", "owner_dye_id", "subtype", "wave_start", "wave_step", "y_packed")
+        )
+        for spectrum_id, state_id, dye_id, subtype, start, step, packed in qs:
+            key = ("state", state_id) if state_id else ("dye", dye_id)
+            if packed is not None and step == 1 and start == int(start):
+                spectrum = DenseSpectrum(start, unpack_spectrum(start, step, packed)[1])
+            else:
+                # not (yet) packed on the 1 nm grid: filled in from data below
+                spectrum = spectrum_id
+                unpacked.append(spectrum_id)
+            spectra.setdefault(key, {}).setdefault(subtype, spectrum)
+        if unpacked:
+            data = dict(Spectrum.objects.filter(id__in=unpacked).values_list("id", "data"))
+            for subtypes in spectra.values():
+                for subtype, spectrum in subtypes.items():
+                    if not isinstance(spectrum, DenseSpectrum):
+                        subtypes[subtype] = DenseSpectrum.from_data(data[spectrum])
+        keys = list(spectra)
+        ex = [spectra[k].get(Spectrum.EX) or spectra[k].get(Spectrum.ABS) for k in keys]
+        em = [spectra[k].get(Spectrum.EM) or spectra[k].get(Spectrum.ABS) for k in keys]
+        return cls(keys, ex, em)
+
+    def efficiencies(self, oc):
+        """ex, ex_broad and em efficiency of every row through an optical config
+
+        returns three arrays, with nan where the efficiency is undefined
+        """
+        ex = np.full(len(self), np.nan)
+        ex_broad = np.full(len(self), np.nan)
+        em = np.full(len(self), np.nan)
+        oc_em = oc.combined_em_spectra
+        oc_ex = oc.combined_ex_spectra
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if oc_em:
+                em_areas = self.em.product_areas(oc_em)
+                em = np.where(self.em.present, em_areas / self.em.areas, np.nan)
+            if oc_ex:
+                ex_areas = self.ex.product_areas(oc_ex)
+                ex = np.where(self.ex.present, ex_areas / oc_ex.area(), np.nan)
+                ex_broad = np.where(self.ex.present, ex_areas / self.ex.areas, np.nan)
+        return ex, ex_broad, em
+
+
+def get_fluor_matrix(timeout=60 * 60 * 24):
+    """cached FluorSpectralMatrix for all states and dyes (cleared by Spectrum.save)"""
+    matrix = cache.get(FLUOR_MATRIX_CACHE_KEY)
+    if matrix is None:
+        matrix = FluorSpectralMatrix.from_db()
+        cache.set(FLUOR_MATRIX_CACHE_KEY, matrix, timeout)
+    return matrix
+
+
 def oclist_efficiency_report(oclist, fluor_collection=None, include_dyes=True):
     if fluor_collection is None:
-        fluor_collection = list(State.objects.with_spectra())
+        fluor_collection = list(State.objects.with_spectra().select_related("protein"))
         if include_dyes:
             fluor_collection += list(Dye.objects.with_spectra())
+        matrix = get_fluor_matrix()
+    else:
+        matrix = FluorSpectralMatrix.from_fluors(fluor_collection)
     D = {}
     for oc in oclist:
-        D[oc.name] = oc_efficiency_report(oc, fluor_collection)
+        D[oc.name] = oc_efficiency_report(oc, fluor_collection, matrix)
     return D
 
 
-def oc_efficiency_report(oc, fluor_collection):
+def _eff(values, i):
+    if i is None or not np.isfinite(values[i]):
+        return None
+    return round(float(values[i]), 3)
+
+
+def oc_efficiency_report(oc, fluor_collection, matrix=None):
     # where oc is an optical config and fluor_collection is a list of a SpectrumOwner subclass
+    # matrix is a FluorSpectralMatrix that includes those fluors (built if not provided)
+    if matrix is None:
+        matrix = FluorSpectralMatrix.from_fluors(fluor_collection)
+    ex, ex_broad, em = matrix.efficiencies(oc)
     D = {}
-    oc_em = oc.combined_em_spectra
-    oc_ex = oc.combined_ex_spectra
     for fluor in fluor_collection:
+        i = matrix.index.get(fluor_key(fluor))
         D[fluor.slug] = {
             "fluor": fluor.fluor_name,
-            "ex": None,
-            "ex_broad": None,
-            "em": None,
+            "ex": _eff(ex, i),
+            "ex_broad": _eff(ex_broad, i),
+            "em": _eff(em, i),
             "bright": 0,
             "color": fluor.emhex,
             "ftype": "p" if isinstance(fluor, State) else "d",
             "url": fluor.get_absolute_url() or "",
         }
-        if fluor.em_spectrum and oc_em:
-            combospectrum = spectral_product([oc_em, fluor.em_spectrum.data])
-            D[fluor.slug]["em"] = round(area(combospectrum) / area(fluor.em_spectrum.data), 3)
-        if fluor.ex_spectrum and oc_ex:
-            combospectrum = spectral_product([oc_ex, fluor.ex_spectrum.data])
-            D[fluor.slug]["ex"] = round(area(combospectrum) / area(oc_ex), 3)
-            D[fluor.slug]["ex_broad"] = round(area(combospectrum) / area(fluor.ex_spectrum.data), 3)
-        if D[fluor.slug].get("em") and D[fluor.slug].get("ex") and fluor.ext_coeff and fluor.qy:
-            b = D[fluor.slug]["em"] * D[fluor.slug]["ex"] * fluor.ext_coeff * fluor.qy / 1000
-            D[fluor.slug]["bright"] = round(b, 3)
+        D[fluor.slug]["bright"] = _brightness(D[fluor.slug]["ex"], D[fluor.slug]["em"], fluor)
     return D
+
+
+def _brightness(ex, em, fluor):
+    if ex and em and fluor.ext_coeff and fluor.qy:
+        return round(em * ex * fluor.ext_coeff * fluor.qy / 1000, 3)
+    return 0
+
+
+def compute_oc_effs(oclist, fluor_collection=None, only=None, progress=None, matrix=None):
+    """efficiencies of every optical config x fluorophore, as a list of row tuples
+
+    All efficiencies of an optical config are computed in one vectorized pass
+    over the FluorSpectralMatrix (by default, the cached matrix for all fluors
+    when fluor_collection is None, or one built for fluor_collection).
+    Rows are (oc_id, fluor_model, fluor_id, fluor_name, ex, ex_broad, em, brightness),
+    see write_oc_effs.
+    only: optional set of (oc_id, fluor_key) pairs to restrict the rows to.
+    progress: optional callable(current, total), called after each optical config.
+    """
+    if fluor_collection is None:
+        fluor_collection = list(State.objects.with_spectra().select_related("protein"))
+        fluor_collection += list(Dye.objects.with_spectra())
+        matrix = matrix or get_fluor_matrix()
+    elif matrix is None:
+        matrix = FluorSpectralMatrix.from_fluors(fluor_collection)
+    fluors = [(f, fluor_key(f), str(f)) for f in set(fluor_collection)]
+
+    oclist = list(oclist)
+    oc_ids = None if only is None else {oc_id for oc_id, _ in only}
+    rows = []
+    for n, oc in enumerate(oclist, 1):
+        if oc_ids is None or oc.id in oc_ids:
+            ex, ex_broad, em = matrix.efficiencies(oc)
+            for fluor, key, name in fluors:
+                if only is not None and (oc.id, key) not in only:
+                    continue
+                i = matrix.index.get(key)
+                effs = (_eff(ex, i), _eff(ex_broad, i), _eff(em, i))
+                rows.append((oc.id, *key, name, *effs, _brightness(effs[0], effs[2], fluor)))
+        if progress is not None:
+            progress(n, len(oclist))
+    return rows
+
+
+def write_oc_effs(rows):
+    """upsert OcFluorEff rows from compute_oc_effs with one bulk insert
+
+    (conflicts on the (oc, content_type, object_id) unique key are updated)
+    """
+    from ..models.efficiency import OcFluorEff
+
+    ctypes = {m._meta.model_name: ct for m, ct in ContentType.objects.get_for_models(State, Dye).items()}
+    now = timezone.now()
+    objs = [
+        OcFluorEff(
+            oc_id=oc_id,
+            content_type=ctypes[model],
+            object_id=fluor_id,
+            fluor_name=name,
+            ex_eff=ex,
+            ex_eff_broad=ex_broad,
+            em_eff=em,
+            brightness=bright,
+            dirty=False,
+            created=now,
+            modified=now,
+        )
+        for oc_id, model, fluor_id, name, ex, ex_broad, em, bright in rows
+    ]
+    OcFluorEff.objects.bulk_create(
+        objs,
+        batch_size=2000,
+        update_conflicts=True,
+        unique_fields=["oc", "content_type", "object_id"],
+        update_fields=["fluor_name", "ex_eff", "ex_eff_broad", "em_eff", "brightness", "dirty", "modified"],
+    )
+    return len(objs)
+
+
+def bulk_update_oc_effs(oclist, fluor_collection=None, only=None, progress=None):
+    """compute and upsert the OcFluorEff rows for every optical config x fluorophore
+
+    returns the number of rows written.
+    """
+    return write_oc_effs(compute_oc_effs(oclist, fluor_collection, only=only, progress=progress))
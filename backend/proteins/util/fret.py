@@ -0,0 +1,141 @@
+"""Vectorized Förster radius calculations for all donor/acceptor pairs.
+
+The overlap integral for every pair is a single matrix product of the
+(area-normalized, wavelength^4 weighted) donor emission spectra with the
+(extinction-coefficient scaled) acceptor excitation spectra.  Results are
+persisted in the FRETPair table; update_fret_pairs only recomputes rows and
+columns for proteins whose spectra or default state changed since the last run.
+"""
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch, Q
+
+from .spectral import DenseSpectrum, SpectralMatrix
+
+# {protein_id: fingerprint} of the proteins used in the last update_fret_pairs
+FRET_FINGERPRINT_CACHE_KEY = "fret_fingerprints"
+
+
+def _donor_weights(donor_em):
+    """donor emission normalized to unit sum, times wavelength^4"""
+    w4 = np.arange(donor_em.start, donor_em.stop, dtype=float) ** 4
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.nan_to_num(donor_em.y * (w4 / donor_em.y.sum(axis=1, keepdims=True)))
+
+
+def overlap_integrals(donor_em, acceptor_ex, acceptor_ec):
+    """spectral overlap integral J (M^-1 cm^-1 nm^4) for every donor/acceptor pair
+
+    donor_em and acceptor_ex are SpectralMatrix instances on the same grid.
+    returns an (n_donors, n_acceptors) array.
+    """
+    assert donor_em.start == acceptor_ex.start, "donor and acceptor spectra must share a grid"
+    A = acceptor_ex.y * np.asarray(acceptor_ec, dtype=float)[:, np.newaxis]
+    return _donor_weights(donor_em) @ A.T
+
+
+def forster_radius(overlap, donor_qy, n=1.329, k=2 / 3):
+    """Förster radius (nm) from the overlap integral J (M^-1 cm^-1 nm^4)"""
+    return 0.2108 * np.power(np.asarray(donor_qy) * k * n**-4 * np.clip(overlap, 0, None), 1 / 6)
+
+
+def _fret_candidates():
+    """monomeric, basic proteins whose default state can act as donor or acceptor"""
+    from ..models import Protein, Spectrum
+
+    qs = (
+        Protein.objects.with_spectra()
+        .filter(agg=Protein.MONOMER, switch_type=Protein.BASIC)
+        .select_related("default_state")
+        .prefetch_related(Prefetch("default_state__spectra", queryset=Spectrum.objects.packed()))
+    )
+    for protein in qs:
+        state = protein.default_state
+        if state is None or None in (state.qy, state.ex_max, state.em_max):
+            continue
+        try:
+            ex, em = state.ex_spectrum, state.em_spectrum
+        except AssertionError:
+            continue
+        if em is None:
+            continue
+        fingerprint = (
+            state.id,
+            state.modified,
+            *((ex.id, ex.modified) if ex else ()),
+            em.id,
+            em.modified,
+        )
+        yield protein, state, ex, em, fingerprint
+
+
+def update_fret_pairs(full=False):
+    """recompute FRETPair rows involving proteins that changed since the last run
+
+    with full=True, all pairs are recomputed.  Returns the number of proteins
+    whose rows and columns were recomputed.
+    """
+    from ..models import FRETPair
+
+    candidates = list(_fret_candidates())
+    previous = {} if full else cache.get(FRET_FINGERPRINT_CACHE_KEY) or {}
+    current = {c[0].id: c[4] for c in candidates}
+    if not previous:
+        full = True
+    stale = {pid for pid, fp in current.items() if previous.get(pid) != fp}
+    stale |= previous.keys() - current.keys()
+
+    new_pairs = []
+    if candidates and stale:
+        ids = np.array([c[0].id for c in candidates])
+        dirty = np.isin(ids, list(stale))
+        ex_max = np.array([c[1].ex_max for c in candidates])
+        em_max = np.array([c[1].em_max for c in candidates])
+        qy = np.array([c[1].qy for c in candidates], dtype=float)
+        ec = np.array([c[1].ext_coeff or 0 for c in candidates], dtype=float)
+
+        ex = [DenseSpectrum.from_xy(c[2].x_array, c[2].y_array) if c[2] else None for c in candidates]
+        em = [DenseSpectrum.from_xy(c[3].x_array, c[3].y_array) for c in candidates]
+        start = min(s.start for s in ex + em if s)
+        stop = max(s.stop for s in ex + em if s)
+        em = SpectralMatrix(em, start, stop)
+        ex = SpectralMatrix(ex, start, stop)
+
+        # only rows (donors) and columns (acceptors) of changed proteins are needed
+        D = _donor_weights(em)
+        A = ex.y * ec[:, np.newaxis]
+        rows = np.flatnonzero(dirty)
+        J = np.zeros((len(ids), len(ids)))
+        J[rows] = D[rows] @ A.T
+        J[:, rows] = D @ A[rows].T
+        r0 = forster_radius(J, qy[:, np.newaxis])
+
+        valid = (
+            (dirty[:, np.newaxis] | dirty)
+            & (ex_max > ex_max[:, np.newaxis])
+            & (qy[:, np.newaxis] > 0)
+            & (ec > 0)
+            & ex.present
+        )
+        for i, j in zip(*np.nonzero(valid), strict=True):
+            new_pairs.append(
+                FRETPair(
+                    donor_id=int(ids[i]),
+                    acceptor_id=int(ids[j]),
+                    overlap=float(J[i, j] * 1e-15),
+                    forster=float(r0[i, j]),
+                    forster_qya=float(r0[i, j] * qy[j]),
+                    emdist=int(em_max[j] - em_max[i]),
+                )
+            )
+
+    with transaction.atomic():
+        if full:
+            FRETPair.objects.all().delete()
+        elif stale:
+            FRETPair.objects.filter(Q(donor_id__in=stale) | Q(acceptor_id__in=stale)).delete()
+        FRETPair.objects.bulk_create(new_pairs, batch_size=1000)
+    cache.set(FRET_FINGERPRINT_CACHE_KEY, current, None)
+    return len(stale)
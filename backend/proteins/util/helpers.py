@@ -11,7 +11,6 @@ import matplotlib.ticker as ticker
 from django.core.cache import cache
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from django.utils.text import slugify
 from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
 from matplotlib.figure import Figure
 
@@ -103,15 +102,13 @@ def merge_proteins(merge_prot, into_prot):
 def getprot(protein_name, visible=False):
     from proteins.models import Protein
 
-    # assume that the slug is always the slugified name
-    try:
-        if visible:
-            return Protein.visible.get(slug=slugify(protein_name))
-        else:
-            return Protein.objects.get(slug=slugify(protein_name))
-    except Exception:
-        pass
-    return Protein.objects.get(aliases__contains=[protein_name])
+    qs = Protein.objects.by_alias(protein_name)
+    if visible:
+        qs = qs.exclude(status="hidden")
+    protein = qs.first()
+    if protein is None:
+        raise Protein.DoesNotExist(f"No protein named {protein_name!r}")
+    return protein
 
 
 def getmut(protname2, protname1=None, ref=None):
@@ -330,57 +327,37 @@ def fretEfficiency(distance, forster):
 
 
 def forster_list():
-    from ..models import Protein
+    """all precomputed FRET pairs (see util.fret.update_fret_pairs), formatted for the fret page"""
+    from ..models import FRETPair
 
-    qs = (
-        Protein.objects.with_spectra()
-        .filter(agg=Protein.MONOMER, switch_type=Protein.BASIC)
-        .select_related("default_state")
-        .prefetch_related("default_state__spectra")
-    )
+    qs = FRETPair.objects.select_related("donor__default_state", "acceptor__default_state")
     out = []
-    withSpectra = []
-    for p in qs:
-        try:
-            _ = p.default_state.em_spectrum.data
-        except Exception:
-            continue
-        withSpectra.append(p)
-    for donor in withSpectra:
-        for acceptor in withSpectra:
-            try:
-                if (
-                    (acceptor.default_state.ex_max > donor.default_state.ex_max)
-                    and acceptor.default_state.ext_coeff
-                    and donor.default_state.qy
-                ):
-                    overlap, r0 = forsterDist(donor, acceptor)
-                    out.append(
-                        {
-                            "donor": "<a href='{}'>{}{}</a>".format(
-                                donor.get_absolute_url(),
-                                donor.name,
-                                f"<sub>{donor.cofactor.upper()}</sub>" if donor.cofactor else "",
-                            ),
-                            "acceptor": "<a href='{}'>{}{}</a>".format(
-                                acceptor.get_absolute_url(),
-                                acceptor.name,
-                                f"<sub>{acceptor.cofactor.upper()}</sub>" if acceptor.cofactor else "",
-                            ),
-                            "donorPeak": donor.default_state.ex_max,
-                            "acceptorPeak": acceptor.default_state.ex_max,
-                            "emdist": acceptor.default_state.em_max - donor.default_state.em_max,
-                            "donorQY": donor.default_state.qy,
-                            "acceptorQY": acceptor.default_state.qy,
-                            "acceptorEC": f"{acceptor.default_state.ext_coeff:,}",
-                            "overlap": round(overlap, 2),
-                            "forster": round(r0.real, 2),
-                            "forsterQYA": round(r0.real * acceptor.default_state.qy, 2),
-                        }
-                    )
-            except Exception:
-                continue
-    return sorted(out, key=lambda x: x["forster"], reverse=True)
+    for pair in qs:
+        donor, acceptor = pair.donor, pair.acceptor
+        out.append(
+            {
+                "donor": "<a href='{}'>{}{}</a>".format(
+                    donor.get_absolute_url(),
+                    donor.name,
+                    f"<sub>{donor.cofactor.upper()}</sub>" if donor.cofactor else "",
+                ),
+                "acceptor": "<a href='{}'>{}{}</a>".format(
+                    acceptor.get_absolute_url(),
+                    acceptor.name,
+                    f"<sub>{acceptor.cofactor.upper()}</sub>" if acceptor.cofactor else "",
+                ),
+                "donorPeak": donor.default_state.ex_max,
+                "acceptorPeak": acceptor.default_state.ex_max,
+                "emdist": pair.emdist,
+                "donorQY": donor.default_state.qy,
+                "acceptorQY": acceptor.default_state.qy,
+                "acceptorEC": f"{acceptor.default_state.ext_coeff:,}",
+                "overlap": round(pair.overlap, 2),
+                "forster": round(pair.forster, 2),
+                "forsterQYA": round(pair.forster_qya, 2),
+            }
+        )
+    return out
 
 
 def spectra_fig(
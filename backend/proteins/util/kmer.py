@@ -0,0 +1,207 @@
+"""In-memory k-mer index for protein sequence similarity search.
+
+Every sequence is reduced to its set of (distinct) k-mers, encoded as
+integers.  An inverted index maps each k-mer to the sequences containing it,
+so the sequences sharing the most k-mers with a query are found with one
+bincount.  Those candidates are then rescored by banded global alignment, and
+only the final hits are fully aligned to report their sequence identity.
+"""
+
+import threading
+
+import numpy as np
+from django.core.cache import cache
+
+from fpseq.align import align_seqs, alignment_score
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+_CODE = np.full(256, len(AMINO_ACIDS), dtype=np.int64)
+_CODE[np.frombuffer(AMINO_ACIDS.encode(), dtype=np.uint8)] = np.arange(len(AMINO_ACIDS))
+_CODE[np.frombuffer(AMINO_ACIDS.lower().encode(), dtype=np.uint8)] = np.arange(len(AMINO_ACIDS))
+ALPHABET_SIZE = len(AMINO_ACIDS) + 1  # anything else (X, B, Z, ...) shares one code
+
+# bumped whenever a protein sequence changes, so that other processes rebuild their index
+SEQ_INDEX_VERSION_KEY = "seq_index_version"
+# longest query sequence accepted from the api (alignment time grows with its length)
+MAX_QUERY_LENGTH = 5000
+
+
+def kmers(seq, k=3):
+    """sorted array of the distinct k-mers in seq, encoded as integers"""
+    codes = _CODE[np.frombuffer(str(seq).encode("ascii", "replace"), dtype=np.uint8)]
+    if len(codes) < k:
+        return np.empty(0, dtype=np.int64)
+    windows = np.lib.stride_tricks.sliding_window_view(codes, k)
+    return np.unique(windows @ (ALPHABET_SIZE ** np.arange(k - 1, -1, -1)))
+
+
+def identity(alignment):
+    """fraction of identical positions in an alignment, relative to the longer sequence"""
+    a, b = alignment
+    same = sum(x == y != "-" for x, y in zip(a, b))
+    return same / max(len(a.replace("-", "")), len(b.replace("-", "")), 1)
+
+
+class KmerIndex:
+    """An inverted k-mer index of sequences, keyed by an arbitrary hashable key"""
+
+    def __init__(self, k=3):
+        self.k = k
+        self._seqs = {}  # key -> sequence
+        self._kmers = {}  # key -> array of k-mers
+        self._postings = {}  # k-mer -> set of keys
+        self._arrays = None  # (keys, {k-mer: array of row numbers}), built lazily
+        self._self_scores = {}  # key -> score of the sequence aligned to itself
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_fasta(cls, fasta, k=3):
+        """build from a fasta file object, using the first word of each header as key
+
+        (as written by ProteinQuerySet.fasta, where that is the protein uuid)
+        """
+        index = cls(k)
+        key, seq = None, []
+        for line in fasta:
+            line = line.strip()
+            if line.startswith(">"):
+                if key is not None:
+                    index.add(key, "".join(seq))
+                key, seq = line[1:].split(" ", 1)[0], []
+            elif line:
+                seq.append(line)
+        if key is not None:
+            index.add(key, "".join(seq))
+        return index
+
+    def __len__(self):
+        return len(self._seqs)
+
+    def __contains__(self, key):
+        return key in self._seqs
+
+    def add(self, key, seq):
+        """add (or replace) the sequence for key"""
+        with self._lock:
+            self.remove(key)
+            if not seq:
+                return
+            self._seqs[key] = str(seq).upper()
+            self._kmers[key] = kmers(seq, self.k)
+            for km in self._kmers[key].tolist():
+                self._postings.setdefault(km, set()).add(key)
+            self._arrays = None
+
+    def remove(self, key):
+        with self._lock:
+            if key not in self._seqs:
+                return
+            del self._seqs[key]
+            self._self_scores.pop(key, None)
+            for km in self._kmers.pop(key).tolist():
+                self._postings[km].discard(key)
+                if not self._postings[km]:
+                    del self._postings[km]
+            self._arrays = None
+
+    def _get_arrays(self):
+        with self._lock:
+            if self._arrays is None:
+                keys = list(self._seqs)
+                row = {key: i for i, key in enumerate(keys)}
+                postings = {
+                    km: np.fromiter((row[key] for key in ks), dtype=np.int64, count=len(ks))
+                    for km, ks in self._postings.items()
+                }
+                self._arrays = (keys, postings)
+            return self._arrays
+
+    def candidates(self, seq, n=50):
+        """up to n (key, shared k-mer fraction) tuples, most shared k-mers first"""
+        keys, postings = self._get_arrays()
+        query = kmers(seq, self.k)
+        hits = [postings[km] for km in query.tolist() if km in postings]
+        if not hits or not len(query):
+            return []
+        counts = np.bincount(np.concatenate(hits), minlength=len(keys))
+        top = np.flatnonzero(counts)
+        if len(top) > n:
+            top = top[np.argpartition(-counts[top], n - 1)[:n]]
+        top = top[np.argsort(-counts[top], kind="stable")]
+        return [(keys[i], counts[i] / len(query)) for i in top]
+
+    def _self_score(self, key):
+        if key not in self._self_scores:
+            self._self_scores[key] = alignment_score(self._seqs[key], self._seqs[key], band_size=1)
+        return self._self_scores[key]
+
+    def search(self, seq, n=10, candidates=50, band_size=20):
+        """top n (key, identity, alignment score) tuples for seq, best first
+
+        the candidates with most shared k-mers are ranked by their banded global
+        alignment score to seq (relative to the larger self-alignment score, and
+        with the band widened to cover any length difference).
+        """
+        seq = str(seq).upper()
+        query_self = alignment_score(seq, seq, band_size=1)
+        scored = []
+        for key, _ in self.candidates(seq, candidates):
+            target = self._seqs[key]
+            band = max(band_size, abs(len(target) - len(seq)) + 1)
+            score = alignment_score(seq, target, band_size=band)
+            scored.append((score / max(query_self, self._self_score(key), 1), score, key))
+        scored.sort(reverse=True)
+        results = [(key, identity(align_seqs(seq, self._seqs[key])), score) for _, score, key in scored[:n]]
+        results.sort(key=lambda r: (r[1], r[2]), reverse=True)
+        return results
+
+
+_index = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_seq_index():
+    """the KmerIndex of all Protein sequences (keyed by uuid) for this process
+
+    built from ProteinQuerySet.fasta on first use, and rebuilt when another
+    process has changed a sequence since (see SEQ_INDEX_VERSION_KEY)
+    """
+    from ..models import Protein
+
+    global _index, _index_version
+    version = cache.get_or_set(SEQ_INDEX_VERSION_KEY, 0, None)
+    with _index_lock:
+        if _index is None or version != _index_version:
+            _index = KmerIndex.from_fasta(Protein.objects.all().fasta())
+            _index_version = version
+        return _index
+
+
+def update_seq_index(protein, deleted=False):
+    """update this process's index for a saved (or deleted) protein, and invalidate others"""
+    global _index_version
+    cache.add(SEQ_INDEX_VERSION_KEY, 0, None)
+    try:
+        version = cache.incr(SEQ_INDEX_VERSION_KEY)
+    except ValueError:  # evicted in the meantime
+        version = None
+    with _index_lock:
+        if _index is None:
+            return
+        if deleted or not protein.seq:
+            _index.remove(protein.uuid)
+        else:
+            _index.add(protein.uuid, protein.seq)
+        # unless another process changed a sequence in the meantime, this index is still current
+        if version is not None and _index_version == version - 1:
+            _index_version = version
+
+
+def similar_proteins(seq, n=10, band_size=20):
+    """top n (Protein, identity, score) tuples most similar to seq"""
+    from ..models import Protein
+
+    hits = get_seq_index().search(seq, n=n, band_size=band_size)
+    proteins = Protein.objects.in_bulk([key for key, *_ in hits], field_name="uuid")
+    return [(proteins[key], ident, score) for key, ident, score in hits if key in proteins]
@@ -1,6 +1,15 @@
+import hashlib
+import logging
+
+import numpy as np
+from django.db import transaction
+
+from fpbase.cache import bump_version
 from fpseq.mutations import Mutation, MutationSet
 from proteins.util.helpers import getprot
 
+logger = logging.getLogger(__name__)
+
 
 def check_offset(protname):
     prot = getprot(protname)
@@ -97,6 +106,48 @@ def validate_node(node):
     return errors
 
 
+def lineage_fingerprint(node):
+    """hash of everything the stored annotations of a Lineage node depend on"""
+    root = node.root_node or node
+    parent_seq = node.parent.protein.seq if node.parent else None
+    parts = (root.protein.seq, node.parent_id, parent_seq, node.protein.seq, node.mutation)
+    return hashlib.md5("|".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def annotate_lineage_node(node):
+    """compute the root-relative mutations and validation errors stored on a Lineage node"""
+    root = node.root_node or node
+    node.aligned_rootmut = str(root.protein.mutations_to(node.protein.seq))
+    node.validation_errors = validate_node(node)
+    node.annotation_key = lineage_fingerprint(node)
+
+
+def refresh_lineage_annotations(qs=None, force=False):
+    """update stored annotations for nodes whose sequence, parent or root changed
+
+    a node that can't be annotated stores the error in validation_errors (and
+    is retried on the next refresh).  returns the number of nodes that were recomputed
+    """
+    from ..models import Lineage
+
+    if qs is None:
+        qs = Lineage.objects.all()
+    stale = []
+    for node in qs.select_related("protein", "parent__protein", "root_node__protein"):
+        try:
+            if not force and node.annotation_key == lineage_fingerprint(node):
+                continue
+            annotate_lineage_node(node)
+        except Exception as e:
+            logger.exception(f"could not annotate lineage node {node.id}")
+            node.aligned_rootmut = ""
+            node.validation_errors = [f"could not check {node.protein}: {e}"]
+            node.annotation_key = ""
+        stale.append(node)
+    Lineage.objects.bulk_update(stale, ["aligned_rootmut", "validation_errors", "annotation_key"], batch_size=200)
+    return len(stale)
+
+
 def check_lineages(qs=None, correct_offset=False):
     errors = {}
     good = set()
@@ -114,3 +165,43 @@ def check_lineages(qs=None, correct_offset=False):
             good.add(node)
 
     return errors, good
+
+
+def local_brightness_map(states, window=20):
+    """{id: local brightness} for (id, em_max, brightness) tuples
+
+    local brightness is the brightness relative to the average brightness of
+    all other states with em_max within `window` nm (1 if unknown), read from
+    prefix sums over the states sorted by em_max.
+    """
+    pool = sorted((em, b) for _, em, b in states if em is not None and b is not None)
+    em = np.array([p[0] for p in pool], dtype=float)
+    sums = np.concatenate(([0], np.cumsum([p[1] for p in pool])))
+    out = {}
+    for id, em_max, brightness in states:
+        out[id] = 1
+        if not (em_max and brightness):
+            continue
+        lo = np.searchsorted(em, em_max - window, "left")
+        hi = np.searchsorted(em, em_max + window, "right")
+        # the state itself is always in its own window
+        n = hi - lo - 1
+        total = sums[hi] - sums[lo] - brightness
+        if n and total:
+            out[id] = round(float(brightness / (total / n)), 4)
+    return out
+
+
+def update_local_brightness(model=None):
+    """recompute State.local_brightness for all states, returns the number of states that changed"""
+    if model is None:
+        from ..models import State as model
+
+    rows = list(model.objects.values_list("id", "em_max", "brightness", "local_brightness"))
+    values = local_brightness_map([r[:3] for r in rows])
+    changed = [model(id=r[0], local_brightness=values[r[0]]) for r in rows if values[r[0]] != r[3]]
+    model.objects.bulk_update(changed, ["local_brightness"], batch_size=500)
+    if changed:
+        # bulk_update sends no post_save, so cached GraphQL responses aren't invalidated by the handlers
+        transaction.on_commit(lambda: bump_version("proteins"))
+    return len(changed)
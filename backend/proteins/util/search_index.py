@@ -0,0 +1,123 @@
+"""Batch building of the Algolia protein search records.
+
+Several of the indexed fields (rank, n_faves, ga_views, n_cols,
+first_author) are Protein methods that each run one or more queries per
+protein.  Here they are computed for all proteins at once, with a
+handful of aggregate queries, and then merged into the records.
+"""
+
+import datetime
+from collections import Counter
+
+from django.db.models import Count, Prefetch
+
+PROTEIN_INDEX_FIELDS = (
+    "name",
+    "uuid",
+    "aliases",
+    "pdb",
+    "genbank",
+    "uniprot",
+    "ipg_id",
+    "_agg",
+    "img_url",
+    "switchType",
+    "url",
+    "date_published",
+    "created",
+    "rank",
+    "ga_views",
+    "n_faves",
+    "n_cols",
+    "ex",
+    "em",
+    "pka",
+    "ec",
+    "qy",
+    "em_css",
+    "local_brightness",
+    "seq",
+    "first_author",
+    "cofactor",
+    "color",
+)
+
+
+def _ga_ratings(period="month"):
+    from ..extrest.ga import cached_ga_popular
+
+    try:
+        hits = cached_ga_popular()[period]
+    except Exception:
+        return {}
+    return {slug: rating for slug, _name, rating in hits}
+
+
+def protein_signals(proteins):
+    """{protein_id: {field: value}} of the ranking fields for an iterable of proteins"""
+    from favit.models import Favorite
+    from references.models import ReferenceAuthor
+
+    from ..models import Protein, ProteinCollection
+
+    faves = Counter(
+        dict(
+            Favorite.objects.for_model(Protein)
+            .values("target_object_id")
+            .annotate(n=Count("id"))
+            .values_list("target_object_id", "n")
+        )
+    )
+    max_faves = max(faves.values(), default=1)
+    n_cols = dict(
+        ProteinCollection.proteins.through.objects.values("protein_id")
+        .annotate(n=Count("id"))
+        .values_list("protein_id", "n")
+    )
+    ga = _ga_ratings()
+    max_ga = max(ga.values(), default=0) or 1
+    first_authors = dict(ReferenceAuthor.objects.filter(author_idx=0).values_list("reference_id", "author__family"))
+    this_year = datetime.date.today().year
+
+    out = {}
+    for protein in proteins:
+        ref = protein.primary_reference
+        published = (ref.date.year - 1992) / (this_year - 1992) if ref and ref.date else 0
+        out[protein.id] = {
+            "n_faves": faves[protein.id],
+            "n_cols": n_cols.get(protein.id, 0),
+            "ga_views": ga.get(protein.slug, 0),
+            "rank": (0.5 * published + 0.6 * ga.get(protein.slug, 0) / max_ga + faves[protein.id] / max_faves) / 2.5,
+            "first_author": first_authors.get(ref.id) if ref else None,
+        }
+    return out
+
+
+def _record(protein, signals):
+    record = {"objectID": protein.pk}
+    for field in PROTEIN_INDEX_FIELDS:
+        if field in signals:
+            record[field] = signals[field]
+        else:
+            value = getattr(protein, field)
+            record[field] = value() if callable(value) else value
+    record["_tags"] = protein.tags()
+    return record
+
+
+def protein_index_batches(queryset=None, batch_size=500):
+    """yield (records, hidden ids) for all proteins, batch_size proteins at a time"""
+    from ..models import Protein, Spectrum
+
+    if queryset is None:
+        queryset = Protein.objects.all()
+    queryset = queryset.select_related("default_state", "primary_reference").prefetch_related(
+        Prefetch("states__spectra", queryset=Spectrum.objects.only("id", "subtype", "owner_state_id"))
+    )
+    proteins = list(queryset.order_by("id"))
+    signals = protein_signals(proteins)
+    for i in range(0, len(proteins), batch_size):
+        batch = proteins[i : i + batch_size]
+        records = [_record(p, signals[p.id]) for p in batch if p.is_visible()]
+        hidden = [p.pk for p in batch if not p.is_visible()]
+        yield records, hidden
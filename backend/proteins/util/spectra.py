@@ -1,4 +1,5 @@
 import csv
+import zipfile
 
 import numpy as np
 from django.http import HttpResponse
@@ -49,6 +50,30 @@ def norm2one(y):
     return [round(max(yy / max(y), 0), 4) for yy in y]
 
 
+# byte layout of Spectrum.y_packed
+PACKED_DTYPE = "<f4"
+
+
+def pack_spectrum(data):
+    """pack [[x, y], ...] data into (start, step, y values as float32 bytes)
+
+    returns (None, None, None) if data is empty or the x step is not uniform
+    """
+    if not data:
+        return None, None, None
+    arr = np.asarray(data, dtype=float)
+    step = arr[1, 0] - arr[0, 0] if len(arr) > 1 else 1.0
+    if step <= 0 or not np.allclose(np.diff(arr[:, 0]), step):
+        return None, None, None
+    return float(arr[0, 0]), float(step), arr[:, 1].astype(PACKED_DTYPE).tobytes()
+
+
+def unpack_spectrum(start, step, packed):
+    """inverse of pack_spectrum: returns x and y numpy arrays (y is a read-only view on packed)"""
+    y = np.frombuffer(packed, dtype=PACKED_DTYPE)
+    return start + step * np.arange(len(y)), y
+
+
 def step_size(lol):
     x, y = zip(*lol)
     s = set(np.subtract(x[1:], x[:-1]))
@@ -87,6 +112,139 @@ def spectra2csv(spectralist, filename="fpbase_spectra.csv"):
     return response
 
 
+class _StreamBuffer:
+    """write-only file object whose contents are drained by the streaming generators below"""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(data.encode() if isinstance(data, str) else bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def grid_values(spectrum, grid):
+    """y values of spectrum resampled onto grid (nan outside of the spectrum, or if it has no data)"""
+    x = spectrum.x_array
+    if not len(x):
+        return np.full(len(grid), np.nan)
+    return np.interp(grid, x, spectrum.y_array, left=np.nan, right=np.nan)
+
+
+def iter_spectra_csv(spectra, grid):
+    """stream spectra as csv, one row per spectrum, with the grid wavelengths as columns"""
+    buf = _StreamBuffer()
+    writer = csv.writer(buf)
+    writer.writerow(["id", "name", "category", "subtype", *grid.tolist()])
+    yield buf.drain()
+    for sp in spectra:
+        y = grid_values(sp, grid).round(6).tolist()
+        writer.writerow([sp.id, str(sp), sp.category, sp.subtype, *("" if np.isnan(v) else v for v in y)])
+        yield buf.drain()
+
+
+def _write_npy(zf, name, arr):
+    with zf.open(name + ".npy", "w") as f:
+        np.lib.format.write_array(f, np.asanyarray(arr), allow_pickle=False)
+
+
+def iter_spectra_npz(ids, spectra, grid):
+    """stream spectra as a compressed numpy .npz archive
+
+    ids is the list of spectrum ids that will be written (in order), and
+    spectra an iterable over those spectra, ordered by id.  The archive holds
+    ``wavelengths``, ``ids``, ``y`` (float32, one row per id, nan where
+    undefined) and ``names``, ``category`` & ``subtype``.
+    """
+    buf = _StreamBuffer()
+    names, categories, subtypes = [], [], []
+    spectra = iter(spectra)
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        _write_npy(zf, "wavelengths", grid)
+        _write_npy(zf, "ids", np.asarray(ids, dtype=int))
+        yield buf.drain()
+        with zf.open("y.npy", "w", force_zip64=True) as f:
+            header = {"descr": PACKED_DTYPE, "fortran_order": False, "shape": (len(ids), len(grid))}
+            np.lib.format.write_array_header_1_0(f, header)
+            sp = next(spectra, None)
+            for id_ in ids:
+                # skip anything that was deleted after the ids were collected
+                while sp is not None and sp.id < id_:
+                    sp = next(spectra, None)
+                if sp is not None and sp.id == id_:
+                    y = grid_values(sp, grid)
+                    names.append(str(sp))
+                    categories.append(sp.category)
+                    subtypes.append(sp.subtype)
+                else:
+                    y = np.full(len(grid), np.nan)
+                    names.append("")
+                    categories.append("")
+                    subtypes.append("")
+                f.write(y.astype(PACKED_DTYPE).tobytes())
+                yield buf.drain()
+        _write_npy(zf, "names", np.array(names, dtype=str))
+        _write_npy(zf, "category", np.array(categories, dtype=str))
+        _write_npy(zf, "subtype", np.array(subtypes, dtype=str))
+    yield buf.drain()
+
+
+def iter_spectra_arrow(spectra, grid, batch_size=500):
+    """stream spectra as an Arrow IPC stream (requires pyarrow)
+
+    one record per spectrum, with the y values as a fixed size float32 list;
+    the wavelengths are stored in the schema metadata.
+    """
+    import pyarrow as pa
+
+    schema = pa.schema(
+        [
+            ("id", pa.int32()),
+            ("name", pa.string()),
+            ("category", pa.string()),
+            ("subtype", pa.string()),
+            ("y", pa.list_(pa.float32(), len(grid))),
+        ],
+        metadata={"wavelengths": ",".join(str(w) for w in grid.tolist())},
+    )
+
+    def _batch(chunk):
+        y = np.stack([grid_values(sp, grid) for sp in chunk]).astype(PACKED_DTYPE)
+        return pa.record_batch(
+            [
+                pa.array([sp.id for sp in chunk], pa.int32()),
+                pa.array([str(sp) for sp in chunk]),
+                pa.array([sp.category for sp in chunk]),
+                pa.array([sp.subtype for sp in chunk]),
+                pa.FixedSizeListArray.from_arrays(pa.array(y.ravel()), len(grid)),
+            ],
+            schema=schema,
+        )
+
+    buf = _StreamBuffer()
+    with pa.ipc.new_stream(pa.PythonFile(buf, mode="w"), schema) as writer:
+        yield buf.drain()
+        chunk = []
+        for sp in spectra:
+            chunk.append(sp)
+            if len(chunk) >= batch_size:
+                writer.write_batch(_batch(chunk))
+                chunk = []
+                yield buf.drain()
+        if chunk:
+            writer.write_batch(_batch(chunk))
+    yield buf.drain()
+
+
 def interp2int(x, y, s=1):
     """Interpolate pair of vectors at integer increments between min(x) and max(x)"""
     xnew = range(int(min(x)), int(max(x)))
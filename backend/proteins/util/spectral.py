@@ -0,0 +1,168 @@
+"""Array-backed spectral algebra.
+
+Spectra are held as dense float arrays on the integer wavelength grid
+(step = 1 nm) that SpectrumData.clean interpolates all spectra onto.  Each
+DenseSpectrum only stores its first wavelength and its y values, so products,
+integrals and inversions are single vectorized numpy operations.
+"""
+
+import numpy as np
+
+
+class DenseSpectrum:
+    """A spectrum with y values on the integer wavelengths [start, start + len(y))"""
+
+    __slots__ = ("start", "y")
+
+    def __init__(self, start, y):
+        self.start = int(start)
+        self.y = np.asarray(y, dtype=float)
+
+    @classmethod
+    def from_data(cls, data):
+        """create from a Spectrum.data style list of [wavelength, value] pairs
+
+        (assumes monotonic increase with step = 1)
+        """
+        if data is None or not len(data):
+            return cls(0, ())
+        arr = np.asarray(data, dtype=float)
+        return cls(arr[0, 0], arr[:, 1])
+
+    @classmethod
+    def from_xy(cls, x, y):
+        """create from wavelength & value arrays, resampled onto the 1 nm grid if needed"""
+        x = np.asarray(x, dtype=float)
+        if len(x) and x[0] == int(x[0]) and np.all(np.diff(x) == 1):
+            return cls(x[0], y)
+        grid = np.arange(np.ceil(x[0]), np.floor(x[-1]) + 1) if len(x) else ()
+        if not len(grid):
+            return cls(0, ())
+        return cls(grid[0], np.interp(grid, x, y))
+
+    @property
+    def stop(self):
+        """one past the last wavelength"""
+        return self.start + len(self.y)
+
+    @property
+    def x(self):
+        return np.arange(self.start, self.stop)
+
+    def __len__(self):
+        return len(self.y)
+
+    def __bool__(self):
+        return bool(len(self.y))
+
+    def __repr__(self):
+        return f"<DenseSpectrum: {self.start}-{self.stop - 1}>"
+
+    def __mul__(self, other):
+        return product([self, other])
+
+    def to_data(self):
+        """return as a Spectrum.data style list of [wavelength, value] pairs"""
+        return np.column_stack((self.x, self.y)).tolist()
+
+    def invert(self):
+        return DenseSpectrum(self.start, 1 - self.y)
+
+    def area(self):
+        """trapezoidal integral over the spectrum"""
+        if len(self.y) < 2:
+            return 0.0
+        return float(self.y.sum() - (self.y[0] + self.y[-1]) / 2)
+
+    def window(self, start, stop):
+        """y values on [start, stop), zero-padded where the spectrum is undefined"""
+        out = np.zeros(stop - start)
+        lo, hi = max(start, self.start), min(stop, self.stop)
+        if lo < hi:
+            out[lo - start : hi - start] = self.y[lo - self.start : hi - self.start]
+        return out
+
+
+def as_dense(spectrum):
+    if isinstance(spectrum, DenseSpectrum):
+        return spectrum
+    return DenseSpectrum.from_data(spectrum)
+
+
+def product(spectra):
+    """(overlapping) product of a list of spectra
+
+    accepts DenseSpectrum instances or Spectrum.data style lists.
+    returns None for an empty list, and an empty spectrum if they don't overlap.
+    """
+    if not len(spectra):
+        return None
+    spectra = [as_dense(s) for s in spectra]
+    start = max(s.start for s in spectra)
+    stop = min(s.stop for s in spectra)
+    if stop <= start:
+        return DenseSpectrum(start, ())
+    y = np.ones(stop - start)
+    for s in spectra:
+        y *= s.y[start - s.start : stop - s.start]
+    return DenseSpectrum(start, y)
+
+
+def laser(wave):
+    """a laser line as a 3-point triangle peaked at wave"""
+    return DenseSpectrum(wave - 1, (0, 1, 0))
+
+
+class SpectralMatrix:
+    """A stack of spectra zero-padded onto one shared wavelength grid
+
+    self.y is a 2-D float32 array with one row per spectrum, so that the overlap
+    of every row with a given spectrum is a single matrix-vector product.
+    """
+
+    def __init__(self, spectra, start=None, stop=None):
+        """start & stop fix the grid (spectra are clipped to it), default: the span of all spectra"""
+        spectra = [as_dense(s) for s in spectra]
+        self.present = np.array([bool(s) for s in spectra], dtype=bool)
+        self.start = min((s.start for s in spectra if s), default=0) if start is None else int(start)
+        if stop is None:
+            stop = max((s.stop for s in spectra if s), default=self.start)
+        self.y = np.zeros((len(spectra), max(stop - self.start, 0)), dtype=np.float32)
+        # empty rows get a zero-length range, so they never overlap anything
+        self.starts = np.array([s.start if s else self.start for s in spectra], dtype=int).clip(self.start, stop)
+        self.stops = np.array([s.stop if s else self.start for s in spectra], dtype=int).clip(self.start, stop)
+        for i, s in enumerate(spectra):
+            if s:
+                self.y[i] = s.window(self.start, self.stop)
+        self.areas = np.array([s.area() for s in spectra], dtype=float)
+
+    @property
+    def stop(self):
+        return self.start + self.y.shape[1]
+
+    def __len__(self):
+        return self.y.shape[0]
+
+    def __repr__(self):
+        return f"<SpectralMatrix: {len(self)} spectra, {self.start}-{self.stop - 1}>"
+
+    def product_areas(self, spectrum):
+        """trapezoidal area of the product of every row with spectrum
+
+        equivalent to [product([row, spectrum]).area() for row in rows]
+        """
+        spectrum = as_dense(spectrum)
+        out = np.zeros(len(self))
+        if not spectrum or not len(self):
+            return out
+        v = spectrum.window(self.start, self.stop).astype(np.float32)
+        # a plain sum over the overlap, minus half of the two trapezoid end points
+        total = self.y @ v
+        a = np.maximum(self.starts, spectrum.start)
+        b = np.minimum(self.stops, spectrum.stop)
+        rows = np.flatnonzero(b - a >= 2)
+        first = a[rows] - self.start
+        last = b[rows] - 1 - self.start
+        ends = self.y[rows, first] * v[first] + self.y[rows, last] * v[last]
+        out[rows] = total[rows] - ends / 2
+        return out
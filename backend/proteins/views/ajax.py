@@ -10,9 +10,9 @@ from django.core.mail import mail_managers
 from django.db.models import Prefetch
 from django.http import HttpResponseNotAllowed, JsonResponse
 from django.utils.text import slugify
-from django.views.decorators.cache import cache_page
 from django.views.generic import DetailView
 
+from fpbase.cache import cache_page
 from fpbase.util import is_ajax, uncache_protein_page
 from proteins.util.maintain import validate_node
 
@@ -179,13 +179,16 @@ def recursive_node_to_dict(node, widths=None, rootseq=None, validate=False):
         "ref": node.reference.citation if node.reference else "",
     }
 
+    # use the stored annotations (see tasks.refresh_lineages) if they have been computed
     if rootseq:
-        result["rootmut"] = str(rootseq.mutations_to(node.protein.seq))
+        result["rootmut"] = (
+            node.aligned_rootmut if node.annotation_key else str(rootseq.mutations_to(node.protein.seq))
+        )
         # if node.parent and node.parent.protein.seq:
         #     result['mut'] = str(node.mut_from_parent()),
 
     if validate:
-        result["err"] = validate_node(node)
+        result["err"] = node.validation_errors if node.annotation_key else validate_node(node)
 
     children = []
     for c in node.get_children():
@@ -2,11 +2,12 @@ from django.core.cache import cache
 from django.http import JsonResponse
 from django.shortcuts import render
 
-from fpbase.celery import app
 from fpbase.util import is_ajax
 
-from ..models import Dye, State
+from ..models import Dye, FRETPair, State
+from ..models.fret import FORSTER_LIST_CACHE_KEY
 from ..tasks import calc_fret
+from ..util.helpers import forster_list as get_forster_list
 
 
 def fret_chart(request):
@@ -14,19 +15,14 @@ def fret_chart(request):
     template = "fret.html"
 
     if is_ajax(request):
-        forster_list = cache.get("forster_list")
-        if not forster_list:
-            job = cache.get("calc_fret_job")
-            if cache.get("calc_fret_job"):
-                result = app.AsyncResult(job)
-                if result.ready():
-                    forster_list = result.get()
-                    cache.set("forster_list", forster_list, 60 * 60 * 24)
-                    cache.delete("calc_fret_job")
-            else:
-                job = calc_fret.delay()
-                if job:
-                    cache.set("calc_fret_job", job.id)
+        forster_list = cache.get(FORSTER_LIST_CACHE_KEY)
+        if forster_list is None:
+            # spectra changed (or the list expired): recompute the affected pairs in
+            # the background and serve the current table in the meantime.
+            if cache.add("calc_fret_job", True, 60 * 10):
+                calc_fret.delay()
+            if FRETPair.objects.exists():
+                forster_list = get_forster_list()
         return JsonResponse({"data": forster_list})
 
     slugs = (
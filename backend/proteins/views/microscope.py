@@ -1,23 +1,26 @@
+import hashlib
 import json
 from collections import defaultdict
-from urllib.parse import quote
 
 from django.contrib import messages
 from django.contrib.auth import get_user_model
-from django.contrib.contenttypes.models import ContentType
 from django.contrib.messages.views import SuccessMessageMixin
 from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.core.mail import mail_admins
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import transaction
-from django.db.models import CharField, Count, F, Q, Value
+from django.db.models import CharField, Count, F, Max, Q, Value
 from django.db.models.functions import Lower
 from django.http import (
     Http404,
+    HttpResponse,
     HttpResponseNotAllowed,
     HttpResponseRedirect,
     JsonResponse,
 )
+from django.shortcuts import get_object_or_404
 from django.urls import resolve, reverse_lazy
 from django.utils.decorators import method_decorator
 from django.views.decorators.clickjacking import xframe_options_exempt
@@ -46,7 +49,13 @@ from ..models import (
 
 # from ..util.efficiency import microscope_efficiency_report
 from ..models.efficiency import OcFluorEff
-from ..tasks import calculate_scope_report
+from ..tasks import (
+    finish_scope_report,
+    get_scope_report_progress,
+    revoke_scope_report_shards,
+    running_scope_report,
+    start_scope_report,
+)
 from .mixins import OwnableObject
 
 
@@ -59,29 +68,34 @@ def update_scope_report(request):
         if outdated:
             outdated = json.loads(outdated)
         if scope_id:
+            running = running_scope_report(scope_id)
+            if running:
+                return JsonResponse({"status": 200, "job": running})
             try:
                 # this is throwing connection resets
                 active = app.control.inspect().active()
             except Exception:
                 active = None
-            if active:
-                for _worker, jobs in active.items():
-                    for job in jobs:
-                        if job["name"].endswith("calculate_scope_report") and (scope_id in job["args"]):
-                            return JsonResponse({"status": 200, "job": job["id"]})
-                    if len(jobs) >= 4:
-                        return JsonResponse({"status": 200, "job": None, "waiting": True})
-            job_id = calculate_scope_report.delay(scope_id, outdated_ids=outdated).id
+            if active and any(len(jobs) >= 4 for jobs in active.values()):
+                return JsonResponse({"status": 200, "job": None, "waiting": True})
+            job_id = start_scope_report(scope_id, outdated_ids=outdated)
             return JsonResponse({"status": 200, "job": job_id})
     elif request.POST.get("action") == "check":
         if job_id:
             result = app.AsyncResult(job_id)
             ready = result.ready()
-            return JsonResponse({"status": 200, "ready": ready, "info": result.info})
+            if ready:
+                # (also covers jobs that failed before clearing their running flag)
+                finish_scope_report(scope_id, job_id)
+            # sharded reports aggregate their progress in the cache
+            info = (not ready and get_scope_report_progress(job_id)) or result.info
+            return JsonResponse({"status": 200, "ready": ready, "info": info})
     elif request.POST.get("action") == "cancel":
         if job_id:
             result = app.AsyncResult(job_id)
+            revoke_scope_report_shards(job_id)
             result.revoke(terminate=True)
+            finish_scope_report(scope_id, job_id)
             return JsonResponse(
                 {
                     "status": 200,
@@ -93,128 +107,105 @@ def update_scope_report(request):
     return JsonResponse({"status": 404})
 
 
-def scope_report_json(request, pk):
-    microscope = Microscope.objects.get(id=pk)
-    oclist = microscope.optical_configs.values_list("id")
-
-    state_ct = ContentType.objects.get_for_model(State)
-    dye_ct = ContentType.objects.get_for_model(Dye)
-
-    effs = list(
-        OcFluorEff.objects.exclude(ex_eff=None)
-        .filter(content_type=state_ct, oc__in=oclist)
-        .annotate(
-            fluor_id=F("state__protein__uuid"),
-            fluor_slug=F("state__slug"),
-            type=Value("p", CharField()),
-        )
-        .values(
-            "fluor_id",
+SCOPE_REPORT_FLUOR_FIELDS = ("ext_coeff", "qy", "agg", "emhex", "ex_max", "em_max", "switch_type", "uuid")
+
+
+def _scope_report_version(microscope):
+    """changes whenever an efficiency of the scope is recomputed, added, removed or marked dirty
+
+    (changes to optical configs and fluors mark their efficiencies dirty, see proteins.handlers)
+    """
+    parts = OcFluorEff.objects.filter(oc__microscope=microscope).aggregate(
+        m=Max("modified"), n=Count("id"), dirty=Count("id", filter=Q(dirty=True))
+    )
+    return hashlib.md5(str(sorted(parts.items())).encode()).hexdigest()
+
+
+def _scope_report_payload(microscope):
+    """columnar scope report: fluor metadata once, plus efficiency arrays for each optical config
+
+    fluors: {field: [...]} with one entry per fluor;
+    configs: [{"name": ..., "fluor": [fluor index, ...], "ex_eff": [...], ...}, ...]
+    (expanded back into rows by scope_report.js)
+    """
+    rows = (
+        OcFluorEff.objects.filter(oc__microscope=microscope, ex_eff__gt=0, em_eff__gt=0)
+        .order_by("oc__name", "id")
+        .values_list(
+            "oc__name",
+            "content_type__model",
+            "object_id",
             "fluor_name",
-            "fluor_slug",
             "ex_eff",
-            "em_eff",
             "ex_eff_broad",
+            "em_eff",
             "brightness",
-            "type",
-            "oc__name",
         )
     )
-
-    effs.extend(
-        list(
-            OcFluorEff.objects.exclude(ex_eff=None)
-            .filter(content_type=dye_ct, oc__in=oclist)
-            .annotate(
-                fluor_id=F("dye__id"),
-                fluor_slug=F("dye__slug"),
-                type=Value("d", CharField()),
-            )
-            .values(
-                "fluor_id",
-                "fluor_name",
-                "fluor_slug",
-                "ex_eff",
-                "em_eff",
-                "ex_eff_broad",
-                "brightness",
-                "type",
-                "oc__name",
-            )
-        )
+    states = State.objects.filter(
+        id__in=OcFluorEff.objects.filter(oc__microscope=microscope, content_type__model="state").values("object_id")
     )
-
-    data = defaultdict(list)
-    for item in effs:
-        if not (item["ex_eff"] and item["em_eff"]):
-            continue
-        data[item["oc__name"]].append(
-            {
-                "fluor": item["fluor_name"],
-                "fluor_slug": item["fluor_slug"],
-                "fluor_id": item["fluor_id"],
-                "ex_eff": item["ex_eff"],
-                "ex_eff_broad": item["ex_eff_broad"],
-                "em_eff": item["em_eff"],
-                "brightness": item["brightness"] or None,
-                "shape": "circle" if item["type"] == "p" else "square",
-                "url": microscope.get_absolute_url()
-                + "?c={}&p={}".format(quote(item["oc__name"]), quote(item["fluor_slug"])),
-            }
-        )
-
-    states = State.objects.with_spectra().prefetch_related("protein")
-    fluors = {
-        i["slug"]: i
+    dyes = Dye.objects.filter(
+        id__in=OcFluorEff.objects.filter(oc__microscope=microscope, content_type__model="dye").values("object_id")
+    )
+    meta = {
+        ("state", i["id"]): i
         for i in states.annotate(
-            agg=F("protein__agg"),
-            type=Value("p", CharField()),
-            switch_type=F("protein__switch_type"),
-            uuid=F("protein__uuid"),
-        ).values(
-            "slug",
-            "ext_coeff",
-            "qy",
-            "agg",
-            "emhex",
-            "ex_max",
-            "em_max",
-            "type",
-            "switch_type",
-            "uuid",
-        )
+            agg=F("protein__agg"), switch_type=F("protein__switch_type"), uuid=F("protein__uuid")
+        ).values("id", "slug", *SCOPE_REPORT_FLUOR_FIELDS)
     }
-    dyes = Dye.objects.with_spectra()
-    fluors.update(
+    meta.update(
         {
-            i["slug"]: i
+            ("dye", i["id"]): i
             for i in dyes.annotate(
-                uuid=F("id"),
-                agg=Value("", CharField()),
-                type=Value("d", CharField()),
-                switch_type=Value("", CharField()),
-            ).values(
-                "slug",
-                "ext_coeff",
-                "qy",
-                "agg",
-                "emhex",
-                "ex_max",
-                "em_max",
-                "type",
-                "switch_type",
-                "uuid",
-            )
-        }
-    )
-    return JsonResponse(
-        {
-            "microscope": pk,
-            "report": [{"key": k, "values": v} for k, v in data.items()],
-            "fluors": fluors,
+                uuid=F("id"), agg=Value("", CharField()), switch_type=Value("", CharField())
+            ).values("id", "slug", *SCOPE_REPORT_FLUOR_FIELDS)
         }
     )
 
+    fluors = defaultdict(list)
+    index = {}
+    configs = {}
+    for oc_name, model, obj_id, name, ex, ex_broad, em, bright in rows:
+        key = (model, obj_id)
+        if key not in meta:
+            continue
+        if key not in index:
+            index[key] = len(index)
+            fluors["slug"].append(meta[key]["slug"])
+            fluors["name"].append(name)
+            fluors["type"].append("p" if model == "state" else "d")
+            for field in SCOPE_REPORT_FLUOR_FIELDS:
+                fluors[field].append(meta[key][field])
+        if oc_name not in configs:
+            configs[oc_name] = {k: [] for k in ("name", "fluor", "ex_eff", "ex_eff_broad", "em_eff", "brightness")}
+            configs[oc_name]["name"] = oc_name
+        oc = configs[oc_name]
+        oc["fluor"].append(index[key])
+        oc["ex_eff"].append(ex)
+        oc["ex_eff_broad"].append(ex_broad)
+        oc["em_eff"].append(em)
+        oc["brightness"].append(bright or None)
+    return {
+        "microscope": microscope.pk,
+        "url": microscope.get_absolute_url(),
+        "fluors": fluors,
+        "configs": list(configs.values()),
+    }
+
+
+def scope_report_json(request, pk):
+    microscope = get_object_or_404(Microscope, id=pk)
+    version = _scope_report_version(microscope)
+    cache_key = f"scope_report_json_{microscope.pk}_{version}"
+    content = cache.get(cache_key)
+    if content is None:
+        payload = _scope_report_payload(microscope)
+        payload["version"] = version
+        content = json.dumps(payload, cls=DjangoJSONEncoder, separators=(",", ":"))
+        cache.set(cache_key, content, 60 * 60 * 24 * 7)
+    return HttpResponse(content, content_type="application/json")
+
 
 class ScopeReportView(DetailView):
     template_name = "proteins/scope_report.html"
@@ -1,7 +1,6 @@
 import contextlib
 import io
 import logging
-import operator
 from typing import cast
 
 import django.forms
@@ -12,7 +11,7 @@ from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.core.mail import mail_admins, mail_managers
 from django.db import transaction
-from django.db.models import Case, Count, F, Func, Prefetch, Q, Value, When
+from django.db.models import Case, Count, F, Prefetch, When
 from django.forms.models import BaseInlineFormSet, modelformset_factory
 from django.http import (
     Http404,
@@ -26,19 +25,17 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.decorators import method_decorator
 from django.utils.html import strip_tags
 from django.utils.safestring import mark_safe
-from django.utils.text import slugify
-from django.views.decorators.cache import cache_page
 from django.views.decorators.csrf import csrf_protect
-from django.views.decorators.vary import vary_on_cookie
 from django.views.generic import CreateView, DetailView, ListView, UpdateView, base
 from reversion.models import Revision, Version
 
+from fpbase.cache import cache_page
 from fpbase.util import is_ajax, uncache_protein_page
-from proteins.extrest.entrez import get_cached_gbseqs
 from proteins.extrest.ga import cached_ga_popular
 from proteins.forms.forms import BaseStateFormSet
+from proteins.util.datachecks import page_findings
 from proteins.util.helpers import link_excerpts, most_favorited
-from proteins.util.maintain import check_lineages, suggested_switch_type
+from proteins.util.maintain import suggested_switch_type
 from proteins.util.spectra import spectra2csv
 from references.models import Reference  # breaks application modularity
 
@@ -124,8 +121,7 @@ class ProteinDetailView(DetailView):
         .select_related("primary_reference")
     )
 
-    @method_decorator(cache_page(60 * 30))
-    @method_decorator(vary_on_cookie)
+    @method_decorator(cache_page(60 * 30, vary_on_cookie=True))
     def dispatch(self, *args, **kwargs):
         return super().dispatch(*args, **kwargs)
 
@@ -176,22 +172,8 @@ class ProteinDetailView(DetailView):
         try:
             return super().get(request, *args, **kwargs)
         except Http404:
-            from django.contrib.postgres.fields import ArrayField
-            from django.db import models
-
-            name = slugify(self.kwargs.get(self.slug_url_kwarg))
-            aliases_lower = Func(Func(F("aliases"), function="unnest"), function="LOWER")
-            remove_space = Func(aliases_lower, Value(" "), Value("-"), function="replace")
-            final = Func(
-                remove_space,
-                Value("."),
-                Value(""),
-                function="replace",
-                output_field=ArrayField(models.CharField(max_length=200)),
-            )
-            d = dict(Protein.objects.annotate(aka=final).values_list("aka", "id"))
-            if name in d:
-                obj = Protein.objects.get(id=d[name])
+            obj = Protein.objects.by_alias(self.kwargs.get(self.slug_url_kwarg)).first()
+            if obj is not None:
                 messages.add_message(
                     self.request,
                     messages.INFO,
@@ -454,7 +436,7 @@ def spectra_image(request, slug, **kwargs):
     raise Http404()
 
 
-@cache_page(60 * 10)
+@cache_page(60 * 10, vary_on_cookie=True)
 @csrf_protect
 def protein_table(request):
     """renders html for protein table page"""
@@ -534,81 +516,11 @@ def protein_tree(request, organism):
 
 
 def problems_gaps(request):
-    return render(
-        request,
-        "problems_gaps.html",
-        {
-            "noseqs": Protein.objects.filter(seq__isnull=True).values("name", "slug"),
-            "nostates": Protein.objects.filter(states=None).values("name", "slug"),
-            "noparent": Protein.objects.filter(parent_organism__isnull=True),
-            "only2p": (
-                State.objects.filter(spectra__subtype="2p")
-                .exclude(spectra__subtype="ex")
-                .distinct("protein")
-                .values("protein__name", "protein__slug")
-            ),
-            "nolineage": Protein.objects.filter(lineage=None).annotate(ns=Count("states__spectra")).order_by("-ns"),
-            "request": request,
-        },
-    )
+    return render(request, "problems_gaps.html", {**page_findings("gaps"), "request": request})
 
 
 def problems_inconsistencies(request):
-    from functools import reduce
-
-    titles = reduce(
-        operator.or_,
-        (Q(primary_reference__title__icontains=item) for item in ["activat", "switch", "convert", "dark", "revers"]),
-    )
-    names = reduce(
-        operator.or_,
-        (Q(name__startswith=item) for item in ["PA", "rs", "mPA", "PS", "mPS"]),
-    )
-    switchers = Protein.objects.exclude(name__startswith="mCerulean").filter(titles)
-    switchers = switchers | Protein.objects.filter(names)
-    switchers = switchers.annotate(ns=Count("states")).filter(ns=1)
-
-    gb_mismatch = []
-    with_genbank = Protein.objects.exclude(genbank=None).exclude(seq=None).values("slug", "name", "genbank", "seq")
-    gbseqs = get_cached_gbseqs([g["genbank"] for g in with_genbank])
-    for item in with_genbank:
-        if item["genbank"] in gbseqs:
-            gbseq = gbseqs.get(item["genbank"])[0]
-            ourseq = item["seq"]
-            if ourseq != gbseq:
-                gb_mismatch.append(
-                    (
-                        item["name"],
-                        item["slug"],
-                        item["genbank"],
-                        str(ourseq.mutations_to(gbseq)),
-                        ourseq,
-                    )
-                )
-    p = list(
-        Protein.objects.annotate(ndark=Count("states", filter=Q(states__is_dark=True)))
-        .annotate(nfrom=Count("transitions__from_state", distinct=True))
-        .prefetch_related("states", "transitions")
-    )
-    bad_switch = []
-    for prot in p:
-        suggestion = suggested_switch_type(prot)
-        if (prot.switch_type or suggestion) and (prot.switch_type != suggestion):
-            bad_switch.append((prot, dict(Protein.SWITCHING_CHOICES).get(suggestion)))
-
-    return render(
-        request,
-        "problems_inconsistencies.html",
-        {
-            "histags": Protein.objects.filter(seq__icontains="HHHHH").values("name", "slug"),
-            "linprobs": [(node.protein, v) for node, v in check_lineages()[0].items()],
-            "nomet": Protein.objects.exclude(seq__isnull=True).exclude(seq__istartswith="M"),
-            "bad_switch": bad_switch,
-            "switchers": switchers,
-            "request": request,
-            "mismatch": gb_mismatch,
-        },
-    )
+    return render(request, "problems_inconsistencies.html", {**page_findings("inconsistencies"), "request": request})
 
 
 def add_reference(request, slug=None):
@@ -1,14 +1,11 @@
 import json
 
 from django.contrib.postgres.search import TrigramSimilarity
-from django.db.models import Count, Prefetch, Q
+from django.db.models import Count, Prefetch
 from django.shortcuts import redirect, render
 
-from proteins.util.helpers import getprot
-from references.models import Author, Reference
-
 from ..filters import ProteinFilter
-from ..models import Organism, Protein, State
+from ..models import Protein, SearchIdentifier, State
 
 
 def protein_search(request):
@@ -17,44 +14,9 @@ def protein_search(request):
     if request.GET:
         if set(request.GET.keys()) == {"q"}:
             query = request.GET.get("q").strip()
-            page = None
-            try:
-                page = getprot(query, visible=True)
-                return redirect(page)
-            except Protein.DoesNotExist:
-                pass
-            try:
-                page = Protein.visible.get(
-                    Q(genbank__iexact=query)
-                    | Q(uniprot__iexact=query)
-                    | Q(pdb__contains=[query.upper()])
-                    | Q(uuid__iexact=query.upper())
-                )
-                return redirect(page)
-            except Protein.DoesNotExist:
-                pass
-            try:
-                page = Author.objects.filter(family__iexact=query).annotate(nr=Count("publications")).order_by("-nr")
-                if page:
-                    return redirect(page.first())
-            except Author.DoesNotExist:
-                pass
-            try:
-                page = Reference.objects.get(doi=query.lower())
-                return redirect(page)
-            except Reference.DoesNotExist:
-                pass
-            if len(query) > 5:
-                try:
-                    page = (
-                        Organism.objects.filter(scientific_name__istartswith=query)
-                        .annotate(np=Count("proteins"))
-                        .order_by("-np")
-                    )
-                    if page.exists():
-                        return redirect(page.first())
-                except Organism.DoesNotExist:
-                    pass
+            hit = SearchIdentifier.objects.resolve(query)
+            if hit is not None:
+                return redirect(hit.url)
 
             request.GET._mutable = True
             request.GET["name__icontains"] = query
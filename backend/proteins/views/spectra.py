@@ -1,12 +1,17 @@
 import contextlib
+import importlib.util
 import json
 
+import numpy as np
+
 # from django.views.decorators.cache import cache_page
 # from django.views.decorators.vary import vary_on_cookie
 from django import forms
 from django.conf import settings
 from django.core.mail import EmailMessage
-from django.http import Http404, HttpResponse, JsonResponse
+from django.db.models import ExpressionWrapper, F, FloatField, Max, Min
+from django.db.models.functions import Length
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.template.defaultfilters import slugify
 from django.views.generic import CreateView
@@ -16,7 +21,7 @@ from fpbase.util import is_ajax, uncache_protein_page
 from ..forms import SpectrumForm
 from ..models import Filter, Protein, Spectrum, State
 from ..util.importers import add_filter_to_database
-from ..util.spectra import spectra2csv
+from ..util.spectra import iter_spectra_arrow, iter_spectra_csv, iter_spectra_npz, spectra2csv
 
 
 # @cache_page(60 * 10)
@@ -119,6 +124,76 @@ def spectra_csv(request):
         return HttpResponse("malformed spectra csv request")
 
 
+EXPORT_FORMATS = {
+    # format: (content type, file extension)
+    "csv": ("text/csv", "csv"),
+    "npz": ("application/octet-stream", "npz"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+MAX_EXPORT_POINTS = 5000
+
+
+def spectra_export(request):
+    """stream many (or all) spectra, resampled onto a common 1 nm wavelength grid
+
+    GET parameters:
+        format: csv (default), npz, or arrow
+        q: comma separated spectrum ids (default: all spectra)
+        category: limit to one Spectrum category (d, p, l, f, c)
+        min, max: wavelength range of the grid (default: range of all selected spectra)
+
+    an empty selection (without min & max) is exported on an empty grid.
+    """
+    fmt = request.GET.get("format", "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if fmt == "arrow" and importlib.util.find_spec("pyarrow") is None:
+        return HttpResponse("arrow export is not available on this server", status=501)
+
+    spectra = Spectrum.objects.packed()
+    try:
+        idlist = [int(x) for x in request.GET.get("q", "").split(",") if x]
+        if idlist:
+            spectra = spectra.filter(id__in=idlist)
+        if request.GET.get("category"):
+            spectra = spectra.filter(category=request.GET["category"])
+        bounds = spectra.aggregate(
+            lo=Min("wave_start"),
+            hi=Max(
+                ExpressionWrapper(
+                    F("wave_start") + F("wave_step") * (Length("y_packed") / 4 - 1), output_field=FloatField()
+                )
+            ),
+        )
+        lo = request.GET.get("min") or bounds["lo"]
+        hi = request.GET.get("max") or bounds["hi"]
+        if lo is None or hi is None:
+            grid = np.arange(0)
+        else:
+            lo, hi = int(float(lo)), int(float(hi))
+            if not 0 < hi - lo < MAX_EXPORT_POINTS:
+                return HttpResponseBadRequest(f"wavelength range must span 1 - {MAX_EXPORT_POINTS} nm")
+            grid = np.arange(lo, hi + 1)
+    except (TypeError, ValueError):
+        return HttpResponseBadRequest("malformed spectra export request")
+
+    spectra = spectra.select_related(
+        "owner_state__protein", "owner_dye", "owner_filter", "owner_light", "owner_camera"
+    ).order_by("id")
+    rows = spectra.iterator(chunk_size=200)
+    if fmt == "npz":
+        stream = iter_spectra_npz(list(spectra.values_list("id", flat=True)), rows, grid)
+    elif fmt == "arrow":
+        stream = iter_spectra_arrow(rows, grid)
+    else:
+        stream = iter_spectra_csv(rows, grid)
+
+    content_type, ext = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="fpbase_spectra.{ext}"'
+    return response
+
+
 def filter_import(request, brand):
     part = request.POST["part"]
     new_objects = []
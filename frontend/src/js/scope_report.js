@@ -50,8 +50,49 @@ $.fn.extend({
     var chartData
     var dt
 
+    // expand the columnar report payload (fluor metadata once, plus efficiency
+    // arrays for each optical config) into per-config arrays of row objects
+    function expandReport(d) {
+      var f = d.fluors
+      var fields = Object.keys(f)
+      var fluors = {}
+      for (var i = 0; i < (f.slug || []).length; i++) {
+        var item = {}
+        for (var k = 0; k < fields.length; k++) {
+          item[fields[k]] = f[fields[k]][i]
+        }
+        fluors[f.slug[i]] = item
+      }
+      d.fluors = fluors
+      d.report = d.configs.map(function(oc) {
+        return {
+          key: oc.name,
+          values: oc.fluor.map(function(j, r) {
+            return {
+              fluor: f.name[j],
+              fluor_slug: f.slug[j],
+              fluor_id: f.uuid[j],
+              ex_eff: oc.ex_eff[r],
+              ex_eff_broad: oc.ex_eff_broad[r],
+              em_eff: oc.em_eff[r],
+              brightness: oc.brightness[r],
+              shape: f.type[j] === "p" ? "circle" : "square",
+              url:
+                d.url +
+                "?c=" +
+                encodeURIComponent(oc.name) +
+                "&p=" +
+                encodeURIComponent(f.slug[j])
+            }
+          })
+        }
+      })
+      return d
+    }
+
     function updateData() {
       $.get(window.location + "json/", function(d) {
+        d = expandReport(d)
         $("#update-alert").show()
         if (!(d.report && d.report.length)) {
           $("#status").html(
@@ -316,6 +357,7 @@ $.fn.extend({
           url: "",
           data: {
             action: "check",
+            scope_id: SCOPE_ID,
             job_id: JOB_ID,
             csrfmiddlewaretoken: CSRF_TOKEN
           },